@@ -0,0 +1,77 @@
+"""
+Compares the single continuation-chain listing against the partitioned,
+thread-pooled listing engine on a local fake S3 with per-request latency.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_listing [--objects 200000] [--latency 0.02]
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import main as s3_gfs_main
+from fake_s3 import FakeS3Client
+
+
+def nested_keys(objects: int, folders: int) -> list:
+    per_folder = max(objects // folders, 1)
+    return [
+        f"backups/host-{f:03d}/part-{i:07d}"
+        for f in range(folders)
+        for i in range(per_folder)
+    ]
+
+
+def flat_keys(objects: int) -> list:
+    return [f"Automatic_backup_{i:09d}.tar" for i in range(objects)]
+
+
+def run(label: str, keys: list, latency: float, **kwargs) -> float:
+    client = FakeS3Client(keys, latency=latency)
+    start = time.perf_counter()
+    count = sum(1 for _ in s3_gfs_main.iter_keys_from_s3("bucket", client=client, **kwargs))
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:<36} keys={count:>9} list_calls={client.calls['list_objects_v2']:>6} "
+        f"time={elapsed:8.3f}s"
+    )
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--objects", type=int, default=200_000)
+    parser.add_argument("--folders", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per request")
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    keys = nested_keys(args.objects, args.folders)
+    base = run("nested / single chain", keys, args.latency)
+    fast = run(
+        f"nested / delimiter x{args.concurrency}",
+        keys,
+        args.latency,
+        prefix="backups/",
+        concurrency=args.concurrency,
+    )
+    print(f"speedup: {base / fast:.1f}x")
+
+    keys = flat_keys(args.objects)
+    step = max(len(keys) // (args.concurrency * 2), 1)
+    split_points = keys[step::step]
+    base = run("flat / single chain", keys, args.latency)
+    fast = run(
+        f"flat / split points x{args.concurrency}",
+        keys,
+        args.latency,
+        concurrency=args.concurrency,
+        split_points=split_points,
+    )
+    print(f"speedup: {base / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
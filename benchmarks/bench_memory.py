@@ -0,0 +1,111 @@
+"""
+Compares the peak memory of planning a large listing held as Python lists
+(`fetch_from_s3` + `core_logic`), the default streaming `build_plan`, and
+the front-coded `CompactKeys` plan (`S3_GFS_COMPACT_KEYS=true`).
+
+Each mode runs in a fresh interpreter and reports its peak RSS above the
+baseline after `import main`. Run from the repository root:
+
+    python -m benchmarks.bench_memory [--objects 1000000] [--formats ha,compact]
+    python -m benchmarks.bench_memory --objects 10000000 --formats ha
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+MODES = ("lists", "plan", "compact")
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def measure(mode: str, objects: int, key_format: str) -> dict:
+    """Runs one mode in this process; called in the child interpreter."""
+    import logging
+
+    import main as s3_gfs_main
+    from benchmarks.synthetic import FORMATS, generate_keys
+
+    logging.getLogger(s3_gfs_main.__name__).setLevel(logging.WARNING)
+    fmt = FORMATS[key_format]
+    policy = s3_gfs_main.RetentionPolicy()
+    baseline = _peak_rss_bytes()
+    started = time.perf_counter()
+    keys = generate_keys(objects, key_format=key_format, unparsed_ratio=0.05)
+    if mode == "lists":
+        listed = list(keys)
+        decisions = s3_gfs_main.core_logic(
+            listed, policy, filename_ts_re=fmt.compile(), timestamp_format=fmt.timestamp_format
+        )
+        plan = decisions.plan
+    else:
+        plan = s3_gfs_main.build_plan(
+            keys,
+            policy,
+            filename_ts_re=fmt.compile(),
+            timestamp_format=fmt.timestamp_format,
+            compact=mode == "compact",
+        )
+    removed = sum(len(g.keys) for g in plan.groups if g.decision == "remove")
+    return {
+        "mode": mode,
+        "objects": plan.total,
+        "removed": removed,
+        "peak_bytes": _peak_rss_bytes() - baseline,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--objects", type=int, default=1_000_000)
+    parser.add_argument("--formats", default="ha,iso-folder,compact")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--format", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(measure(args.mode, args.objects, args.format)))
+        return
+
+    for key_format in args.formats.split(","):
+        results = {}
+        for mode in MODES:
+            out = subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.bench_memory",
+                    "--objects",
+                    str(args.objects),
+                    "--mode",
+                    mode,
+                    "--format",
+                    key_format,
+                ],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+            results[mode] = row = json.loads(out.strip().splitlines()[-1])
+            print(
+                f"{key_format:<11} {mode:<8} objects={row['objects']:>10,} "
+                f"peak={row['peak_bytes'] / 2**20:9.1f} MiB "
+                f"({row['peak_bytes'] / max(row['objects'], 1):6.1f} B/key) "
+                f"time={row['seconds']:7.2f}s"
+            )
+        if len({row["removed"] for row in results.values()}) != 1:
+            raise SystemExit(f"{key_format}: the modes disagree on the retention decisions")
+        ratio = results["lists"]["peak_bytes"] / max(results["compact"]["peak_bytes"], 1)
+        print(f"{'':<11} memory cut: {ratio:.1f}x\n")
+
+
+if __name__ == "__main__":
+    main()
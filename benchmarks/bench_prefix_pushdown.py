@@ -0,0 +1,81 @@
+"""
+Measures the listing pages saved by pushing the regex's literal prefix down
+into the ListObjectsV2 `Prefix`, on a local fake S3 where backups share the
+bucket with unrelated objects.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_prefix_pushdown [--backups 20000] [--unrelated 500000]
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta
+
+import main as s3_gfs_main
+from fake_s3 import FakeS3Client
+
+PATTERNS = {
+    "anchored": r"^Automatic_backup_[\d.]+_(\d{4}-\d{2}-\d{2}_\d{2}\.\d{2})_",
+    "alternation": r"^(?:Automatic|Manual)_backup_[\d.]+_(\d{4}-\d{2}-\d{2}_\d{2}\.\d{2})_",
+    "unanchored": r"Automatic_backup_[\d.]+_(\d{4}-\d{2}-\d{2}_\d{2}\.\d{2})_",
+}
+TIMESTAMP_FORMAT = "%Y-%m-%d_%H.%M"
+
+
+def make_keys(backups: int, unrelated: int) -> list:
+    start = datetime(2020, 1, 1, 4, 45)
+    keys = []
+    for i in range(backups):
+        ts = start + timedelta(hours=6 * i)
+        kind = "Manual" if i % 10 == 0 else "Automatic"
+        keys.append(f"{kind}_backup_2025.1.0_{ts:%Y-%m-%d_%H.%M}_{i:08d}.tar")
+    # Unrelated keys on both sides of the backups in sort order.
+    tops = ("Archive", "Camera", "Nextcloud", "logs", "media")
+    keys.extend(f"{tops[i % len(tops)]}/{i:09d}.bin" for i in range(unrelated))
+    return keys
+
+
+def run(label: str, keys: list, prefixes: list, regex, latency: float):
+    client = FakeS3Client(keys, latency=latency)
+    started = time.perf_counter()
+    plan = s3_gfs_main.build_plan(
+        s3_gfs_main.iter_keys_from_s3_prefixes("bucket", prefixes, client=client),
+        s3_gfs_main.RetentionPolicy(),
+        filename_ts_re=regex,
+        timestamp_format=TIMESTAMP_FORMAT,
+    )
+    elapsed = time.perf_counter() - started
+    pages = client.calls["list_objects_v2"]
+    print(
+        f"{label:<28} prefixes={len(prefixes):>2} pages={pages:>6} "
+        f"unparsed={len(plan.unparsed):>8} time={elapsed:8.3f}s"
+    )
+    decisions = [(g.timestamp, g.decision, g.tags) for g in plan.groups]
+    return pages, decisions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backups", type=int, default=20_000)
+    parser.add_argument("--unrelated", type=int, default=500_000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    args = parser.parse_args()
+
+    logging.getLogger(s3_gfs_main.__name__).setLevel(logging.WARNING)
+    keys = make_keys(args.backups, args.unrelated)
+    for name, pattern in PATTERNS.items():
+        regex = s3_gfs_main.re.compile(pattern)
+        prefixes = s3_gfs_main.listing_prefixes("", regex)
+        base_pages, base = run(f"{name} / full listing", keys, [""], regex, args.latency)
+        pages, pushed = run(f"{name} / pushdown", keys, prefixes, regex, args.latency)
+        if pushed != base:
+            raise SystemExit(f"{name}: pushdown changed the retention decisions")
+        saved = base_pages - pages
+        print(f"{'':<28} pages saved: {saved} ({saved / base_pages:.0%})\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Per-invocation overhead of building the configuration and S3 client, with
+and without the warm-container `RuntimeContext` cache. No requests are sent.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_runtime [--invocations 200]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import time
+
+import main as s3_gfs_main
+
+ENV = {
+    "S3_BUCKET": "bucket",
+    "S3_GFS_REGEX": r"Automatic_backup_\d+\.\d+\.\d+_(\d{4}-\d{2}-\d{2}_\d{2}\.\d{2})_",
+    "S3_GFS_TIMESTAMP_FORMAT": "%Y-%m-%d_%H.%M",
+    "AWS_REGION": "us-east-1",
+    "AWS_ACCESS_KEY_ID": "bench",
+    "AWS_SECRET_ACCESS_KEY": "bench",
+}
+
+
+def invocation(runtime: "s3_gfs_main.RuntimeContext") -> None:
+    config = runtime.config(os.environ)
+    runtime.s3_client(config.region, config.max_pool_connections)
+
+
+def timed(invocations: int, cold: bool) -> float:
+    runtime = s3_gfs_main.RuntimeContext()
+    start = time.perf_counter()
+    for _ in range(invocations):
+        if cold:
+            runtime.clear()
+            s3_gfs_main.re.purge()
+        invocation(runtime)
+    return (time.perf_counter() - start) / invocations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--invocations", type=int, default=200)
+    args = parser.parse_args()
+    os.environ.update(ENV)
+
+    uncached = timed(args.invocations, cold=True)
+    cached = timed(args.invocations, cold=False)
+    print(f"without cache  {uncached * 1e3:8.3f} ms/invocation")
+    print(f"with cache     {cached * 1e3:8.3f} ms/invocation")
+    print(f"saved: {(uncached - cached) * 1e3:.3f} ms/invocation")
+
+
+if __name__ == "__main__":
+    main()
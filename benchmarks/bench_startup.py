@@ -0,0 +1,84 @@
+"""
+Cold-start budget check for the Lambda entry point.
+
+Measures, in fresh interpreters, how long `import main` takes and how long
+the first dry `core_logic` + `apply_removal` call takes on the Home
+Assistant key format. Exits non-zero if the median of either exceeds its
+budget, or if boto3 got imported along the way.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_startup [--import-budget-ms 150] [--first-call-budget-ms 100]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+keys = [
+    f"Automatic_backup_2025.11.1_2025-11-{d:02d}_04.45_{d:08d}.{ext}"
+    for d in range(1, 29)
+    for ext in ("tar", "metadata.json")
+]
+regex = main.re.compile(r"Automatic_backup_\d+\.\d+\.\d+_(\d{4}-\d{2}-\d{2}_\d{2}\.\d{2})_")
+decisions = main.core_logic(
+    keys, main.RetentionPolicy(), filename_ts_re=regex, timestamp_format="%Y-%m-%d_%H.%M"
+)
+main.apply_removal("bucket", decisions, dry_run=True)
+t2 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "first_call": t2 - t1, "boto3": "boto3" in sys.modules}))
+"""
+
+
+def probe() -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--import-budget-ms", type=float, default=150.0)
+    parser.add_argument("--first-call-budget-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    samples = [probe() for _ in range(args.runs)]
+    import_ms = statistics.median(s["import"] for s in samples) * 1e3
+    first_call_ms = statistics.median(s["first_call"] for s in samples) * 1e3
+    loaded_boto3 = any(s["boto3"] for s in samples)
+
+    print(f"import main     {import_ms:8.2f} ms (budget {args.import_budget_ms:.0f} ms)")
+    print(f"first call      {first_call_ms:8.2f} ms (budget {args.first_call_budget_ms:.0f} ms)")
+    print(f"boto3 imported  {loaded_boto3}")
+
+    failures = []
+    if import_ms > args.import_budget_ms:
+        failures.append("import main exceeded its budget")
+    if first_call_ms > args.first_call_budget_ms:
+        failures.append("first call exceeded its budget")
+    if loaded_boto3:
+        failures.append("boto3 was imported by a dry run")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
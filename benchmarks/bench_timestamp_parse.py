@@ -0,0 +1,71 @@
+"""
+Microbenchmark: per-key `datetime.strptime` versus the compiled
+`TimestampParser`, on the Home Assistant key format used in test_core.py.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_timestamp_parse [--keys 200000]
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+import main as s3_gfs_main
+
+FILENAME_TS_RE = s3_gfs_main.re.compile(
+    r"Automatic_backup_\d+\.\d+\.\d+_(\d{4}-\d{2}-\d{2}_\d{2}\.\d{2})_"
+)
+TIMESTAMP_FORMAT = "%Y-%m-%d_%H.%M"
+
+
+def make_keys(count: int) -> list:
+    start = datetime(2020, 1, 1, 4, 45)
+    keys = []
+    for i in range(count):
+        ts = (start + timedelta(hours=7 * i)).strftime(TIMESTAMP_FORMAT)
+        keys.append(f"Automatic_backup_2025.11.1_{ts}_{i:08d}.tar")
+    return keys
+
+
+def strptime_key(key: str):
+    m = FILENAME_TS_RE.search(key)
+    if not m:
+        return None
+    try:
+        return datetime.strptime(m.group(1), TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def timed(fn, keys: list) -> float:
+    start = time.perf_counter()
+    for key in keys:
+        fn(key)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--keys", type=int, default=200_000)
+    args = parser.parse_args()
+
+    keys = make_keys(args.keys)
+    compiled = s3_gfs_main.get_timestamp_parser(TIMESTAMP_FORMAT)
+    assert compiled.compiled
+
+    def compiled_key(key: str):
+        return s3_gfs_main.parse_timestamp_from_key(key, FILENAME_TS_RE, TIMESTAMP_FORMAT)
+
+    assert all(strptime_key(k) == compiled_key(k) for k in keys[:1000])
+
+    base = timed(strptime_key, keys)
+    fast = timed(compiled_key, keys)
+    print(f"strptime  {base:8.3f}s  {base / len(keys) * 1e6:6.2f} us/key")
+    print(f"compiled  {fast:8.3f}s  {fast / len(keys) * 1e6:6.2f} us/key")
+    print(f"speedup: {base / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+End-to-end benchmark suite on synthetic key sets.
+
+For each scenario (object count x key format) this times listing, parsing,
+selection, planning and delete dispatch against the in-process fake S3
+client (or `--backend memory`), and writes the results as JSON so runs from different commits can
+be compared.
+
+Run from the repository root:
+
+    python -m benchmarks.suite --objects 10000,100000 --formats ha,iso-folder
+    python -m benchmarks.suite --objects 1000000 --compare bench_output.json
+
+Object counts from 10k to 10M are supported; the larger sizes need several
+GB of RAM because the fake bucket and the plan are held in memory.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import main as s3_gfs_main
+from benchmarks.synthetic import FORMATS, generate_keys
+from fake_s3 import FakeS3Client
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _timed(fn: Callable[[], object]):
+    gc.collect()
+    start = time.perf_counter()
+    value = fn()
+    return value, time.perf_counter() - start
+
+
+def run_scenario(
+    objects: int,
+    key_format: str,
+    *,
+    objects_per_group: int,
+    unparsed_ratio: float,
+    policy: "s3_gfs_main.RetentionPolicy",
+    min_remaining: int,
+    delete_concurrency: int,
+    backend_name: str = "fake-s3",
+    parse_workers: int = 1,
+) -> List[Dict]:
+    fmt = FORMATS[key_format]
+    regex = fmt.compile()
+    keys = list(
+        generate_keys(
+            objects,
+            key_format=key_format,
+            objects_per_group=objects_per_group,
+            unparsed_ratio=unparsed_ratio,
+        )
+    )
+    if backend_name == "memory":
+        backend: s3_gfs_main.StorageBackend = s3_gfs_main.MemoryBackend(keys)
+    else:
+        backend = s3_gfs_main.S3Backend("bucket", client=FakeS3Client(keys))
+    del keys
+    s3_gfs_main.get_timestamp_parser(fmt.timestamp_format)._cache.clear()
+
+    phases: Dict[str, float] = {}
+    listed, phases["listing"] = _timed(
+        lambda: list(backend.iter_keys())
+    )
+    summary, phases["parsing"] = _timed(
+        lambda: s3_gfs_main.summarize_groups(
+            listed, filename_ts_re=regex, timestamp_format=fmt.timestamp_format
+        )
+    )
+    _keepers, phases["selection"] = _timed(
+        lambda: s3_gfs_main.select_keepers(summary.counts.keys(), policy)
+    )
+    plan, phases["build_plan"] = _timed(
+        lambda: s3_gfs_main.build_plan(
+            listed,
+            policy,
+            filename_ts_re=regex,
+            timestamp_format=fmt.timestamp_format,
+            parse_workers=parse_workers,
+        )
+    )
+    dry, phases["planning"] = _timed(
+        lambda: s3_gfs_main.apply_removal(
+            "bucket", plan, min_remaining=min_remaining, dry_run=True
+        )
+    )
+    _result, phases["delete_dispatch"] = _timed(
+        lambda: s3_gfs_main.apply_removal(
+            "bucket",
+            plan,
+            min_remaining=min_remaining,
+            dry_run=False,
+            delete_concurrency=delete_concurrency,
+            backend=backend,
+        )
+    )
+
+    rows = []
+    for phase, seconds in phases.items():
+        rows.append(
+            {
+                "scenario": f"{key_format}/{len(listed)}",
+                "format": key_format,
+                "objects": len(listed),
+                "groups": len(summary.counts),
+                "deleted": dry["deleted"],
+                "phase": phase,
+                "seconds": round(seconds, 6),
+                "objects_per_sec": round(len(listed) / seconds) if seconds else None,
+            }
+        )
+    return rows
+
+
+def compare(rows: List[Dict], baseline_path: str) -> None:
+    with open(baseline_path, "r", encoding="utf-8") as fh:
+        baseline = {
+            (r["scenario"], r["phase"]): r["seconds"] for r in json.load(fh)["results"]
+        }
+    print(f"\ncompared with {baseline_path}:")
+    for row in rows:
+        before = baseline.get((row["scenario"], row["phase"]))
+        if not before:
+            continue
+        change = (row["seconds"] - before) / before * 100
+        flag = "  <-- slower" if change > 10 else ""
+        print(f"  {row['scenario']:<22} {row['phase']:<16} {change:+7.1f}%{flag}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--objects", default="10000,100000", help="comma-separated sizes")
+    parser.add_argument("--formats", default="ha", help=f"any of {','.join(FORMATS)}")
+    parser.add_argument("--objects-per-group", type=int, default=2)
+    parser.add_argument("--unparsed-ratio", type=float, default=0.05)
+    parser.add_argument("--keep-hourly", type=int, default=0)
+    parser.add_argument("--keep-daily", type=int, default=7)
+    parser.add_argument("--keep-weekly", type=int, default=4)
+    parser.add_argument("--keep-monthly", type=int, default=12)
+    parser.add_argument("--keep-yearly", type=int, default=0)
+    parser.add_argument("--min-remaining", type=int, default=5)
+    parser.add_argument("--delete-concurrency", type=int, default=4)
+    parser.add_argument(
+        "--engine", choices=s3_gfs_main.SELECTION_ENGINES, default="python"
+    )
+    parser.add_argument("--backend", choices=("fake-s3", "memory"), default="fake-s3")
+    parser.add_argument(
+        "--parse-workers", type=int, default=1, help="processes for the build_plan phase"
+    )
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--compare", help="previous results JSON to diff against")
+    args = parser.parse_args()
+
+    os.environ["S3_GFS_ENGINE"] = args.engine
+    # Dry-run planning logs every key at INFO.
+    logging.getLogger(s3_gfs_main.__name__).setLevel(logging.WARNING)
+    policy = s3_gfs_main.RetentionPolicy(
+        keep_daily=args.keep_daily,
+        keep_weekly=args.keep_weekly,
+        keep_monthly=args.keep_monthly,
+        keep_hourly=args.keep_hourly,
+        keep_yearly=args.keep_yearly,
+    )
+
+    rows: List[Dict] = []
+    for key_format in args.formats.split(","):
+        for objects in (int(n) for n in args.objects.split(",")):
+            scenario_rows = run_scenario(
+                objects,
+                key_format,
+                objects_per_group=args.objects_per_group,
+                unparsed_ratio=args.unparsed_ratio,
+                policy=policy,
+                min_remaining=args.min_remaining,
+                delete_concurrency=args.delete_concurrency,
+                backend_name=args.backend,
+                parse_workers=args.parse_workers,
+            )
+            for row in scenario_rows:
+                print(
+                    f"{row['scenario']:<22} {row['phase']:<16} {row['seconds']:10.4f}s "
+                    f"{row['objects_per_sec'] or 0:>12,} obj/s"
+                )
+            rows.extend(scenario_rows)
+
+    document = {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": rows,
+    }
+    with open(args.output, "w", encoding="utf-8") as fh:
+        json.dump(document, fh, indent=2)
+    print(f"\nwrote {args.output}")
+
+    if args.compare:
+        compare(rows, args.compare)
+
+
+if __name__ == "__main__":
+    main()
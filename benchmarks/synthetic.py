@@ -0,0 +1,94 @@
+"""
+Synthetic backup key sets for the benchmarks.
+
+Each `KeyFormat` knows how to render a key for (group timestamp, member
+index) and carries the `S3_GFS_REGEX`/`S3_GFS_TIMESTAMP_FORMAT` pair that
+parses it back.
+"""
+from __future__ import annotations
+
+import random
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List
+
+
+@dataclass(frozen=True)
+class KeyFormat:
+    name: str
+    regex: str
+    timestamp_format: str
+    render: Callable[[datetime, int], str]
+
+    def compile(self) -> "re.Pattern[str]":
+        return re.compile(self.regex)
+
+
+def _home_assistant(ts: datetime, member: int) -> str:
+    stem = f"Automatic_backup_2025.11.1_{ts:%Y-%m-%d_%H.%M}_{ts:%d%H%M}{member:02d}"
+    return f"{stem}.tar" if member == 0 else f"{stem}.part{member:05d}.metadata.json"
+
+
+def _iso_folder(ts: datetime, member: int) -> str:
+    return f"db/{ts:%Y-%m-%dT%H:%M:%SZ}/part-{member:05d}"
+
+
+def _compact(ts: datetime, member: int) -> str:
+    return f"backups/host-a/backup_{ts:%Y%m%dT%H%M%S}_{member:05d}.tar.zst"
+
+
+FORMATS: Dict[str, KeyFormat] = {
+    "ha": KeyFormat(
+        "ha",
+        r"Automatic_backup_\d+\.\d+\.\d+_(\d{4}-\d{2}-\d{2}_\d{2}\.\d{2})_",
+        "%Y-%m-%d_%H.%M",
+        _home_assistant,
+    ),
+    "iso-folder": KeyFormat(
+        "iso-folder",
+        r"^db/(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z)/",
+        "%Y-%m-%dT%H:%M:%SZ",
+        _iso_folder,
+    ),
+    "compact": KeyFormat(
+        "compact",
+        r"backup_(\d{8}T\d{6})_",
+        "%Y%m%dT%H%M%S",
+        _compact,
+    ),
+}
+
+
+def group_timestamps(groups: int, interval: timedelta = timedelta(hours=6)) -> List[datetime]:
+    """`groups` timestamps spaced `interval` apart, ending 2026-01-09 04:45."""
+    end = datetime(2026, 1, 9, 4, 45)
+    return [end - interval * (groups - 1 - i) for i in range(groups)]
+
+
+def generate_keys(
+    objects: int,
+    *,
+    key_format: str = "ha",
+    objects_per_group: int = 2,
+    unparsed_ratio: float = 0.0,
+    seed: int = 0,
+) -> Iterator[str]:
+    """
+    Yields about `objects` keys: backup groups of `objects_per_group`
+    members, with roughly `unparsed_ratio` of all keys being unrelated
+    objects that the regex does not match. Deterministic for a given seed.
+    """
+    fmt = FORMATS[key_format]
+    rng = random.Random(seed)
+    backup_objects = int(objects * (1.0 - unparsed_ratio))
+    groups = max(backup_objects // max(objects_per_group, 1), 1)
+    unparsed_left = objects - groups * objects_per_group
+    for ts in group_timestamps(groups):
+        for member in range(objects_per_group):
+            yield fmt.render(ts, member)
+        while unparsed_left > 0 and rng.random() < unparsed_ratio * 2:
+            yield f"misc/{rng.getrandbits(64):016x}.log"
+            unparsed_left -= 1
+    for _ in range(max(unparsed_left, 0)):
+        yield f"misc/{rng.getrandbits(64):016x}.log"
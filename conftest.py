@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import importlib.util
+from typing import Mapping
+
+import pytest
+
+import main as s3_gfs_main
+
+# Modules whose tests run once per `select_keepers` engine.
+ENGINE_MODULES = {"test_core"}
+
+
+def pytest_generate_tests(metafunc):
+    if metafunc.module.__name__ in ENGINE_MODULES:
+        metafunc.parametrize(
+            "selection_engine",
+            [
+                "python",
+                pytest.param(
+                    "numpy",
+                    marks=pytest.mark.skipif(
+                        importlib.util.find_spec("numpy") is None,
+                        reason="numpy is not installed",
+                    ),
+                ),
+            ],
+            indirect=True,
+        )
+
+
+@pytest.fixture(autouse=True)
+def selection_engine(request, monkeypatch):
+    """Sets `S3_GFS_ENGINE` for tests parametrized over the engines."""
+    engine = getattr(request, "param", None)
+    if engine is not None:
+        monkeypatch.setenv("S3_GFS_ENGINE", engine)
+    return engine
+
+
+@pytest.fixture
+def main_runtime(monkeypatch):
+    """
+    Returns `setup(client, env, **overrides)`: sets the environment for
+    `main()` and gives it a fresh `RuntimeContext` whose S3 client is
+    `client`.
+    """
+
+    def setup(client, env: Mapping[str, str] = {}, **overrides: str) -> None:
+        for name, value in {**env, **overrides}.items():
+            monkeypatch.setenv(name, value)
+        monkeypatch.setattr(s3_gfs_main, "_RUNTIME", s3_gfs_main.RuntimeContext())
+        monkeypatch.setattr(s3_gfs_main._RUNTIME, "s3_client", lambda *_args: client)
+
+    return setup
+
+
+@pytest.fixture
+def run_main(main_runtime):
+    """Returns `run(client, env, **overrides)`: `main_runtime` then `main()`."""
+
+    def run(client, env: Mapping[str, str] = {}, **overrides: str) -> dict:
+        main_runtime(client, env, **overrides)
+        return s3_gfs_main.main()
+
+    return run
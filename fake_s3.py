@@ -0,0 +1,184 @@
+"""
+In-process stand-in for the subset of the boto3 S3 client used by main.py.
+
+Used by the tests and benchmarks; never imported by main.py itself.
+"""
+from __future__ import annotations
+
+import bisect
+import hashlib
+import io
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Mapping, Optional
+
+from botocore.exceptions import ClientError
+
+_PRECONDITION_FAILED = "At least one of the pre-conditions you specified did not hold"
+
+# LastModified of keys created without an explicit one.
+DEFAULT_LAST_MODIFIED = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+class FakeS3Client:
+    def __init__(
+        self,
+        keys: Iterable[str] = (),
+        *,
+        latency: float = 0.0,
+        fail_keys: Iterable[str] = (),
+        last_modified: Optional[Mapping[str, datetime]] = None,
+    ):
+        self._keys: List[str] = sorted(set(keys))
+        self.last_modified: Dict[str, datetime] = dict(last_modified or {})
+        self._lock = threading.Lock()
+        self.latency = latency
+        self.fail_keys = set(fail_keys)
+        self.calls: Counter = Counter()
+        self.deleted: List[str] = []
+        self.bodies: Dict[str, bytes] = {}
+
+    @property
+    def keys(self) -> List[str]:
+        return list(self._keys)
+
+    def _record(self, name: str) -> None:
+        with self._lock:
+            self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def list_objects_v2(
+        self,
+        *,
+        Bucket: str,
+        Prefix: str = "",
+        MaxKeys: int = 1000,
+        ContinuationToken: Optional[str] = None,
+        StartAfter: Optional[str] = None,
+        Delimiter: Optional[str] = None,
+    ) -> Dict:
+        self._record("list_objects_v2")
+        with self._lock:
+            keys = self._keys
+            after = ContinuationToken if ContinuationToken is not None else StartAfter
+            if after is not None and after >= Prefix:
+                pos = bisect.bisect_right(keys, after)
+            else:
+                pos = bisect.bisect_left(keys, Prefix)
+
+            contents: List[Dict] = []
+            prefixes: List[str] = []
+            last = None
+            while pos < len(keys) and len(contents) + len(prefixes) < MaxKeys:
+                key = keys[pos]
+                if not key.startswith(Prefix):
+                    break
+                if Delimiter:
+                    cut = key.find(Delimiter, len(Prefix))
+                    if cut >= 0:
+                        common = key[: cut + len(Delimiter)]
+                        prefixes.append(common)
+                        # Skip every key under this common prefix.
+                        last = common + "\U0010ffff"
+                        pos = bisect.bisect_right(keys, last)
+                        continue
+                contents.append(
+                    {
+                        "Key": key,
+                        "LastModified": self.last_modified.get(key, DEFAULT_LAST_MODIFIED),
+                    }
+                )
+                last = key
+                pos += 1
+
+            truncated = pos < len(keys) and keys[pos].startswith(Prefix)
+
+        resp: Dict = {"KeyCount": len(contents) + len(prefixes), "IsTruncated": truncated}
+        if contents:
+            resp["Contents"] = contents
+        if prefixes:
+            resp["CommonPrefixes"] = [{"Prefix": p} for p in prefixes]
+        if truncated:
+            resp["NextContinuationToken"] = last
+        return resp
+
+    def delete_objects(self, *, Bucket: str, Delete: Dict) -> Dict:
+        self._record("delete_objects")
+        objects = Delete["Objects"]
+        if len(objects) > 1000:
+            raise ValueError("delete_objects accepts at most 1000 keys")
+        errors = [
+            {"Key": obj["Key"], "Code": "AccessDenied", "Message": "Access Denied"}
+            for obj in objects
+            if obj["Key"] in self.fail_keys
+        ]
+        if errors:
+            return {"Errors": errors}
+        with self._lock:
+            keys = self._keys
+            positions = []
+            for obj in objects:
+                key = obj["Key"]
+                pos = bisect.bisect_left(keys, key)
+                if pos < len(keys) and keys[pos] == key:
+                    positions.append(pos)
+                self.deleted.append(key)
+            # Delete contiguous runs back to front: one memmove per run
+            # instead of one per key keeps large benchmark buckets fast.
+            positions = sorted(set(positions))
+            end = None
+            for pos in reversed(positions):
+                if end is None:
+                    start = end = pos
+                elif pos == start - 1:
+                    start = pos
+                else:
+                    del keys[start : end + 1]
+                    start = end = pos
+            if end is not None:
+                del keys[start : end + 1]
+        return {}
+
+    def put_object(
+        self,
+        *,
+        Bucket: str,
+        Key: str,
+        Body: bytes = b"",
+        IfNoneMatch: Optional[str] = None,
+        IfMatch: Optional[str] = None,
+        **_kwargs,
+    ) -> Dict:
+        self._record("put_object")
+        with self._lock:
+            if IfMatch is not None and Key not in self.bodies:
+                raise _error("NoSuchKey", "The specified key does not exist.", "PutObject")
+            if (IfNoneMatch == "*" and Key in self.bodies) or (
+                IfMatch is not None and IfMatch != self._etag(Key)
+            ):
+                raise _error("PreconditionFailed", _PRECONDITION_FAILED, "PutObject")
+            pos = bisect.bisect_left(self._keys, Key)
+            if pos == len(self._keys) or self._keys[pos] != Key:
+                self._keys.insert(pos, Key)
+            self.bodies[Key] = bytes(Body)
+            self.last_modified[Key] = datetime.now(timezone.utc)
+        return {}
+
+    def get_object(self, *, Bucket: str, Key: str, **_kwargs) -> Dict:
+        self._record("get_object")
+        with self._lock:
+            body = self.bodies.get(Key)
+            etag = self._etag(Key) if body is not None else None
+        if body is None:
+            raise _error("NoSuchKey", "The specified key does not exist.", "GetObject")
+        return {"Body": io.BytesIO(body), "ETag": etag}
+
+    def _etag(self, key: str) -> str:
+        return '"%s"' % hashlib.md5(self.bodies[key]).hexdigest()
+
+
+def _error(code: str, message: str, operation: str) -> ClientError:
+    return ClientError({"Error": {"Code": code, "Message": message}}, operation)
@@ -1,337 +1,3466 @@
 from __future__ import annotations
 
+import bisect
+import json
 import os
+import queue
 import re
-from dataclasses import dataclass
-from datetime import datetime, timezone
+import threading
+import time
+from array import array
+from collections import OrderedDict, deque
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import islice
+from datetime import datetime, timedelta, timezone
 import logging
-from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import unquote_plus
+from typing import (
+    Callable,
+    Deque,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TYPE_CHECKING,
+    TypeVar,
+    Union,
+)
 
-import boto3
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+try:  # already loaded by `re`
+    from re import _parser as _re_parser
+except ImportError:  # Python < 3.11
+    import sre_parse as _re_parser  # type: ignore[no-redef]
 
 DecisionTuple = Tuple[str, str, str]  # (key, decision, tag) decision=keep/remove/ignore
 logger = logging.getLogger(__name__)
+T = TypeVar("T")
+
+DELETE_BATCH_SIZE = 1000
+TIMESTAMP_CACHE_SIZE = 4096
+# Smallest key list that `build_plan` parses on a process pool.
+PARALLEL_PARSE_THRESHOLD = 200_000
+
+
+# Most specific first; this is also the order tiers claim groups in.
+RETENTION_TIERS = ("hourly", "daily", "weekly", "monthly", "yearly")
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    keep_daily: int = 7
+    keep_weekly: int = 4
+    keep_monthly: int = 12
+    keep_hourly: int = 0
+    keep_yearly: int = 0
+
+    def tiers(self) -> List[Tuple[str, int]]:
+        """(tier, keep_n) for every enabled tier, most specific first."""
+        return [
+            (tier, keep_n)
+            for tier in RETENTION_TIERS
+            if (keep_n := getattr(self, f"keep_{tier}")) > 0
+        ]
+
+
+@dataclass
+class GroupSummary:
+    """
+    Per-timestamp object counts collected in a single pass over a key stream.
+    Memory scales with the number of backup groups, not the number of objects.
+    """
+
+    counts: Dict[datetime, int] = field(default_factory=dict)
+    unparsed: int = 0
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values()) + self.unparsed
+
+
+class GroupRecord:
+    """
+    One backup group: every key sharing a parsed timestamp, plus the
+    retention decision and the tiers that kept it (most general first).
+    """
+
+    __slots__ = ("timestamp", "keys", "decision", "tags")
+
+    def __init__(
+        self,
+        timestamp: datetime,
+        keys: Sequence[str],
+        decision: str = "remove",
+        tags: Tuple[str, ...] = (),
+    ) -> None:
+        self.timestamp = timestamp
+        self.keys = keys
+        self.decision = decision
+        self.tags = tags
+
+    @property
+    def tag(self) -> str:
+        return ",".join(self.tags)
+
+    def __repr__(self) -> str:
+        return (
+            f"GroupRecord({self.timestamp.isoformat()}, keys={len(self.keys)}, "
+            f"decision={self.decision!r}, tags={self.tags!r})"
+        )
+
+
+class RetentionPlan:
+    """
+    Structured result of `build_plan`: groups oldest-first, then the keys
+    that did not parse (original order). `apply_removal` consumes this
+    directly; `decisions()` flattens it to the `DecisionTuple` list.
+    """
+
+    __slots__ = ("groups", "unparsed")
+
+    def __init__(self, groups: List[GroupRecord], unparsed: Sequence[str]) -> None:
+        self.groups = groups
+        self.unparsed = unparsed
+
+    @property
+    def total(self) -> int:
+        return sum(len(g.keys) for g in self.groups) + len(self.unparsed)
+
+    def decisions(self) -> "DecisionList":
+        out = DecisionList()
+        for group in self.groups:
+            decision = group.decision
+            tag = group.tag
+            out.extend((k, decision, tag) for k in group.keys)
+        out.extend((k, "ignore", "unparsed") for k in self.unparsed)
+        out.plan = self
+        return out
+
+
+class DecisionList(list):
+    """
+    `List[DecisionTuple]` as returned by `core_logic`, carrying the
+    `RetentionPlan` it was flattened from so `apply_removal` can skip
+    re-parsing every key. Any in-place edit drops the plan, after which the
+    list is treated like any hand-built decision list.
+    """
+
+    __slots__ = ("plan",)
+
+    def __init__(self, *args) -> None:
+        super().__init__(*args)
+        self.plan: Optional[RetentionPlan] = None
+
+    def __setitem__(self, index, value) -> None:
+        self.plan = None
+        super().__setitem__(index, value)
+
+    def __delitem__(self, index) -> None:
+        self.plan = None
+        super().__delitem__(index)
+
+    def __iadd__(self, other):
+        self.plan = None
+        return super().__iadd__(other)
+
+    def __imul__(self, n):
+        self.plan = None
+        return super().__imul__(n)
+
+    def append(self, item) -> None:
+        self.plan = None
+        super().append(item)
+
+    def extend(self, items) -> None:
+        self.plan = None
+        super().extend(items)
+
+    def insert(self, index, item) -> None:
+        self.plan = None
+        super().insert(index, item)
+
+    def pop(self, index=-1):
+        self.plan = None
+        return super().pop(index)
+
+    def remove(self, item) -> None:
+        self.plan = None
+        super().remove(item)
+
+    def reverse(self) -> None:
+        self.plan = None
+        super().reverse()
+
+    def sort(self, *args, **kwargs) -> None:
+        self.plan = None
+        super().sort(*args, **kwargs)
+
+    def clear(self) -> None:
+        self.plan = None
+        super().clear()
+
+
+def _shared_prefix(a: bytes, b: bytes) -> int:
+    """Length of the common prefix of `a` and `b`, by bisecting on slices."""
+    n = min(len(a), len(b))
+    if a[:n] == b[:n]:
+        return n
+    lo, hi = 0, n  # a[:lo] == b[:lo] and a[:hi] != b[:hi]
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+
+class CompactKeys:
+    """
+    Append-only, front-coded key store. Keys are kept UTF-8 encoded in one
+    `bytearray`, in blocks of `BLOCK` keys: the first key of a block is
+    stored whole and every other key as the number of leading bytes it
+    shares with the previous key plus the remaining bytes. Listing order is
+    sorted, so backup keys, which differ only near the end, cost a few bytes
+    each instead of a `str` object apiece.
+
+    Random access decodes at most one block; iteration decodes sequentially.
+    """
+
+    BLOCK = 16
+    __slots__ = ("_data", "_blocks", "_count", "_last")
+
+    def __init__(self, keys: Iterable[str] = ()) -> None:
+        self._data = bytearray()
+        self._blocks = array("Q")  # byte offset where each block starts
+        self._count = 0
+        self._last = b""
+        for key in keys:
+            self.append(key)
+
+    def append(self, key: str) -> int:
+        """Stores `key` and returns its index."""
+        raw = key.encode("utf-8")
+        data = self._data
+        index = self._count
+        if index % self.BLOCK:
+            shared = _shared_prefix(self._last, raw)
+        else:
+            self._blocks.append(len(data))
+            shared = 0
+        _put_varint(data, shared)
+        _put_varint(data, len(raw) - shared)
+        data += raw[shared:] if shared else raw
+        self._last = raw
+        self._count = index + 1
+        return index
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes used by the encoded keys and the block offsets."""
+        return len(self._data) + self._blocks.itemsize * len(self._blocks)
+
+    def _decode(self, start: int) -> Iterator[str]:
+        """Decodes keys from index `start` to the end."""
+        data = self._data
+        block, skip = divmod(start, self.BLOCK)
+        if block >= len(self._blocks):
+            return
+        pos = self._blocks[block]
+        end = len(data)
+        prev = b""
+        while pos < end:
+            shared, pos = _get_varint(data, pos)
+            size, pos = _get_varint(data, pos)
+            if shared:
+                raw = prev[:shared] + data[pos : pos + size]
+            else:
+                raw = bytes(data[pos : pos + size])
+            pos += size
+            prev = raw
+            if skip:
+                skip -= 1
+                continue
+            yield raw.decode("utf-8")
+
+    def __iter__(self) -> Iterator[str]:
+        return self._decode(0)
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("CompactKeys index out of range")
+        return next(self._decode(index))
+
+    def view(self, indices: "array[int]") -> "CompactKeyView":
+        return CompactKeyView(self, indices)
+
+
+def _put_varint(data: bytearray, value: int) -> None:
+    while value >= 0x80:
+        data.append((value & 0x7F) | 0x80)
+        value >>= 7
+    data.append(value)
+
+
+def _get_varint(data: bytearray, pos: int) -> Tuple[int, int]:
+    value = data[pos]
+    pos += 1
+    if value < 0x80:
+        return value, pos
+    value &= 0x7F
+    shift = 7
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class CompactKeyView(Sequence[str]):
+    """
+    Read-only list of the keys of a `CompactKeys` whose indices are
+    `indices[start:stop]` (ascending). Stands in for the key lists of
+    `GroupRecord.keys` and `RetentionPlan.unparsed`; many views share one
+    index array.
+    """
+
+    __slots__ = ("store", "indices", "start", "stop")
+
+    def __init__(
+        self,
+        store: CompactKeys,
+        indices: "array[int]",
+        start: int = 0,
+        stop: Optional[int] = None,
+    ) -> None:
+        self.store = store
+        self.indices = indices
+        self.start = start
+        self.stop = len(indices) if stop is None else stop
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def __getitem__(self, index):  # type: ignore[override]
+        if isinstance(index, slice):
+            return list(islice(self, *index.indices(len(self))))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("CompactKeyView index out of range")
+        return self.store[self.indices[self.start + index]]
+
+    def __iter__(self) -> Iterator[str]:
+        # Consecutive indices (a group listed contiguously) decode as one run.
+        decoder: Optional[Iterator[str]] = None
+        expected = -1
+        for i in islice(self.indices, self.start, self.stop):
+            if decoder is None or i != expected:
+                decoder = self.store._decode(i)
+            expected = i + 1
+            yield next(decoder)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (list, tuple, CompactKeyView)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"CompactKeyView({len(self)} keys)"
+
+
+class _CompactGroups(Sequence[GroupRecord]):
+    """
+    `RetentionPlan.groups` of a compact plan. Groups are integer ids into
+    parallel arrays (timestamp in epoch microseconds, offset of their keys
+    in `order`), and a `GroupRecord` is only built when a group is read.
+    `kept` maps the ids of kept groups to their tags.
+    """
+
+    __slots__ = ("store", "stamps", "offsets", "order", "kept")
+
+    def __init__(
+        self,
+        store: CompactKeys,
+        stamps: "array[int]",
+        offsets: "array[int]",
+        order: "array[int]",
+        kept: Dict[int, Tuple[str, ...]],
+    ) -> None:
+        self.store = store
+        self.stamps = stamps
+        self.offsets = offsets
+        self.order = order
+        self.kept = kept
+
+    def __len__(self) -> int:
+        return len(self.stamps)
+
+    def _record(self, gid: int) -> GroupRecord:
+        keys = CompactKeyView(self.store, self.order, self.offsets[gid], self.offsets[gid + 1])
+        dt = _EPOCH + timedelta(microseconds=self.stamps[gid])
+        tags = self.kept.get(gid)
+        if tags is None:
+            return GroupRecord(dt, keys)
+        return GroupRecord(dt, keys, "keep", tags)
+
+    def __getitem__(self, index):  # type: ignore[override]
+        if isinstance(index, slice):
+            return [self._record(gid) for gid in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("group index out of range")
+        return self._record(index)
+
+    def __iter__(self) -> Iterator[GroupRecord]:
+        return map(self._record, range(len(self)))
+
+
+# strptime directives the fast path understands: width and datetime() slot.
+_FIXED_WIDTH_DIRECTIVES = {
+    "Y": (4, 0),
+    "m": (2, 1),
+    "d": (2, 2),
+    "H": (2, 3),
+    "M": (2, 4),
+    "S": (2, 5),
+}
+
+
+class TimestampParser:
+    """
+    `datetime.strptime(text, fmt)` compiled once per format.
+
+    Formats built only from fixed-width `%Y %m %d %H %M %S` directives,
+    `%%` and literal characters are turned into an anchored ASCII regex and
+    parsed with `int()`. Anything the fast path cannot handle - other
+    directives, non-padded numbers, case-insensitive literal matches,
+    out-of-range values - falls back to `strptime`, so results are always
+    identical to it. Returns a UTC datetime, or None if `text` does not parse.
+
+    Results are memoized per captured text in an LRU cache of `cache_size`
+    entries (0 disables it): objects of one backup group share the same
+    capture, so most lookups after the first are hits. `hits`/`misses`
+    count cache lookups since the last `reset_stats()`.
+    """
+
+    __slots__ = (
+        "format",
+        "_regex",
+        "_slots",
+        "_in_order",
+        "_cache",
+        "cache_size",
+        "hits",
+        "misses",
+    )
+
+    def __init__(self, timestamp_format: str, cache_size: int = TIMESTAMP_CACHE_SIZE) -> None:
+        self.format = timestamp_format
+        self._cache: "OrderedDict[str, Optional[datetime]]" = OrderedDict()
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._regex: Optional[re.Pattern[str]] = None
+        self._slots: Tuple[int, ...] = ()
+        compiled = self._compile(timestamp_format)
+        if compiled is not None:
+            self._regex, self._slots = compiled
+        # e.g. %Y..%M: groups map straight onto datetime()'s leading arguments
+        self._in_order = self._slots == tuple(range(len(self._slots)))
+
+    @staticmethod
+    def _compile(timestamp_format: str) -> Optional[Tuple[re.Pattern[str], Tuple[int, ...]]]:
+        parts: List[str] = []
+        slots: List[int] = []
+        i = 0
+        while i < len(timestamp_format):
+            ch = timestamp_format[i]
+            if ch != "%":
+                parts.append(re.escape(ch))
+                i += 1
+                continue
+            directive = timestamp_format[i + 1 : i + 2]
+            i += 2
+            if directive == "%":
+                parts.append("%")
+                continue
+            spec = _FIXED_WIDTH_DIRECTIVES.get(directive)
+            if spec is None:
+                return None
+            width, slot = spec
+            if slot in slots:
+                return None
+            parts.append(f"([0-9]{{{width}}})")
+            slots.append(slot)
+        if not slots:
+            return None
+        return re.compile("".join(parts), re.ASCII), tuple(slots)
+
+    @property
+    def compiled(self) -> bool:
+        return self._regex is not None
+
+    def reset_stats(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def cache_info(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._cache),
+            "max_size": self.cache_size,
+        }
+
+    def __call__(self, text: str) -> Optional[datetime]:
+        if self.cache_size <= 0:
+            return self._parse(text)
+        cache = self._cache
+        try:
+            dt = cache[text]
+        except KeyError:
+            self.misses += 1
+        else:
+            self.hits += 1
+            cache.move_to_end(text)
+            return dt
+        dt = self._parse(text)
+        cache[text] = dt
+        while len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return dt
+
+    def _parse(self, text: str) -> Optional[datetime]:
+        if self._regex is not None:
+            m = self._regex.fullmatch(text)
+            if m is not None:
+                if self._in_order and len(self._slots) >= 3:
+                    fields = list(map(int, m.groups()))
+                else:
+                    # strptime defaults for fields missing from the format
+                    fields = [1900, 1, 1, 0, 0, 0]
+                    for slot, value in zip(self._slots, m.groups()):
+                        fields[slot] = int(value)
+                try:
+                    return datetime(*fields, tzinfo=timezone.utc)
+                except ValueError:
+                    pass
+        try:
+            dt = datetime.strptime(text, self.format)
+        except ValueError:
+            return None
+        return dt.replace(tzinfo=timezone.utc)
+
+
+@lru_cache(maxsize=32)
+def get_timestamp_parser(timestamp_format: str) -> TimestampParser:
+    return TimestampParser(timestamp_format)
+
+
+def parse_timestamp_from_key(
+    key: str,
+    filename_ts_re: re.Pattern[str],
+    timestamp_format: str,
+) -> Optional[datetime]:
+    """
+    Parse a UTC timestamp from the object key using the provided regex.
+    Returns timezone-aware UTC datetime if match; otherwise None.
+    """
+    m = filename_ts_re.search(key)
+    if not m:
+        return None
+    try:
+        ts = m.group(1)
+    except IndexError:
+        return None
+    return get_timestamp_parser(timestamp_format)(ts)
+
+
+# name -> CloudWatch unit for everything `RunMetrics` can report.
+_METRIC_UNITS = {
+    "RunTime": "Milliseconds",
+    "ListingTime": "Milliseconds",
+    "ParsingTime": "Milliseconds",
+    "SelectionTime": "Milliseconds",
+    "PlanningTime": "Milliseconds",
+    "DeletionTime": "Milliseconds",
+    "ListObjectsV2Calls": "Count",
+    "DeleteObjectsCalls": "Count",
+    "KeysListed": "Count",
+    "KeysParsed": "Count",
+    "KeysUnparsed": "Count",
+    "Groups": "Count",
+    "KeysDeleted": "Count",
+    "GroupsDeleted": "Count",
+    "KeysPerSecond": "Count/Second",
+    "TimestampCacheHitRate": "Percent",
+}
+
+
+class RunMetrics:
+    """
+    Phase timings and counters for one run, emitted as a single CloudWatch
+    Embedded Metric Format (EMF) document.
+
+    Phases accumulate wall time: `ListingTime` is summed over every
+    `list_objects_v2` call (across threads when listing is partitioned),
+    and `ParsingTime` includes waiting on the listing stream it consumes.
+    Instrumented code reaches the active instance through `_METRICS`, which
+    is None unless metrics are enabled, so disabled runs pay one global
+    lookup per page, batch or phase.
+    """
+
+    def __init__(self, namespace: str, dimensions: Mapping[str, str]) -> None:
+        self.namespace = namespace
+        self.dimensions = dict(dimensions)
+        self.values: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def add(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.values[name] = self.values.get(name, 0) + value
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(f"{name}Time", (time.perf_counter() - started) * 1000)
+
+    def to_emf(self, properties: Optional[Mapping[str, object]] = None) -> dict:
+        values = dict(self.values)
+        values["RunTime"] = (time.perf_counter() - self._started) * 1000
+        parsing_ms = values.get("ParsingTime")
+        if parsing_ms:
+            values["KeysPerSecond"] = (
+                values.get("KeysParsed", 0) + values.get("KeysUnparsed", 0)
+            ) * 1000 / parsing_ms
+        names = [name for name in _METRIC_UNITS if name in values]
+        return {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": self.namespace,
+                        "Dimensions": [list(self.dimensions)],
+                        "Metrics": [{"Name": n, "Unit": _METRIC_UNITS[n]} for n in names],
+                    }
+                ],
+            },
+            **self.dimensions,
+            **(properties or {}),
+            **{name: values[name] for name in names},
+        }
+
+
+_NO_PHASE = nullcontext()
+PROFILE_MODES = ("cpu", "memory")
+# Timed per request, far too fine-grained to profile on its own; listing
+# calls show up in the profile of the phase consuming the listing.
+_UNPROFILED_PHASES = frozenset({"Listing"})
+
+
+class RunProfiler:
+    """
+    cProfile and/or tracemalloc over one run, broken down by phase.
+
+    Only phases entered on the thread that called `start()` are profiled;
+    work done on listing/delete worker threads shows up as the waiting time
+    of the phase that consumes it. CPU profiles are kept per phase: entering
+    a phase pauses the enclosing one, so each function is charged to the
+    innermost phase, and anything outside every phase goes to "Run". Memory
+    mode diffs tracemalloc snapshots taken around each phase and records the
+    phase's peak traced memory.
+    """
+
+    def __init__(self, modes: Sequence[str], top: int = 20) -> None:
+        self.cpu = "cpu" in modes
+        self.memory = "memory" in modes
+        self.top = top
+        self.cpu_profiles: Dict[str, object] = {}
+        self.allocations: Dict[str, Dict[object, List[int]]] = {}
+        self.peaks: Dict[str, int] = {}
+        self._stack: List[object] = []
+        self._thread: Optional[int] = None
+        self._started_tracemalloc = False
+
+    def _profile(self, name: str):
+        import cProfile
+
+        profile = self.cpu_profiles.get(name)
+        if profile is None:
+            profile = self.cpu_profiles[name] = cProfile.Profile()
+        return profile
+
+    def start(self) -> None:
+        self._thread = threading.get_ident()
+        if self.memory:
+            import tracemalloc
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+        if self.cpu:
+            profile = self._profile("Run")
+            self._stack.append(profile)
+            profile.enable()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._thread = None
+        while self._stack:
+            self._stack.pop().disable()
+        if self._started_tracemalloc:
+            import tracemalloc
+
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    @contextmanager
+    def phase(self, name: str, inner=_NO_PHASE) -> Iterator[None]:
+        if threading.get_ident() != self._thread or name in _UNPROFILED_PHASES:
+            with inner:
+                yield
+            return
+
+        # Snapshot bookkeeping runs with no CPU profile enabled, so it is
+        # not charged to any phase.
+        if self._stack:
+            self._stack[-1].disable()
+        before = None
+        if self.memory:
+            import tracemalloc
+
+            before = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+        if self.cpu:
+            profile = self._profile(name)
+            self._stack.append(profile)
+            profile.enable()
+        try:
+            with inner:
+                yield
+        finally:
+            if self.cpu:
+                self._stack.pop().disable()
+            if before is not None:
+                self._record_allocations(name, before)
+            if self._stack:
+                self._stack[-1].enable()
+
+    def _record_allocations(self, name: str, before) -> None:
+        import tracemalloc
+
+        after = tracemalloc.take_snapshot()
+        self.peaks[name] = max(self.peaks.get(name, 0), tracemalloc.get_traced_memory()[1])
+        sites = self.allocations.setdefault(name, {})
+        for stat in after.compare_to(before, "lineno"):
+            if stat.traceback[0].filename == tracemalloc.__file__:
+                continue
+            if stat.size_diff or stat.count_diff:
+                totals = sites.setdefault(stat.traceback, [0, 0])
+                totals[0] += stat.size_diff
+                totals[1] += stat.count_diff
+
+    def report(self) -> str:
+        """Top functions (by cumulative time) and allocation sites per phase."""
+        import io
+        import pstats
+
+        out = io.StringIO()
+        for name, profile in self.cpu_profiles.items():
+            stats = pstats.Stats(profile, stream=out)
+            out.write(f"== cpu: {name} ({stats.total_tt:.3f}s) ==\n")
+            stats.sort_stats("cumulative").print_stats(self.top)
+        for name, sites in self.allocations.items():
+            net = sum(size for size, _count in sites.values())
+            out.write(
+                f"== memory: {name} (net {net / 1024:+.1f} KiB, "
+                f"peak {self.peaks.get(name, 0) / 1024:.1f} KiB) ==\n"
+            )
+            ranked = sorted(sites.items(), key=lambda item: abs(item[1][0]), reverse=True)
+            for traceback, (size, count) in ranked[: self.top]:
+                out.write(f"{size / 1024:+10.1f} KiB {count:+8d} blocks  {traceback}\n")
+        return out.getvalue()
+
+
+_METRICS: Optional[RunMetrics] = None
+_PROFILER: Optional[RunProfiler] = None
+
+
+def _count(name: str, value: float = 1) -> None:
+    metrics = _METRICS
+    if metrics is not None:
+        metrics.add(name, value)
+
+
+def _phase(name: str):
+    metrics = _METRICS
+    inner = _NO_PHASE if metrics is None else metrics.phase(name)
+    profiler = _PROFILER
+    return inner if profiler is None else profiler.phase(name, inner)
+
+
+def _s3_client(region: Optional[str] = None):
+    return _RUNTIME.s3_client(region)
+
+
+def _prefetch(iterable: Iterable[T], depth: int = 2) -> Iterator[T]:
+    """
+    Drains `iterable` on a background thread into a bounded queue, so the
+    producer (S3 listing) overlaps with whatever consumes the items.
+    Producer exceptions are re-raised in the consumer.
+    """
+    q: "queue.Queue[Tuple[object, Optional[BaseException]]]" = queue.Queue(maxsize=max(depth, 1))
+    stop = threading.Event()
+    done = object()
+
+    def put(item: Tuple[object, Optional[BaseException]]) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+        except BaseException as exc:  # re-raised on the consumer side
+            put((done, exc))
+            return
+        put((done, None))
+
+    thread = threading.Thread(target=produce, name="s3-gfs-prefetch", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, exc = q.get()
+            if item is done:
+                if exc is not None:
+                    raise exc
+                return
+            yield item  # type: ignore[misc]
+    finally:
+        stop.set()
+
+
+def iter_key_pages(
+    bucket: str,
+    prefix: str = "",
+    region: Optional[str] = None,
+    *,
+    client=None,
+    start_after: Optional[str] = None,
+) -> Iterator[List[str]]:
+    """
+    Yields object keys one `list_objects_v2` page (up to 1000 keys) at a time,
+    optionally resuming after the `start_after` key.
+    """
+    s3 = client if client is not None else _s3_client(region)
+    return _list_range(s3, bucket, prefix, start_after)
+
+
+def _list_range(
+    s3,
+    bucket: str,
+    prefix: str,
+    start_after: Optional[str] = None,
+    upto: Optional[str] = None,
+    *,
+    last_modified: bool = False,
+) -> Iterator[List]:
+    """
+    Lists keys under `prefix` with start_after < key <= upto (either bound
+    optional), one page at a time. With `last_modified` the pages hold
+    (key, LastModified) pairs taken from the same response.
+    """
+    token = None
+    while True:
+        kwargs = {"Bucket": bucket, "Prefix": prefix, "MaxKeys": 1000}
+        if token:
+            kwargs["ContinuationToken"] = token
+        elif start_after:
+            kwargs["StartAfter"] = start_after
+
+        with _phase("Listing"):
+            resp = s3.list_objects_v2(**kwargs)
+        contents = resp.get("Contents", [])
+        _count("ListObjectsV2Calls")
+        _count("KeysListed", len(contents))
+        done = upto is not None and bool(contents) and contents[-1]["Key"] > upto
+        if done:
+            contents = [item for item in contents if item["Key"] <= upto]
+        if last_modified:
+            yield [(item["Key"], item["LastModified"]) for item in contents]
+        else:
+            yield [item["Key"] for item in contents]
+        if done:
+            return
+
+        if resp.get("IsTruncated"):
+            token = resp.get("NextContinuationToken")
+        else:
+            break
+
+
+def discover_partitions(
+    s3,
+    bucket: str,
+    prefix: str,
+    *,
+    delimiter: str = "/",
+    target: int = 16,
+    max_depth: int = 2,
+) -> List[str]:
+    """
+    Splits the keyspace under `prefix` into common prefixes found with
+    `Delimiter`, returned sorted and non-overlapping. Levels are expanded
+    breadth-first until there are at least `target` prefixes or `max_depth`
+    levels have been walked; a prefix without sub-prefixes stays whole.
+
+    Only the first page of each delimited listing is read and loose keys
+    are not kept, so a flat keyspace costs one call per level here. Keys
+    outside the returned prefixes (loose keys, and prefixes past the first
+    page) are left to `_list_gap`.
+    """
+    prefixes = [prefix]
+    for _depth in range(max_depth):
+        expanded: List[str] = []
+        for value in prefixes:
+            with _phase("Listing"):
+                resp = s3.list_objects_v2(
+                    Bucket=bucket, Prefix=value, Delimiter=delimiter, MaxKeys=1000
+                )
+            _count("ListObjectsV2Calls")
+            children = [p["Prefix"] for p in resp.get("CommonPrefixes", [])]
+            expanded.extend(children or [value])
+        if expanded == prefixes:
+            break
+        prefixes = sorted(expanded)
+        if len(prefixes) >= target:
+            break
+    return prefixes
+
+
+# Sorts after any key that continues a prefix with a valid character, in
+# both code point and UTF-8 byte order.
+_KEY_MAX_CHAR = "\U0010ffff"
+
+
+def _list_gap(
+    s3, bucket: str, prefix: str, lo: Optional[str], hi: Optional[str]
+) -> Iterator[List[str]]:
+    """
+    Lists the keys under `prefix` that sort between the partition prefixes
+    `lo` and `hi` (either optional) without falling under either of them.
+    `StartAfter` skips past everything under `lo`.
+    """
+    start_after = None if lo is None else lo + _KEY_MAX_CHAR
+    for page in _list_range(s3, bucket, prefix, start_after, hi):
+        page = [
+            k
+            for k in page
+            if (lo is None or not k.startswith(lo)) and (hi is None or k < hi)
+        ]
+        if page:
+            yield page
+
+
+def iter_key_pages_partitioned(
+    bucket: str,
+    prefix: str = "",
+    region: Optional[str] = None,
+    *,
+    client=None,
+    concurrency: int = 8,
+    delimiter: str = "/",
+    split_points: Optional[List[str]] = None,
+    queue_pages: int = 2,
+) -> Iterator[List[str]]:
+    """
+    Lists the keyspace as independent partitions on a bounded thread pool
+    and yields pages in the same order as `iter_key_pages`.
+
+    Partitions come from explicit `split_points` (each listed with
+    `StartAfter`) when given, otherwise from the prefixes of
+    `discover_partitions` and the gaps between them. If the keyspace does
+    not split into at least two partitions this falls back to the single
+    continuation chain.
+
+    At most `concurrency` partitions are listed at once, and each pushes
+    its pages into a queue of `queue_pages`; a worker whose queue is full
+    waits for the consumer. Memory therefore stays bounded by
+    concurrency * (queue_pages + 1) pages, as `S3_GFS_STREAMING` needs.
+    """
+    s3 = client if client is not None else _s3_client(region)
+
+    # Each job is a zero-argument callable returning the partition's pages.
+    jobs: List[Callable[[], Iterable[List[str]]]] = []
+    if split_points:
+        bounds = sorted(p for p in split_points if p.startswith(prefix))
+        lows: List[Optional[str]] = [None, *bounds]
+        highs: List[Optional[str]] = [*bounds, None]
+        for lo, hi in zip(lows, highs):
+            jobs.append(lambda lo=lo, hi=hi: _list_range(s3, bucket, prefix, lo, hi))
+    else:
+        prefixes = discover_partitions(
+            s3, bucket, prefix, delimiter=delimiter, target=concurrency * 2
+        )
+        if len(prefixes) >= 2:
+            lows = [None, *prefixes]
+            for lo, hi in zip(lows, [*prefixes, None]):
+                jobs.append(lambda lo=lo, hi=hi: _list_gap(s3, bucket, prefix, lo, hi))
+                if hi is not None:
+                    jobs.append(lambda p=hi: _list_range(s3, bucket, p))
+
+    if len(jobs) < 2:
+        logger.info("Keyspace did not partition; listing as a single chain")
+        yield from iter_key_pages(bucket, prefix, region, client=s3)
+        return
+
+    logger.info("Listing %d partitions with concurrency=%d", len(jobs), concurrency)
+    stop = threading.Event()
+    done = object()
+
+    def put(q: "queue.Queue", item: Tuple[object, Optional[BaseException]]) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce(job: Callable[[], Iterable[List[str]]], q: "queue.Queue") -> None:
+        try:
+            for page in job():
+                if not put(q, (page, None)):
+                    return
+        except BaseException as exc:  # re-raised on the consumer side
+            put(q, (done, exc))
+            return
+        put(q, (done, None))
+
+    # Daemon threads, as in `_prefetch`: a consumer that stops early must
+    # not leave parked workers holding up interpreter exit.
+    feeds: Deque["queue.Queue"] = deque()
+
+    def start(job: Callable[[], Iterable[List[str]]]) -> None:
+        q: "queue.Queue" = queue.Queue(maxsize=max(queue_pages, 1))
+        threading.Thread(target=produce, args=(job, q), name="s3-gfs-list", daemon=True).start()
+        feeds.append(q)
+
+    job_iter = iter(jobs)
+    for job in islice(job_iter, max(concurrency, 1)):
+        start(job)
+    try:
+        while feeds:
+            q = feeds.popleft()
+            while True:
+                page, exc = q.get()
+                if page is done:
+                    if exc is not None:
+                        raise exc
+                    break
+                yield page  # type: ignore[misc]
+            # This partition's worker has finished; its slot goes to the next.
+            next_job = next(job_iter, None)
+            if next_job is not None:
+                start(next_job)
+    finally:
+        stop.set()
+
+
+def iter_keys_from_s3(
+    bucket: str,
+    prefix: str = "",
+    region: Optional[str] = None,
+    *,
+    client=None,
+    prefetch: int = 2,
+    concurrency: int = 1,
+    delimiter: str = "/",
+    split_points: Optional[List[str]] = None,
+    start_after: Optional[str] = None,
+) -> Iterator[str]:
+    """
+    Streams object keys as they are listed. With `prefetch` > 0 the listing
+    runs up to that many pages ahead on a background thread. With
+    `concurrency` > 1 the keyspace is partitioned and listed in parallel
+    (see `iter_key_pages_partitioned`); key order is unchanged. A
+    `start_after` key always lists as a single chain from that point.
+    """
+    if start_after:
+        logger.info("Listing objects from s3://%s/%s after %s", bucket, prefix, start_after)
+    else:
+        logger.info("Listing objects from s3://%s/%s", bucket, prefix)
+    pages: Iterable[List[str]]
+    if start_after:
+        pages = iter_key_pages(bucket, prefix, region, client=client, start_after=start_after)
+    elif concurrency > 1:
+        pages = iter_key_pages_partitioned(
+            bucket,
+            prefix,
+            region,
+            client=client,
+            concurrency=concurrency,
+            delimiter=delimiter,
+            split_points=split_points,
+        )
+    else:
+        pages = iter_key_pages(bucket, prefix, region, client=client)
+    if prefetch > 0:
+        pages = _prefetch(pages, prefetch)
+    count = 0
+    for page in pages:
+        count += len(page)
+        yield from page
+    logger.info("Listed %d object keys", count)
+
+
+def iter_objects_from_s3(
+    bucket: str,
+    prefixes: Sequence[str] = ("",),
+    region: Optional[str] = None,
+    *,
+    client=None,
+    prefetch: int = 2,
+) -> Iterator[Tuple[str, datetime]]:
+    """
+    Streams (key, LastModified) pairs for every object under `prefixes`, in
+    the same order as `iter_keys_from_s3_prefixes`. Each prefix is listed
+    as a single continuation chain.
+    """
+    s3 = client if client is not None else _s3_client(region)
+    count = 0
+    for prefix in prefixes:
+        logger.info("Listing objects with LastModified from s3://%s/%s", bucket, prefix)
+        pages: Iterable[List[Tuple[str, datetime]]] = _list_range(
+            s3, bucket, prefix, last_modified=True
+        )
+        if prefetch > 0:
+            pages = _prefetch(pages, prefetch)
+        for page in pages:
+            count += len(page)
+            yield from page
+    logger.info("Listed %d objects", count)
+
+
+def iter_keys_from_s3_prefixes(
+    bucket: str,
+    prefixes: Sequence[str],
+    region: Optional[str] = None,
+    **kwargs,
+) -> Iterator[str]:
+    """
+    `iter_keys_from_s3` over several prefixes, one after another. With
+    sorted prefixes none of which starts with another (as returned by
+    `listing_prefixes`), the keys come out in the same lexicographic order as
+    a single listing.
+    """
+    for prefix in prefixes:
+        yield from iter_keys_from_s3(bucket, prefix, region, **kwargs)
+
+
+def _iter_common_prefixes(
+    s3,
+    bucket: str,
+    prefix: str,
+    delimiter: str,
+    start_after: Optional[str] = None,
+) -> Iterator[str]:
+    token = None
+    while True:
+        kwargs = {"Bucket": bucket, "Prefix": prefix, "Delimiter": delimiter, "MaxKeys": 1000}
+        if token:
+            kwargs["ContinuationToken"] = token
+        elif start_after:
+            kwargs["StartAfter"] = start_after
+        with _phase("Listing"):
+            resp = s3.list_objects_v2(**kwargs)
+        _count("ListObjectsV2Calls")
+        for common in resp.get("CommonPrefixes", []):
+            yield common["Prefix"]
+        if not resp.get("IsTruncated"):
+            break
+        token = resp.get("NextContinuationToken")
+
+
+def iter_folder_prefixes(
+    bucket: str,
+    prefix: str = "",
+    region: Optional[str] = None,
+    *,
+    client=None,
+    delimiter: str = "/",
+    depth: int = 1,
+    start_after: Optional[str] = None,
+) -> Iterator[str]:
+    """
+    Streams the "folders" `depth` delimiter levels below `prefix`, such as
+    `db/2025-11-01T05:20:00Z/` for `prefix="db/"`, in lexicographic order.
+    They come from `CommonPrefixes`, so a folder costs one list entry no
+    matter how many objects it holds; loose objects are skipped. With
+    `start_after`, only folders holding keys after it are returned.
+    """
+    s3 = client if client is not None else _s3_client(region)
+    logger.info("Listing folders under s3://%s/%s", bucket, prefix)
+
+    def walk(parent: str, level: int) -> Iterator[str]:
+        for folder in _iter_common_prefixes(s3, bucket, parent, delimiter, start_after):
+            if level >= depth:
+                yield folder
+            else:
+                yield from walk(folder, level + 1)
+
+    count = 0
+    for folder in walk(prefix, 1):
+        count += 1
+        yield folder
+    logger.info("Listed %d folders", count)
+
+
+def fetch_from_s3(
+    bucket: str,
+    prefix: str = "",
+    region: Optional[str] = None,
+    *,
+    client=None,
+    start_after: Optional[str] = None,
+) -> List[str]:
+    return list(
+        iter_keys_from_s3(
+            bucket, prefix, region, client=client, prefetch=0, start_after=start_after
+        )
+    )
+
+
+class StorageBackend:
+    """
+    Where the backups live. Retention only needs a lexicographically sorted
+    key stream and batch deletes; everything above that (grouping,
+    selection, the `min_remaining` floor, delete ordering) is shared.
+
+    `capabilities` names the optional features a backend supports:
+      - "start_after": `iter_keys` can resume after a key cheaply
+      - "folders": folder listings for `S3_GFS_FOLDERS` (S3 only)
+    `delete_batch` raises if any key could not be deleted; keys that are
+    already gone count as deleted.
+    """
+
+    capabilities: FrozenSet[str] = frozenset()
+    max_delete_batch = DELETE_BATCH_SIZE
+
+    def uri(self, key: str) -> str:
+        raise NotImplementedError
+
+    def iter_keys(self, prefix: str = "", start_after: Optional[str] = None) -> Iterator[str]:
+        raise NotImplementedError
+
+    def delete_batch(self, keys: List[str]) -> None:
+        raise NotImplementedError
+
+
+class S3Backend(StorageBackend):
+    """S3 bucket; listing options are passed on to `iter_keys_from_s3`."""
+
+    capabilities = frozenset({"start_after", "folders"})
+
+    def __init__(
+        self, bucket: str, region: Optional[str] = None, *, client=None, **list_options
+    ) -> None:
+        self.bucket = bucket
+        self.region = region
+        self._client = client
+        self.list_options = list_options
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = _s3_client(self.region)
+        return self._client
+
+    def uri(self, key: str) -> str:
+        return f"s3://{self.bucket}/{key}"
+
+    def iter_keys(self, prefix: str = "", start_after: Optional[str] = None) -> Iterator[str]:
+        return iter_keys_from_s3(
+            self.bucket,
+            prefix,
+            self.region,
+            client=self.client,
+            start_after=start_after,
+            **self.list_options,
+        )
+
+    def delete_batch(self, keys: List[str]) -> None:
+        _delete_batch(self.client, self.bucket, keys)
+
+
+class MemoryBackend(StorageBackend):
+    """
+    Keys held in memory, for tests and benchmarks that should not pay for a
+    fake S3 round trip per page. Deleted keys are only marked, so a delete
+    costs O(1) however large the key set is.
+    """
+
+    capabilities = frozenset({"start_after"})
+
+    def __init__(self, keys: Iterable[str] = ()) -> None:
+        self._keys: List[str] = sorted(set(keys))
+        self._deleted: Set[str] = set()
+        self.deleted: List[str] = []
+
+    @property
+    def keys(self) -> List[str]:
+        return [k for k in self._keys if k not in self._deleted]
+
+    def uri(self, key: str) -> str:
+        return f"memory://{key}"
+
+    def iter_keys(self, prefix: str = "", start_after: Optional[str] = None) -> Iterator[str]:
+        keys, deleted = self._keys, self._deleted
+        if start_after is not None and start_after >= prefix:
+            pos = bisect.bisect_right(keys, start_after)
+        else:
+            pos = bisect.bisect_left(keys, prefix)
+        for key in islice(keys, pos, None):
+            if not key.startswith(prefix):
+                break
+            if key not in deleted:
+                yield key
+
+    def delete_batch(self, keys: List[str]) -> None:
+        self._deleted.update(keys)
+        self.deleted.extend(keys)
+        _count("KeysDeleted", len(keys))
+
+
+class LocalBackend(StorageBackend):
+    """
+    Files under a local or network-mounted directory; keys are their paths
+    relative to `root` with "/" separators. Directories are read with
+    `os.scandir` and walked depth-first in key order, so only one directory
+    listing per level is held at a time. Each delete batch unlinks its files
+    on `unlink_concurrency` threads (NFS round trips overlap this way) and
+    then removes directories the deletes left empty.
+    """
+
+    capabilities = frozenset({"start_after"})
+
+    def __init__(self, root: str, *, unlink_concurrency: int = 8) -> None:
+        self.root = os.path.abspath(root)
+        self.unlink_concurrency = unlink_concurrency
+
+    def uri(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def _path(self, key: str) -> str:
+        path = os.path.normpath(self.uri(key))
+        if path == self.root or os.path.commonpath([self.root, path]) != self.root:
+            raise ValueError(f"Key escapes the backend root: {key}")
+        return path
+
+    def iter_keys(self, prefix: str = "", start_after: Optional[str] = None) -> Iterator[str]:
+        # Start at the deepest directory the prefix names.
+        base = prefix[: prefix.rfind("/") + 1]
+        stack: List[Iterator[Tuple[str, bool]]] = [iter([(base, True)])]
+        while stack:
+            entry = next(stack[-1], None)
+            if entry is None:
+                stack.pop()
+                continue
+            key, is_dir = entry
+            if not is_dir:
+                if key.startswith(prefix) and (start_after is None or key > start_after):
+                    yield key
+                continue
+            # Only descend where keys can both match the prefix and sort
+            # after `start_after`.
+            if not (key.startswith(prefix) or prefix.startswith(key)):
+                continue
+            if start_after is not None and key < start_after and not start_after.startswith(key):
+                continue
+            try:
+                with os.scandir(os.path.join(self.root, key) if key else self.root) as it:
+                    # A directory sorts as "name/", which keeps the walk in key order.
+                    children = sorted(
+                        (key + e.name + "/", True)
+                        if e.is_dir(follow_symlinks=False)
+                        else (key + e.name, False)
+                        for e in it
+                    )
+            except (FileNotFoundError, NotADirectoryError):
+                # A prefix through a missing path or a file lists nothing.
+                continue
+            stack.append(iter(children))
+
+    def _unlink(self, key: str) -> Optional[str]:
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+        except OSError as exc:
+            return f"{key}: {exc}"
+        return None
+
+    def delete_batch(self, keys: List[str]) -> None:
+        for key in keys:
+            logger.info("Deleting %s", self.uri(key))
+        if self.unlink_concurrency > 1 and len(keys) > 1:
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(
+                max_workers=self.unlink_concurrency, thread_name_prefix="s3-gfs-unlink"
+            ) as pool:
+                errors = [e for e in pool.map(self._unlink, keys) if e]
+        else:
+            errors = [e for e in map(self._unlink, keys) if e]
+        # Deepest directories first, so emptied parents go too.
+        parents = {key.rsplit("/", 1)[0] for key in keys if "/" in key}
+        for parent in sorted(parents, key=lambda p: p.count("/"), reverse=True):
+            while parent:
+                try:
+                    os.rmdir(self._path(parent))
+                except OSError:
+                    break
+                parent = parent.rpartition("/")[0]
+        if errors:
+            raise RuntimeError(f"Local delete reported errors: {errors}")
+        _count("KeysDeleted", len(keys))
+
+
+# Beyond this many alternatives, prefix pushdown stops extending prefixes.
+_MAX_PUSHDOWN_PREFIXES = 16
+
+
+def _minimal_prefixes(prefixes: Iterable[str]) -> List[str]:
+    """Sorted prefixes, dropping any that extends another (already covered)."""
+    out: List[str] = []
+    for p in sorted(set(prefixes)):
+        if out and p.startswith(out[-1]):
+            continue
+        out.append(p)
+    return out
+
+
+def _literal_prefixes(items) -> Tuple[List[str], bool]:
+    """
+    Literal strings a match of the parsed `items` must start with, and
+    whether the items were literal all the way through.
+    """
+    parser = _re_parser
+    prefixes = [""]
+    for op, arg in items:
+        if op is parser.LITERAL:
+            options, complete = [chr(arg)], True
+        elif op is parser.IN and all(kind is parser.LITERAL for kind, _value in arg):
+            options, complete = [chr(value) for _kind, value in arg], True
+        elif op is parser.SUBPATTERN:
+            _group, add_flags, _del_flags, sub = arg
+            if add_flags & re.IGNORECASE:
+                return prefixes, False
+            options, complete = _literal_prefixes(sub)
+        elif op is parser.BRANCH:
+            options, complete = [], True
+            for branch in arg[1]:
+                branch_options, branch_complete = _literal_prefixes(branch)
+                options.extend(branch_options)
+                complete = complete and branch_complete
+        else:
+            return prefixes, False
+        if len(prefixes) * len(options) > _MAX_PUSHDOWN_PREFIXES:
+            return prefixes, False
+        prefixes = [p + o for p in prefixes for o in options]
+        if not complete:
+            return prefixes, False
+    return prefixes, True
+
+
+def regex_literal_prefixes(pattern: re.Pattern[str]) -> Optional[List[str]]:
+    """
+    Literal prefixes that every key matched by `pattern.search` starts with,
+    or None when the pattern guarantees none.
+
+    Only patterns anchored at the start of the key qualify: `\\A`, or `^`
+    without MULTILINE (which would let `^` match after a newline inside a
+    key). IGNORECASE, globally or on the group holding the literal, rules
+    pushdown out. Alternation branches and single-character classes yield
+    one prefix per alternative.
+    """
+    if pattern.flags & re.IGNORECASE:
+        return None
+    items = list(_re_parser.parse(pattern.pattern, pattern.flags))
+    if not items or items[0][0] is not _re_parser.AT:
+        return None
+    anchor = items[0][1]
+    if not (
+        anchor is _re_parser.AT_BEGINNING_STRING
+        or (anchor is _re_parser.AT_BEGINNING and not pattern.flags & re.MULTILINE)
+    ):
+        return None
+    prefixes, _complete = _literal_prefixes(items[1:])
+    if "" in prefixes:
+        return None
+    return _minimal_prefixes(prefixes)
+
+
+def listing_prefixes(prefix: str, filename_ts_re: re.Pattern[str]) -> List[str]:
+    """
+    The `S3_PREFIX` narrowed by the regex's literal prefixes, for listing
+    only keys the regex can match. Keys outside them would only ever be
+    ignored as unparsed, so keep/remove decisions are unchanged. Returns
+    `[prefix]` when the regex guarantees no literal prefix, and an empty
+    list when no key under `prefix` can match.
+    """
+    literals = regex_literal_prefixes(filename_ts_re)
+    if literals is None:
+        return [prefix]
+    narrowed = []
+    for literal in literals:
+        if literal.startswith(prefix):
+            narrowed.append(literal)
+        elif prefix.startswith(literal):
+            narrowed.append(prefix)
+    return _minimal_prefixes(narrowed)
+
+
+# Dated folders S3 Inventory writes under <destination>/<bucket>/<config id>/.
+_INVENTORY_DATE_DIR = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}-\d{2}Z")
+
+
+class InventoryManifest:
+    """
+    One S3 Inventory report: its `manifest.json` plus a way to open the
+    data files it lists. Load it with `InventoryManifest.load`.
+
+    Keys are streamed one data file at a time: gzip CSV is decoded row by
+    row, Parquet and ORC (which need `pyarrow`) in record batches/stripes of
+    the key columns only. Rows for noncurrent versions and delete markers of
+    versioned inventories are skipped.
+    """
+
+    def __init__(self, manifest: dict, open_file: Callable[[str], object]) -> None:
+        self.manifest = manifest
+        self.source_bucket: str = manifest["sourceBucket"]
+        self.file_format: str = manifest["fileFormat"].upper()
+        self.files: List[str] = [f["key"] for f in manifest["files"]]
+        self.created_at = datetime.fromtimestamp(
+            int(manifest["creationTimestamp"]) / 1000, tz=timezone.utc
+        )
+        self._open_file = open_file
+
+    @classmethod
+    def load(cls, uri: str, region: Optional[str] = None, *, client=None) -> "InventoryManifest":
+        """
+        `uri` is a `manifest.json` or the inventory configuration folder
+        holding the dated report folders, in which case the newest report is
+        used. `s3://bucket/key` reads from S3 (data files from the manifest's
+        destination bucket); anything else is a local copy laid out like the
+        destination, e.g. from `aws s3 sync`.
+        """
+        if uri.startswith("s3://"):
+            bucket, _sep, key = uri[len("s3://") :].partition("/")
+            if not bucket:
+                raise RuntimeError(f"Invalid inventory URI (expected s3://bucket/key): {uri}")
+            s3 = client if client is not None else _s3_client(region)
+            if not key.endswith(".json"):
+                key = cls._latest_s3_manifest(s3, bucket, key)
+            manifest = json.loads(s3.get_object(Bucket=bucket, Key=key)["Body"].read())
+            destination = manifest.get("destinationBucket", "").rpartition(":")[2] or bucket
+            return cls(
+                manifest,
+                lambda data_key: s3.get_object(Bucket=destination, Key=data_key)["Body"],
+            )
+
+        path = uri
+        if not path.endswith(".json"):
+            dated = sorted(
+                name
+                for name in os.listdir(path)
+                if _INVENTORY_DATE_DIR.fullmatch(name)
+                and os.path.exists(os.path.join(path, name, "manifest.json"))
+            )
+            if not dated:
+                raise RuntimeError(f"No inventory manifest found under {uri}")
+            path = os.path.join(path, dated[-1], "manifest.json")
+        with open(path, "rb") as fh:
+            manifest = json.load(fh)
+        # Data file keys look like <config prefix>/data/<file>; locally they
+        # live in the data/ folder next to the dated report folders.
+        config_dir = os.path.dirname(os.path.dirname(os.path.abspath(path)))
+        return cls(
+            manifest,
+            lambda data_key: open(
+                os.path.join(config_dir, "data", data_key.rpartition("/")[2]), "rb"
+            ),
+        )
+
+    @staticmethod
+    def _latest_s3_manifest(s3, bucket: str, config_prefix: str) -> str:
+        if config_prefix and not config_prefix.endswith("/"):
+            config_prefix += "/"
+        dated: List[str] = []
+        token = None
+        while True:
+            kwargs = {"Bucket": bucket, "Prefix": config_prefix, "Delimiter": "/"}
+            if token:
+                kwargs["ContinuationToken"] = token
+            resp = s3.list_objects_v2(**kwargs)
+            _count("ListObjectsV2Calls")
+            for common in resp.get("CommonPrefixes", []):
+                name = common["Prefix"][len(config_prefix) :].rstrip("/")
+                if _INVENTORY_DATE_DIR.fullmatch(name):
+                    dated.append(common["Prefix"])
+            if not resp.get("IsTruncated"):
+                break
+            token = resp.get("NextContinuationToken")
+        if not dated:
+            raise RuntimeError(f"No inventory manifest found under s3://{bucket}/{config_prefix}")
+        return f"{max(dated)}manifest.json"
+
+    def _columns(self) -> List[str]:
+        return [c.strip() for c in self.manifest.get("fileSchema", "").split(",")]
+
+    def iter_keys(self, prefix: str = "") -> Iterator[str]:
+        if self.file_format == "CSV":
+            iter_file = self._iter_csv_keys
+        elif self.file_format in ("PARQUET", "ORC"):
+            iter_file = self._iter_columnar_keys
+        else:
+            raise RuntimeError(f"Unsupported inventory file format: {self.file_format}")
+        for data_key in self.files:
+            for key in iter_file(data_key):
+                if key.startswith(prefix):
+                    yield key
+
+    def _iter_csv_keys(self, data_key: str) -> Iterator[str]:
+        import csv
+        import gzip
+        import io
+
+        columns = self._columns()
+        key_col = columns.index("Key")
+        latest_col = columns.index("IsLatest") if "IsLatest" in columns else None
+        marker_col = columns.index("IsDeleteMarker") if "IsDeleteMarker" in columns else None
+        with self._open_file(data_key) as raw, gzip.GzipFile(fileobj=raw) as unzipped:
+            for row in csv.reader(io.TextIOWrapper(unzipped, encoding="utf-8", newline="")):
+                if latest_col is not None and row[latest_col] == "false":
+                    continue
+                if marker_col is not None and row[marker_col] == "true":
+                    continue
+                # CSV inventories URL-encode keys
+                yield unquote_plus(row[key_col])
+
+    def _iter_columnar_keys(self, data_key: str) -> Iterator[str]:
+        import shutil
+        import tempfile
+
+        # Columnar readers need a seekable file; S3 bodies are spooled to
+        # local disk (/tmp in Lambda) rather than memory.
+        with self._open_file(data_key) as raw, tempfile.TemporaryFile() as local:
+            shutil.copyfileobj(raw, local)
+            local.seek(0)
+            if self.file_format == "PARQUET":
+                import pyarrow.parquet as pq
+
+                reader = pq.ParquetFile(local)
+                names = set(reader.schema_arrow.names)
+                wanted = [c for c in ("key", "is_latest", "is_delete_marker") if c in names]
+                batches = reader.iter_batches(batch_size=65536, columns=wanted)
+            else:
+                import pyarrow.orc as orc
+
+                reader = orc.ORCFile(local)
+                names = set(reader.schema.names)
+                wanted = [c for c in ("key", "is_latest", "is_delete_marker") if c in names]
+                batches = (
+                    reader.read_stripe(i, columns=wanted) for i in range(reader.nstripes)
+                )
+            for batch in batches:
+                data = batch.to_pydict()
+                latest = data.get("is_latest")
+                markers = data.get("is_delete_marker")
+                for i, key in enumerate(data["key"]):
+                    if latest is not None and latest[i] is False:
+                        continue
+                    if markers is not None and markers[i]:
+                        continue
+                    yield key
+
+
+def iter_keys_from_inventory(
+    manifest_uri: str,
+    bucket: str,
+    prefix: str = "",
+    region: Optional[str] = None,
+    *,
+    client=None,
+    delta: bool = False,
+) -> Iterator[str]:
+    """
+    Streams the keys of `bucket` under `prefix` from an S3 Inventory report
+    instead of listing them (see `InventoryManifest`). Keys come in report
+    order, not sorted. With `delta`, keys written after the report are then
+    listed with `StartAfter` the greatest reported key, which catches new
+    timestamped backups the same way the group index watermark does.
+    """
+    inventory = InventoryManifest.load(manifest_uri, region, client=client)
+    if inventory.source_bucket != bucket:
+        raise RuntimeError(
+            f"Inventory report is for bucket {inventory.source_bucket}, not {bucket}"
+        )
+    logger.info(
+        "Reading %s inventory from %s (%d files, created %s)",
+        inventory.file_format,
+        manifest_uri,
+        len(inventory.files),
+        inventory.created_at.isoformat(),
+    )
+    count = 0
+    greatest: Optional[str] = None
+    for key in inventory.iter_keys(prefix):
+        count += 1
+        if greatest is None or key > greatest:
+            greatest = key
+        yield key
+    _count("KeysListed", count)
+    logger.info("Read %d object keys from the inventory", count)
+    if delta:
+        yield from iter_keys_from_s3(
+            bucket, prefix, region, client=client, start_after=greatest
+        )
+
+
+SELECTION_ENGINES = ("python", "numpy")
+
+
+def select_keepers(
+    group_dts: Iterable[datetime],
+    policy: RetentionPolicy,
+    *,
+    engine: Optional[str] = None,
+) -> Dict[datetime, Tuple[str, ...]]:
+    """
+    Applies the GFS policy to a set of group timestamps.
+    Returns {timestamp: tags} for kept groups; any other timestamp is removed.
+    Tags are ordered most general first (yearly ... hourly).
+
+    `engine` is "python" or "numpy" (default: `S3_GFS_ENGINE`, else
+    "python"). Both return identical results; the NumPy engine needs numpy
+    installed and falls back to the Python engine without it.
+    """
+    engine = engine or os.environ.get("S3_GFS_ENGINE", "python")
+    if engine not in SELECTION_ENGINES:
+        raise RuntimeError(f"Unknown selection engine: {engine}")
+    with _phase("Selection"):
+        if engine == "numpy":
+            try:
+                return _select_keepers_numpy(group_dts, policy)
+            except ImportError:
+                logger.warning("numpy is not installed; using the python selection engine")
+        return _select_keepers_python(group_dts, policy)
+
+
+_TAG_ORDER = tuple(reversed(RETENTION_TIERS))
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+# tier -> bucket id of a timestamp, given the timestamp and its proleptic
+# ordinal day. Ids are plain ints that never decrease as time moves forward,
+# so a newest-first sweep only has to compare against the previous id.
+_TIER_BUCKETS: Dict[str, Callable[[datetime, int], int]] = {
+    "hourly": lambda dt, day: day * 24 + dt.hour,
+    "daily": lambda dt, day: day,
+    # Ordinal 1 (0001-01-01) is a Monday, so each id is one ISO week.
+    "weekly": lambda dt, day: (day - 1) // 7,
+    "monthly": lambda dt, day: dt.year * 12 + dt.month,
+    "yearly": lambda dt, day: dt.year,
+}
+
+
+def _newest_first(group_dts: Iterable[datetime]) -> List[datetime]:
+    """
+    Returns the timestamps newest-first. Input that is already ordered
+    either way (listing order usually is chronological) is reversed or kept
+    as-is instead of sorted.
+    """
+    dts = list(group_dts)
+    if all(a >= b for a, b in zip(dts, islice(dts, 1, None))):
+        return dts
+    if all(a <= b for a, b in zip(dts, islice(dts, 1, None))):
+        dts.reverse()
+        return dts
+    dts.sort(reverse=True)
+    return dts
+
+
+def _select_keepers_python(
+    group_dts: Iterable[datetime],
+    policy: RetentionPolicy,
+) -> Dict[datetime, Tuple[str, ...]]:
+    # One newest -> oldest sweep serves every tier: each group's bucket ids
+    # are computed once, and the sweep stops as soon as all tiers are full.
+    # [tag, remaining, bucket_fn, last bucket id]
+    tiers = [[tag, keep_n, _TIER_BUCKETS[tag], None] for tag, keep_n in policy.tiers()]
+    keepers: Dict[datetime, Tuple[str, ...]] = {}
+    if not tiers:
+        return keepers
+
+    for dt in _newest_first(group_dts):
+        day = dt.toordinal()
+        tags: List[str] = []
+        filled = False
+        for tier in tiers:
+            bucket = tier[2](dt, day)
+            if bucket == tier[3]:
+                continue
+            tier[3] = bucket
+            tier[1] -= 1
+            tags.append(tier[0])
+            filled = filled or not tier[1]
+        if tags:
+            # Tiers run most specific first; tags are reported the other way.
+            tags.reverse()
+            keepers[dt] = tuple(tags)
+        if filled:
+            tiers = [tier for tier in tiers if tier[1]]
+            if not tiers:
+                break
+
+    return keepers
+
+
+def _select_keepers_numpy(
+    group_dts: Iterable[datetime],
+    policy: RetentionPolicy,
+) -> Dict[datetime, Tuple[str, ...]]:
+    """
+    Vectorized `_select_keepers_python`. Bucket ids are computed with
+    datetime64 arithmetic; because they are monotonic in time, the first
+    occurrence of each id in newest-first order is that bucket's newest
+    group, and the `keep_n` earliest first occurrences are exactly what the
+    sequential loop would pick.
+
+    Like the loop, this only looks as far back as it needs to: it converts
+    a newest-first prefix and doubles it until every tier has found its
+    `keep_n` buckets or the prefix covers every group.
+    """
+    import numpy as np
+
+    group_dts_newest = _newest_first(group_dts)
+    total = len(group_dts_newest)
+    tiers = policy.tiers()
+    if not total or not tiers:
+        return {}
+
+    converted = np.empty(0, dtype=np.int64)
+    size = min(total, max(1024, 2 * max(keep_n for _tag, keep_n in tiers)))
+    while True:
+        # Integer microseconds since the epoch convert far faster than
+        # handing numpy the datetime objects themselves.
+        fresh = group_dts_newest[len(converted) : size]
+        converted = np.concatenate(
+            (
+                converted,
+                np.fromiter(
+                    ((dt - _EPOCH) // _MICROSECOND for dt in fresh),
+                    dtype=np.int64,
+                    count=len(fresh),
+                ),
+            )
+        )
+        stamps = converted.view("datetime64[us]")
+        mask = np.zeros(size, dtype=np.uint8)
+        complete = True
+        for bit, (tag, keep_n) in enumerate(tiers):
+            _ids, first = np.unique(_numpy_bucket_ids(np, stamps, tag), return_index=True)
+            if len(first) < keep_n and size < total:
+                complete = False
+                break
+            mask[np.sort(first)[:keep_n]] |= 1 << bit
+        if complete:
+            break
+        size = min(total, size * 2)
+
+    # mask value -> tags tuple, in the same order as the python engine
+    tag_tuples = []
+    for m in range(1 << len(tiers)):
+        tags = {tag for bit, (tag, _n) in enumerate(tiers) if m >> bit & 1}
+        tag_tuples.append(tuple(t for t in _TAG_ORDER if t in tags))
+    kept = np.flatnonzero(mask)
+    return dict(
+        zip(
+            map(group_dts_newest.__getitem__, kept.tolist()),
+            map(tag_tuples.__getitem__, mask[kept].tolist()),
+        )
+    )
+
+
+def _numpy_bucket_ids(np, stamps, tag: str):
+    if tag == "weekly":
+        # 1970-01-01 was a Thursday: shifting by 3 days makes each id cover
+        # one Monday-Sunday ISO week, so ids map 1:1 onto (iso year, week).
+        days = stamps.astype("datetime64[D]").astype(np.int64)
+        return np.floor_divide(days + 3, 7)
+    unit = {"hourly": "h", "daily": "D", "monthly": "M", "yearly": "Y"}[tag]
+    return stamps.astype(f"datetime64[{unit}]").astype(np.int64)
+
+
+def build_plan(
+    keys: Iterable[str],
+    policy: RetentionPolicy,
+    *,
+    filename_ts_re: re.Pattern[str],
+    timestamp_format: str,
+    parse_workers: int = 1,
+    parallel_threshold: int = PARALLEL_PARSE_THRESHOLD,
+    compact: bool = False,
+) -> RetentionPlan:
+    """
+    Groups object keys by the timestamp parsed from their names and applies
+    the retention policy to each group. `keys` is consumed in a single pass,
+    so it may be a lazy listing stream.
+
+    With `parse_workers` > 1, key lists of at least `parallel_threshold`
+    keys are parsed on a process pool (see `_parse_groups_parallel`); the
+    plan is the same either way. A lazy stream is parsed as it arrives and
+    only buffered past its first `parallel_threshold` keys.
+
+    With `compact`, the keys are front-coded into one `CompactKeys` store as
+    they stream past and each group holds only their indices, so the plan
+    takes a fraction of the memory of lists of `str`. Parsing then stays in
+    this process, since a process pool needs the whole list of `str` first.
+    """
+    if compact:
+        return _build_compact_plan(keys, policy, filename_ts_re, timestamp_format)
+    # Keys are appended in input order, which keeps each group (and the
+    # unparsed tail) in its original order without tracking indices.
+    groups: Dict[datetime, List[str]] = {}
+    unparsed: List[str] = []
+    rest: List[str] = []
+    with _phase("Parsing"):
+        if parse_workers > 1 and isinstance(keys, list):
+            # Already in memory: fan out all of it or none of it.
+            if len(keys) >= parallel_threshold:
+                keys, rest = [], keys
+            parsed_count = _parse_serially(keys, filename_ts_re, timestamp_format, groups, unparsed)
+        elif parse_workers > 1:
+            # Parse while listing; only a listing that reaches the threshold
+            # is fanned out, from that point on.
+            stream = iter(keys)
+            head = islice(stream, parallel_threshold)
+            parsed_count = _parse_serially(
+                head, filename_ts_re, timestamp_format, groups, unparsed
+            )
+            if parsed_count + len(unparsed) >= parallel_threshold:
+                rest = list(stream)
+        else:
+            parsed_count = _parse_serially(keys, filename_ts_re, timestamp_format, groups, unparsed)
+
+        parsed = (
+            _parse_groups_parallel(rest, filename_ts_re, timestamp_format, parse_workers)
+            if rest
+            else None
+        )
+        if parsed is not None:
+            # `rest` follows what was parsed here, so appending keeps every
+            # group, and the order groups first appear in, as one pass would.
+            for dt, members in parsed[0].items():
+                groups.setdefault(dt, []).extend(members)
+                parsed_count += len(members)
+            unparsed.extend(parsed[1])
+        elif rest:
+            parsed_count += _parse_serially(
+                rest, filename_ts_re, timestamp_format, groups, unparsed
+            )
+    return _plan_groups(groups, unparsed, parsed_count, policy)
+
+
+def _parse_serially(
+    keys: Iterable[str],
+    filename_ts_re: re.Pattern[str],
+    timestamp_format: str,
+    groups: Dict[datetime, List[str]],
+    unparsed: List[str],
+) -> int:
+    """Appends `keys` to `groups`/`unparsed`; returns how many parsed."""
+    parsed_count = 0
+    for k in keys:
+        dt = parse_timestamp_from_key(k, filename_ts_re, timestamp_format)
+        if dt is None:
+            unparsed.append(k)
+        else:
+            groups.setdefault(dt, []).append(k)
+            parsed_count += 1
+    return parsed_count
+
+
+# Below any datetime, which reaches back to year 1 (about -6.2e16 µs).
+_UNPARSED_STAMP = -(2**63)
+
+
+def _build_compact_plan(
+    keys: Iterable[str],
+    policy: RetentionPolicy,
+    filename_ts_re: re.Pattern[str],
+    timestamp_format: str,
+) -> RetentionPlan:
+    """
+    `build_plan(compact=True)`. While keys stream past, only their encoded
+    bytes and one 8-byte timestamp each are kept, so no Python object is
+    held per key or per group. Groups are then numbered in timestamp order
+    and the key indices laid out group by group in a single array.
+    """
+    store = CompactKeys()
+    append = store.append
+    stamps = array("q")  # per key: epoch microseconds, or _UNPARSED_STAMP
+    unparsed = array("I")
+    last_dt: Optional[datetime] = None
+    last_us = _UNPARSED_STAMP
+    monotonic = True
+    with _phase("Parsing"):
+        for k in keys:
+            i = append(k)
+            dt = parse_timestamp_from_key(k, filename_ts_re, timestamp_format)
+            if dt is None:
+                unparsed.append(i)
+                stamps.append(_UNPARSED_STAMP)
+                continue
+            # The parser's cache hands back the same object for every key
+            # of a group, so most conversions are skipped.
+            if dt is not last_dt:
+                us = (dt - _EPOCH) // _MICROSECOND
+                monotonic = monotonic and us >= last_us
+                last_dt, last_us = dt, us
+            stamps.append(last_us)
+
+        # Group ids in timestamp order; a listing that is already
+        # chronological needs no sort or lookup table.
+        if monotonic:
+            group_us = array("q")
+            sizes = array("I")
+            for us in stamps:
+                if us == _UNPARSED_STAMP:
+                    continue
+                if group_us and group_us[-1] == us:
+                    sizes[-1] += 1
+                else:
+                    group_us.append(us)
+                    sizes.append(1)
+            order = array("I", (i for i, us in enumerate(stamps) if us != _UNPARSED_STAMP))
+        else:
+            group_us = array("q", sorted(set(stamps) - {_UNPARSED_STAMP}))
+            sizes = array("I", bytes(4 * len(group_us)))
+            for us in stamps:
+                if us != _UNPARSED_STAMP:
+                    sizes[bisect.bisect_left(group_us, us)] += 1
+            # Counting sort of key indices by group, stable within a group.
+            slots = array("I", [0])
+            for size in sizes:
+                slots.append(slots[-1] + size)
+            order = array("I", bytes(4 * slots[-1]))
+            for i, us in enumerate(stamps):
+                if us != _UNPARSED_STAMP:
+                    gid = bisect.bisect_left(group_us, us)
+                    order[slots[gid]] = i
+                    slots[gid] += 1
+            del slots
+        del stamps
+        offsets = array("I", [0])
+        for size in sizes:
+            offsets.append(offsets[-1] + size)
+        del sizes
+
+    parsed_count = len(order)
+    _count("KeysParsed", parsed_count)
+    _count("KeysUnparsed", len(unparsed))
+    _count("Groups", len(group_us))
+    logger.info(
+        "Parsed %d keys into %d timestamp groups (%d unparsed); %d bytes front-coded",
+        parsed_count,
+        len(group_us),
+        len(unparsed),
+        store.nbytes,
+    )
+
+    keepers = select_keepers(
+        (_EPOCH + timedelta(microseconds=us) for us in reversed(group_us)), policy
+    )
+    kept = {
+        bisect.bisect_left(group_us, (dt - _EPOCH) // _MICROSECOND): tags
+        for dt, tags in keepers.items()
+    }
+    keep_count = sum(offsets[gid + 1] - offsets[gid] for gid in kept)
+    logger.info(
+        "Decisions: keep=%d remove=%d ignore=%d",
+        keep_count,
+        parsed_count - keep_count,
+        len(unparsed),
+    )
+    groups = _CompactGroups(store, group_us, offsets, order, kept)
+    return RetentionPlan(groups, store.view(unparsed))  # type: ignore[arg-type]
+
+
+# Set in the parent right before a fork-based pool starts, so workers read
+# the keys from their copy-on-write memory instead of receiving them pickled.
+_PARSE_INPUT: Optional[Tuple[List[str], re.Pattern[str], str]] = None
+
+
+def _parse_chunk(
+    start: int,
+    end: int,
+    chunk: Optional[List[str]] = None,
+    filename_ts_re: Optional[re.Pattern[str]] = None,
+    timestamp_format: Optional[str] = None,
+) -> Tuple[Dict[datetime, List[int]], List[int]]:
+    """
+    Worker side of `_parse_groups_parallel`: parses keys[start:end] and
+    returns the key indices per timestamp, plus the unparsed indices, both
+    ascending. Only one timestamp per group and chunk crosses the process
+    boundary.
+    """
+    if chunk is None:
+        keys, filename_ts_re, timestamp_format = _PARSE_INPUT  # type: ignore[misc]
+        chunk = keys[start:end]
+    groups: Dict[datetime, List[int]] = {}
+    unparsed: List[int] = []
+    for i, k in enumerate(chunk, start):
+        dt = parse_timestamp_from_key(k, filename_ts_re, timestamp_format)  # type: ignore[arg-type]
+        if dt is None:
+            unparsed.append(i)
+        else:
+            groups.setdefault(dt, []).append(i)
+    return groups, unparsed
+
+
+def _parse_groups_parallel(
+    keys: List[str],
+    filename_ts_re: re.Pattern[str],
+    timestamp_format: str,
+    workers: int,
+) -> Optional[Tuple[Dict[datetime, List[str]], List[str]]]:
+    """
+    Parses `keys` in contiguous chunks on `workers` processes and merges the
+    chunks in order, so groups, their keys and the unparsed keys come out in
+    the same order as a serial parse. Returns None, for the caller to parse
+    serially, where process pools are unavailable (AWS Lambda has no
+    /dev/shm for their semaphores).
+    """
+    global _PARSE_INPUT
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    methods = multiprocessing.get_all_start_methods()
+    fork = "fork" in methods
+    context = multiprocessing.get_context("fork" if fork else None)
+    # A few chunks per worker evens out chunks that parse slower than others.
+    size = max(-(-len(keys) // (workers * 4)), 1)
+    bounds = [(i, min(i + size, len(keys))) for i in range(0, len(keys), size)]
+
+    groups: Dict[datetime, List[str]] = {}
+    unparsed: List[str] = []
+    try:
+        if fork:
+            _PARSE_INPUT = (keys, filename_ts_re, timestamp_format)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            if fork:
+                futures = [pool.submit(_parse_chunk, lo, hi) for lo, hi in bounds]
+            else:
+                futures = [
+                    pool.submit(
+                        _parse_chunk, lo, hi, keys[lo:hi], filename_ts_re, timestamp_format
+                    )
+                    for lo, hi in bounds
+                ]
+            for future in futures:
+                chunk_groups, chunk_unparsed = future.result()
+                for dt, indices in chunk_groups.items():
+                    members = groups.get(dt)
+                    if members is None:
+                        members = groups[dt] = []
+                    members.extend([keys[i] for i in indices])
+                unparsed.extend([keys[i] for i in chunk_unparsed])
+    except OSError as exc:
+        logger.warning("Parallel parsing unavailable (%s); parsing serially", exc)
+        return None
+    finally:
+        _PARSE_INPUT = None
+    logger.info("Parsed %d keys in %d chunks on %d processes", len(keys), len(bounds), workers)
+    return groups, unparsed
+
+
+def build_plan_from_objects(
+    objects: Iterable[Tuple[str, datetime]],
+    policy: RetentionPolicy,
+    *,
+    group_window: timedelta = timedelta(0),
+    key_filter: Optional[re.Pattern[str]] = None,
+) -> RetentionPlan:
+    """
+    `build_plan` for (key, LastModified) pairs: objects are grouped by
+    their LastModified time instead of a timestamp parsed from the name.
+
+    With a positive `group_window`, an object joins the group started by
+    the oldest object at most `group_window` before it, so the parts of one
+    backup that finish uploading a few seconds apart form a single group.
+    Groups are anchored at their first object, which keeps a steady stream
+    of uploads from chaining into one group. Keys that `key_filter` does
+    not match are ignored.
+    """
+    groups: Dict[datetime, List[str]] = {}
+    unparsed: List[str] = []
+    stamped: List[Tuple[datetime, str]] = []
+    parsed_count = 0
+    with _phase("Parsing"):
+        for key, modified in objects:
+            if key_filter is not None and not key_filter.search(key):
+                unparsed.append(key)
+                continue
+            parsed_count += 1
+            if modified.tzinfo is None:
+                modified = modified.replace(tzinfo=timezone.utc)
+            if group_window:
+                stamped.append((modified, key))
+            else:
+                groups.setdefault(modified, []).append(key)
+        if stamped:
+            # Stable, so objects with equal times keep their listing order.
+            stamped.sort(key=lambda item: item[0])
+            start = stamped[0][0]
+            members = groups[start] = []
+            for modified, key in stamped:
+                if modified - start > group_window:
+                    start = modified
+                    members = groups[start] = []
+                members.append(key)
+    return _plan_groups(groups, unparsed, parsed_count, policy)
+
+
+def _plan_groups(
+    groups: Mapping[datetime, Sequence[str]],
+    unparsed: Sequence[str],
+    parsed_count: int,
+    policy: RetentionPolicy,
+) -> RetentionPlan:
+    _count("KeysParsed", parsed_count)
+    _count("KeysUnparsed", len(unparsed))
+    _count("Groups", len(groups))
+
+    if not groups:
+        logger.info("All %d keys ignored (no timestamp match)", len(unparsed))
+        return RetentionPlan([], unparsed)
+
+    logger.info(
+        "Parsed %d keys into %d timestamp groups (%d unparsed)",
+        parsed_count,
+        len(groups),
+        len(unparsed),
+    )
+
+    # Ordered once here and reused by selection, which detects the order.
+    newest = _newest_first(groups)
+    keepers = select_keepers(newest, policy)
+
+    # Groups oldest->newest
+    records: List[GroupRecord] = []
+    counts = {"keep": 0, "remove": 0, "ignore": len(unparsed)}
+    for dt in reversed(newest):
+        group_keys = groups[dt]
+        if dt in keepers:
+            record = GroupRecord(dt, group_keys, "keep", keepers[dt])
+        else:
+            record = GroupRecord(dt, group_keys)
+        counts[record.decision] += len(group_keys)
+        records.append(record)
+
+    logger.info(
+        "Decisions: keep=%d remove=%d ignore=%d",
+        counts["keep"],
+        counts["remove"],
+        counts["ignore"],
+    )
+
+    return RetentionPlan(records, unparsed)
+
+
+def core_logic(
+    keys: Union[Iterable[str], "GroupIndex"],
+    policy: RetentionPolicy,
+    *,
+    filename_ts_re: Optional[re.Pattern[str]] = None,
+    timestamp_format: Optional[str] = None,
+    parse_workers: int = 1,
+) -> List[DecisionTuple]:
+    """
+    Receives object keys, parses timestamps from names, and returns decisions:
+      (key, "keep"/"remove", tag)
+
+    Tags:
+      yearly/monthly/weekly/daily/hourly (comma-joined), unparsed, or empty
+
+    Conservative behavior:
+      - unparsed timestamps => ignore (tag=unparsed)
+
+    This is the flat view of `build_plan`; the returned list also carries
+    the plan (see `DecisionList`). `keys` may also be a `GroupIndex`, whose
+    groups are already parsed and sorted; the regex/format are then unused.
+    """
+    if isinstance(keys, GroupIndex):
+        return keys.plan(policy).decisions()
+    if filename_ts_re is None or timestamp_format is None:
+        raise ValueError("filename_ts_re and timestamp_format are required for key lists")
+    return build_plan(
+        keys,
+        policy,
+        filename_ts_re=filename_ts_re,
+        timestamp_format=timestamp_format,
+        parse_workers=parse_workers,
+    ).decisions()
+
+
+def summarize_groups(
+    keys: Iterable[str],
+    *,
+    filename_ts_re: re.Pattern[str],
+    timestamp_format: str,
+) -> GroupSummary:
+    """
+    Streaming counterpart to the grouping step of `core_logic`: consumes the
+    key stream once and keeps only a count per timestamp group.
+    """
+    summary = GroupSummary()
+    counts = summary.counts
+    with _phase("Parsing"):
+        for k in keys:
+            dt = parse_timestamp_from_key(k, filename_ts_re, timestamp_format)
+            if dt is None:
+                summary.unparsed += 1
+            else:
+                counts[dt] = counts.get(dt, 0) + 1
+    _count("KeysParsed", summary.total - summary.unparsed)
+    _count("KeysUnparsed", summary.unparsed)
+    _count("Groups", len(counts))
+
+    logger.info(
+        "Summarized %d keys into %d timestamp groups (%d unparsed)",
+        summary.total - summary.unparsed,
+        len(counts),
+        summary.unparsed,
+    )
+    return summary
+
+
+def _plan_group_deletions(
+    groups: Sequence[GroupRecord],
+    min_remaining: int,
+) -> List[GroupRecord]:
+    """
+    Walks `groups` (oldest-first) and returns the ones marked "remove" that
+    can be deleted without dropping below `min_remaining` groups.
+    """
+    remaining_groups = len(groups)
+    planned: List[GroupRecord] = []
+    with _phase("Planning"):
+        for group in groups:
+            if group.decision != "remove":
+                continue
+
+            # If we delete this group, remaining decreases by 1.
+            next_remaining = remaining_groups - 1
+            if next_remaining < min_remaining:
+                logger.info(
+                    "Stopping deletes at min_remaining=%d (remaining_groups=%d)",
+                    min_remaining,
+                    remaining_groups,
+                )
+                break
+
+            planned.append(group)
+            remaining_groups = next_remaining
+    return planned
+
+
+def _delete_batch(s3, bucket: str, chunk: List[str]) -> None:
+    for key in chunk:
+        logger.info("Deleting s3://%s/%s", bucket, key)
+    response = s3.delete_objects(
+        Bucket=bucket,
+        Delete={"Objects": [{"Key": k} for k in chunk], "Quiet": True},
+    )
+    _count("DeleteObjectsCalls")
+    errors = response.get("Errors", [])
+    if errors:
+        raise RuntimeError(f"S3 delete_objects reported errors: {errors}")
+    _count("KeysDeleted", len(chunk))
+
+
+def _batched(keys: Iterable[str], size: int = DELETE_BATCH_SIZE) -> Iterator[List[str]]:
+    chunk: List[str] = []
+    for key in keys:
+        chunk.append(key)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _dispatch_deletes(
+    backend: StorageBackend,
+    chunks: Iterable[List[str]],
+    concurrency: int = 1,
+) -> None:
+    """
+    Sends delete batches to `backend` in order with at most `concurrency`
+    batches in flight. Batch N+concurrency is only submitted once batch N
+    has succeeded, so a failure stops the run with every older batch
+    already deleted and nothing newer than the in-flight window touched.
+    """
+    with _phase("Deletion"):
+        _dispatch_deletes_unmetered(backend, chunks, concurrency)
+
+
+def _dispatch_deletes_unmetered(
+    backend: StorageBackend,
+    chunks: Iterable[List[str]],
+    concurrency: int,
+) -> None:
+    if concurrency <= 1:
+        for chunk in chunks:
+            backend.delete_batch(chunk)
+        return
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="s3-gfs-delete") as pool:
+        pending: Deque["Future"] = deque()
+        try:
+            for chunk in chunks:
+                if len(pending) >= concurrency:
+                    pending.popleft().result()
+                pending.append(pool.submit(backend.delete_batch, chunk))
+            while pending:
+                pending.popleft().result()
+        finally:
+            for fut in pending:
+                fut.cancel()
+
+
+def _floor_hit_result(total_objects: int, total_groups: int, min_remaining: int) -> dict:
+    logger.info(
+        "Safety floor hit before deletes: total_groups=%d min_remaining=%d",
+        total_groups,
+        min_remaining,
+    )
+    return {
+        "total": total_objects,
+        "total_groups": total_groups,
+        "deleted": 0,
+        "deleted_groups": 0,
+        "skipped": True,
+        "reason": (
+            f"Only {total_groups} backup groups exist (<= {min_remaining}). "
+            "No deletions performed."
+        ),
+        "deleted_keys": [],
+    }
+
+
+def _nothing_selected_result(total_objects: int, total_groups: int, min_remaining: int) -> dict:
+    logger.info(
+        "No deletions selected after planning (min_remaining=%d)", min_remaining
+    )
+    return {
+        "total": total_objects,
+        "total_groups": total_groups,
+        "deleted": 0,
+        "deleted_groups": 0,
+        "skipped": False,
+        "reason": (
+            f"No deletions selected (would hit safety floor of {min_remaining} backup "
+            "groups)."
+        ),
+        "deleted_keys": [],
+    }
+
+
+def plan_from_decisions(
+    decisions: Iterable[DecisionTuple],
+    *,
+    filename_ts_re: re.Pattern[str],
+    timestamp_format: str,
+) -> RetentionPlan:
+    """
+    Rebuilds a `RetentionPlan` from a flat decision list by re-parsing each
+    non-ignored key. Only needed for decision lists that did not come
+    straight from `core_logic`.
+    """
+    groups: Dict[datetime, GroupRecord] = {}
+    unparsed: List[str] = []
+
+    for key, decision, tag in decisions:
+        if decision == "ignore":
+            unparsed.append(key)
+            continue
+        dt = parse_timestamp_from_key(key, filename_ts_re, timestamp_format)
+        if dt is None:
+            raise RuntimeError(f"Expected timestamp for key but none found: {key}")
+        group = groups.get(dt)
+        if group is None:
+            groups[dt] = GroupRecord(dt, [key], decision, tuple(t for t in tag.split(",") if t))
+        elif group.decision != decision:
+            raise RuntimeError(f"Inconsistent decisions for timestamp group {dt.isoformat()}")
+        else:
+            group.keys.append(key)
+
+    return RetentionPlan([groups[dt] for dt in sorted(groups)], unparsed)
+
+
+def apply_removal(
+    bucket: str,
+    decisions: Union[RetentionPlan, "GroupIndex", List[DecisionTuple]],
+    *,
+    policy: Optional[RetentionPolicy] = None,
+    filename_ts_re: Optional[re.Pattern[str]] = None,
+    timestamp_format: Optional[str] = None,
+    region: Optional[str] = None,
+    min_remaining: int = 5,
+    dry_run: bool = True,
+    client=None,
+    delete_concurrency: int = 1,
+    folders: bool = False,
+    backend: Optional[StorageBackend] = None,
+) -> dict:
+    """
+    Applies deletions for entries marked "remove", grouped by timestamp.
+
+    `decisions` is either a `RetentionPlan` or a decision list. Lists
+    returned by `core_logic` carry their plan and are used as-is; any other
+    list is regrouped with `plan_from_decisions`, which needs
+    `filename_ts_re` and `timestamp_format`. A `GroupIndex` is planned with
+    `policy`, and keys actually deleted are discarded from it.
+
+    With `folders`, the group keys are folder prefixes (see
+    `iter_folder_prefixes`): only the folders of groups being deleted are
+    listed, and every object under them is deleted. Totals then count
+    folders, while `deleted`/`deleted_keys` count objects.
+
+    Deletion order is oldest-first by timestamp. With `delete_concurrency`
+    > 1, up to that many 1000-key batches are in flight at once (see
+    `_dispatch_deletes`). Deletes go to `backend`, by default the S3
+    `bucket` through `client`.
+
+    Safety:
+      - Maintains a running count of remaining backup groups (unique timestamps).
+      - Before deleting another group, if remaining <= min_remaining, aborts the loop.
+
+    Returns a dict suitable for logging:
+      {
+        "total": int,
+        "total_groups": int,
+        "deleted": int,
+        "deleted_groups": int,
+        "skipped": bool,
+        "reason": str,
+        "deleted_keys": [...]
+      }
+    """
+    index: Optional[GroupIndex] = None
+    if isinstance(decisions, GroupIndex):
+        if policy is None:
+            raise ValueError("policy is required when applying a GroupIndex")
+        index = decisions
+        plan: Optional[RetentionPlan] = index.plan(policy)
+    elif isinstance(decisions, RetentionPlan):
+        plan = decisions
+    else:
+        plan = getattr(decisions, "plan", None)
+    if plan is None:
+        if filename_ts_re is None or timestamp_format is None:
+            raise ValueError(
+                "filename_ts_re and timestamp_format are required for plain decision lists"
+            )
+        plan = plan_from_decisions(
+            decisions,
+            filename_ts_re=filename_ts_re,
+            timestamp_format=timestamp_format,
+        )
+
+    total_objects = plan.total
+    total_groups = len(plan.groups)
+
+    if total_groups <= min_remaining:
+        return _floor_hit_result(total_objects, total_groups, min_remaining)
+
+    if backend is None:
+        backend = S3Backend(bucket, region, client=client)
+
+    # Plan deletions in-order, aborting once we'd hit the safety floor
+    planned = _plan_group_deletions(plan.groups, min_remaining)
+    keys_to_delete: List[str] = []
+    if folders and planned:
+        if "folders" not in backend.capabilities:
+            raise ValueError(f"{type(backend).__name__} does not support folder mode")
+        for group in planned:
+            for folder in group.keys:
+                keys_to_delete.extend(backend.iter_keys(folder))
+    else:
+        for group in planned:
+            keys_to_delete.extend(group.keys)
+    deleted_groups = len(planned)
+
+    if not keys_to_delete:
+        return _nothing_selected_result(total_objects, total_groups, min_remaining)
+
+    if dry_run:
+        for key in keys_to_delete:
+            logger.info("DRY RUN delete %s", backend.uri(key))
+        return {
+            "total": total_objects,
+            "total_groups": total_groups,
+            "deleted": len(keys_to_delete),
+            "deleted_groups": deleted_groups,
+            "skipped": False,
+            "reason": "Dry run; deletions not executed.",
+            "deleted_keys": keys_to_delete,
+        }
+
+    # Batch delete (max 1000 keys per call on S3)
+    _dispatch_deletes(
+        backend, _batched(keys_to_delete, backend.max_delete_batch), delete_concurrency
+    )
+    if index is not None:
+        index.discard(k for group in planned for k in group.keys)
+
+    return {
+        "total": total_objects,
+        "total_groups": total_groups,
+        "deleted": len(keys_to_delete),
+        "deleted_groups": deleted_groups,
+        "skipped": False,
+        "reason": "Deletions executed.",
+        "deleted_keys": keys_to_delete,
+    }
+
+
+def apply_removal_streaming(
+    bucket: str,
+    keys: Iterable[str],
+    summary: GroupSummary,
+    keepers: Dict[datetime, Tuple[str, ...]],
+    *,
+    filename_ts_re: re.Pattern[str],
+    timestamp_format: str,
+    region: Optional[str] = None,
+    min_remaining: int = 5,
+    dry_run: bool = True,
+    client=None,
+    delete_concurrency: int = 1,
+    backend: Optional[StorageBackend] = None,
+) -> dict:
+    """
+    Streaming counterpart to `apply_removal`.
+
+    Groups to delete are planned up front from `summary` (same oldest-first
+    order and `min_remaining` floor as `apply_removal`), then `keys` - a
+    fresh listing - is scanned once and matching keys are deleted in
+    1000-key batches as they stream past. Keys belonging to groups that were
+    not in the summary (uploaded between the two passes) are never deleted.
+
+    The result has the same shape as `apply_removal`, except that
+    `deleted_keys` is not collected.
+    """
+    total_objects = summary.total
+    total_groups = len(summary.counts)
+
+    if total_groups <= min_remaining:
+        result = _floor_hit_result(total_objects, total_groups, min_remaining)
+        del result["deleted_keys"]
+        return result
+
+    groups = [
+        GroupRecord(dt, [], "keep" if dt in keepers else "remove")
+        for dt in sorted(summary.counts)
+    ]
+    planned = {group.timestamp for group in _plan_group_deletions(groups, min_remaining)}
+
+    if not planned:
+        result = _nothing_selected_result(total_objects, total_groups, min_remaining)
+        del result["deleted_keys"]
+        return result
+
+    deleted = 0
+
+    def matching_keys() -> Iterator[str]:
+        nonlocal deleted
+        for key in keys:
+            dt = parse_timestamp_from_key(key, filename_ts_re, timestamp_format)
+            if dt is None or dt not in planned:
+                continue
+            deleted += 1
+            yield key
+
+    if backend is None:
+        backend = S3Backend(bucket, region, client=client)
+    if dry_run:
+        for key in matching_keys():
+            logger.info("DRY RUN delete %s", backend.uri(key))
+    else:
+        _dispatch_deletes(
+            backend, _batched(matching_keys(), backend.max_delete_batch), delete_concurrency
+        )
+
+    return {
+        "total": total_objects,
+        "total_groups": total_groups,
+        "deleted": deleted,
+        "deleted_groups": len(planned),
+        "skipped": False,
+        "reason": "Dry run; deletions not executed." if dry_run else "Deletions executed.",
+    }
+
+
+@dataclass
+class S3Changes:
+    """Object keys created/removed according to an S3 event notification batch."""
+
+    created: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+
+def _iter_s3_event_records(event: dict) -> Iterator[dict]:
+    for record in event.get("Records", []):
+        if record.get("eventSource") == "aws:sqs":
+            try:
+                body = json.loads(record.get("body") or "{}")
+            except ValueError:
+                logger.warning("Skipping SQS record with non-JSON body")
+                continue
+            # s3:TestEvent and other non-notification bodies have no Records.
+            yield from body.get("Records", [])
+        else:
+            yield record
+
+
+def parse_s3_event(event: Optional[dict], bucket: str, prefix: str = "") -> Optional[S3Changes]:
+    """
+    Extracts created/removed object keys for `bucket`/`prefix` from an S3
+    notification event, delivered directly or wrapped in an SQS batch.
+
+    Returns None when `event` is not an S3 notification (for example a
+    scheduled invocation), which callers treat as "do a full run".
+    """
+    if not event or not isinstance(event.get("Records"), list):
+        return None
+    changes = S3Changes()
+    for record in _iter_s3_event_records(event):
+        s3_info = record.get("s3") or {}
+        if s3_info.get("bucket", {}).get("name") != bucket:
+            continue
+        # Keys in notifications are URL-encoded with '+' for spaces.
+        key = unquote_plus(s3_info.get("object", {}).get("key", ""))
+        if not key or not key.startswith(prefix):
+            continue
+        event_name = record.get("eventName", "")
+        if event_name.startswith("ObjectCreated:"):
+            changes.created.append(key)
+        elif event_name.startswith("ObjectRemoved:"):
+            changes.removed.append(key)
+    return changes
+
+
+class _TierBuckets:
+    """
+    One retention tier over a `GroupIndex`: the tier's bucket ids in sorted
+    order and the newest group timestamp in each bucket.
+    """
+
+    __slots__ = ("bucket_fn", "ids", "newest")
+
+    def __init__(self, tier: str, order: Sequence[datetime]) -> None:
+        self.bucket_fn = _TIER_BUCKETS[tier]
+        self.ids: List[int] = []
+        self.newest: Dict[int, datetime] = {}
+        for dt in order:
+            bucket = self.bucket_fn(dt, dt.toordinal())
+            if not self.ids or self.ids[-1] != bucket:
+                self.ids.append(bucket)
+            self.newest[bucket] = dt
+
+    def bucket(self, dt: datetime) -> int:
+        return self.bucket_fn(dt, dt.toordinal())
+
+    def add(self, dt: datetime) -> None:
+        bucket = self.bucket(dt)
+        current = self.newest.get(bucket)
+        if current is None:
+            bisect.insort(self.ids, bucket)
+            self.newest[bucket] = dt
+        elif dt > current:
+            self.newest[bucket] = dt
+
+    def remove(self, dt: datetime, previous: Optional[datetime]) -> None:
+        """Drops group `dt`; `previous` is the group just before it, if any."""
+        bucket = self.bucket(dt)
+        if self.newest.get(bucket) != dt:
+            return
+        if previous is not None and self.bucket(previous) == bucket:
+            self.newest[bucket] = previous
+        else:
+            del self.newest[bucket]
+            del self.ids[bisect.bisect_left(self.ids, bucket)]
+
+    def kept(self, keep_n: int) -> List[datetime]:
+        return [self.newest[bucket] for bucket in self.ids[-keep_n:]]
+
 
+class GroupIndex:
+    """
+    Persisted snapshot of the known backup groups: {timestamp: keys}, when
+    it was last rebuilt from a full listing, and the `watermark` - the
+    greatest backup key seen so far, which the next listing resumes after.
+    Unrelated keys never move the watermark, so they cannot hide new
+    backups that sort before them. Only
+    keys that parsed are stored; `fingerprint` ties the index to the
+    regex/format it was built with so a config change forces a rebuild.
 
-@dataclass(frozen=True)
-class RetentionPolicy:
-    keep_daily: int = 7
-    keep_weekly: int = 4
-    keep_monthly: int = 12
+    Group timestamps are also kept sorted, alongside each retention tier's
+    sorted bucket ids (built the first time a policy uses the tier). Adding
+    or dropping a group is a bisect per tier, and the keep set is read off
+    the newest `keep_n` buckets of each tier, so `plan()` never re-sorts or
+    re-selects from scratch. Change `groups` only through `add`/`discard`.
+    """
 
+    VERSION = 2
 
-def parse_timestamp_from_key(
-    key: str,
-    filename_ts_re: re.Pattern[str],
-    timestamp_format: str,
-) -> Optional[datetime]:
+    def __init__(
+        self,
+        fingerprint: str,
+        groups: Optional[Dict[datetime, List[str]]] = None,
+        full_listing_at: Optional[datetime] = None,
+        watermark: Optional[str] = None,
+    ) -> None:
+        self.fingerprint = fingerprint
+        self.groups: Dict[datetime, List[str]] = groups if groups is not None else {}
+        self.full_listing_at = full_listing_at
+        self.watermark = watermark
+        self._order = _newest_first(self.groups)
+        self._order.reverse()
+        self._tiers: Dict[str, _TierBuckets] = {}
+        # key -> timestamp, built on the first discard()
+        self._key_groups: Optional[Dict[str, datetime]] = None
+
+    def advance_watermark(self, key: Optional[str]) -> None:
+        if key is not None and (self.watermark is None or key > self.watermark):
+            self.watermark = key
+
+    @staticmethod
+    def make_fingerprint(filename_ts_re: re.Pattern[str], timestamp_format: str) -> str:
+        return json.dumps([filename_ts_re.pattern, filename_ts_re.flags, timestamp_format])
+
+    @classmethod
+    def from_plan(
+        cls,
+        plan: RetentionPlan,
+        fingerprint: str,
+        full_listing_at: Optional[datetime],
+    ) -> "GroupIndex":
+        return cls(
+            fingerprint,
+            {g.timestamp: list(g.keys) for g in plan.groups},
+            full_listing_at,
+            max((k for g in plan.groups for k in g.keys), default=None),
+        )
+
+    def _tier(self, tier: str) -> _TierBuckets:
+        buckets = self._tiers.get(tier)
+        if buckets is None:
+            buckets = self._tiers[tier] = _TierBuckets(tier, self._order)
+        return buckets
+
+    def add(self, key: str, dt: datetime) -> bool:
+        keys = self.groups.get(dt)
+        if keys is None:
+            keys = self.groups[dt] = []
+            # Backups mostly arrive newest-last, making this an append.
+            bisect.insort(self._order, dt)
+            for buckets in self._tiers.values():
+                buckets.add(dt)
+        elif key in keys:
+            return False
+        keys.append(key)
+        if self._key_groups is not None:
+            self._key_groups[key] = dt
+        return True
+
+    def discard(self, keys: Iterable[str]) -> int:
+        if self._key_groups is None:
+            self._key_groups = {k: dt for dt, members in self.groups.items() for k in members}
+        doomed: Dict[datetime, set] = {}
+        for key in keys:
+            dt = self._key_groups.pop(key, None)
+            if dt is not None:
+                doomed.setdefault(dt, set()).add(key)
+
+        removed = 0
+        for dt, gone in doomed.items():
+            members = self.groups[dt]
+            kept = [k for k in members if k not in gone]
+            removed += len(members) - len(kept)
+            if kept:
+                self.groups[dt] = kept
+                continue
+            del self.groups[dt]
+            pos = bisect.bisect_left(self._order, dt)
+            del self._order[pos]
+            previous = self._order[pos - 1] if pos else None
+            for buckets in self._tiers.values():
+                buckets.remove(dt, previous)
+        return removed
+
+    def keepers(self, policy: RetentionPolicy) -> Dict[datetime, Tuple[str, ...]]:
+        """Same result as `select_keepers(self.groups, policy)`."""
+        tags: Dict[datetime, set] = {}
+        with _phase("Selection"):
+            for tier, keep_n in policy.tiers():
+                for dt in self._tier(tier).kept(keep_n):
+                    tags.setdefault(dt, set()).add(tier)
+        return {dt: tuple(t for t in _TAG_ORDER if t in found) for dt, found in tags.items()}
+
+    def plan(self, policy: RetentionPolicy) -> RetentionPlan:
+        keepers = self.keepers(policy)
+        records = []
+        for dt in self._order:
+            if dt in keepers:
+                records.append(GroupRecord(dt, list(self.groups[dt]), "keep", keepers[dt]))
+            else:
+                records.append(GroupRecord(dt, list(self.groups[dt])))
+        return RetentionPlan(records, [])
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "version": self.VERSION,
+                "fingerprint": self.fingerprint,
+                "full_listing_at": (
+                    self.full_listing_at.isoformat() if self.full_listing_at else None
+                ),
+                "watermark": self.watermark,
+                "groups": {dt.isoformat(): self.groups[dt] for dt in self._order},
+            },
+            separators=(",", ":"),
+        )
+
+    @classmethod
+    def from_json(cls, text: str) -> "GroupIndex":
+        data = json.loads(text)
+        if data.get("version") != cls.VERSION:
+            raise ValueError(f"Unsupported group index version: {data.get('version')}")
+        full_listing_at = data.get("full_listing_at")
+        return cls(
+            data["fingerprint"],
+            {datetime.fromisoformat(ts): keys for ts, keys in data["groups"].items()},
+            datetime.fromisoformat(full_listing_at) if full_listing_at else None,
+            data.get("watermark"),
+        )
+
+
+class LocalIndexStore:
+    """Keeps the group index in a local file."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def load(self) -> Optional[str]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as fh:
+                return fh.read()
+        except FileNotFoundError:
+            return None
+
+    def save(self, text: str) -> None:
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        os.replace(tmp, self.path)
+
+
+class S3IndexStore:
+    """Keeps the group index in an S3 object."""
+
+    def __init__(self, bucket: str, key: str, region: Optional[str] = None, *, client=None) -> None:
+        self.bucket = bucket
+        self.key = key
+        self.region = region
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = _s3_client(self.region)
+        return self._client
+
+    def load(self) -> Optional[str]:
+        from botocore.exceptions import ClientError
+
+        try:
+            resp = self.client.get_object(Bucket=self.bucket, Key=self.key)
+        except ClientError as exc:
+            if exc.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+        return resp["Body"].read().decode("utf-8")
+
+    def save(self, text: str) -> None:
+        self.client.put_object(
+            Bucket=self.bucket,
+            Key=self.key,
+            Body=text.encode("utf-8"),
+            ContentType="application/json",
+        )
+
+
+def index_store_from_uri(uri: str, region: Optional[str] = None, *, client=None):
+    """`s3://bucket/key` selects `S3IndexStore`; anything else is a local path."""
+    if uri.startswith("s3://"):
+        bucket, _sep, key = uri[len("s3://") :].partition("/")
+        if not bucket or not key:
+            raise RuntimeError(f"Invalid index URI (expected s3://bucket/key): {uri}")
+        return S3IndexStore(bucket, key, region, client=client)
+    return LocalIndexStore(uri)
+
+
+class Lease:
     """
-    Parse a UTC timestamp from the object key using the provided regex.
-    Returns timezone-aware UTC datetime if match; otherwise None.
+    Coalesces overlapping runs. A lease record holds an owner token and an
+    expiry time; `acquire` only succeeds while no record exists or the
+    current one has expired, and every write is a compare-and-swap on the
+    record it read, so exactly one of several racing runs wins. `release`
+    keeps the record for a cooldown, which makes runs triggered by the
+    same burst of events exit instead of planning again.
+
+    Subclasses provide `_read` (record text and version, or None),
+    `_create` and `_replace`; both writes return False when they lose.
     """
-    m = filename_ts_re.search(key)
-    if not m:
-        return None
-    try:
-        ts = m.group(1)
-        dt = datetime.strptime(ts, timestamp_format)
-        return dt.replace(tzinfo=timezone.utc)
-    except (ValueError, IndexError):
-        return None
 
+    def __init__(self) -> None:
+        self.token: Optional[str] = None
 
-def fetch_from_s3(bucket: str, prefix: str = "", region: Optional[str] = None) -> List[str]:
-    logger.info("Listing objects from s3://%s/%s", bucket, prefix)
-    session = boto3.session.Session(region_name=region) if region else boto3.session.Session()
-    s3 = session.client("s3")
+    def _read(self) -> Optional[Tuple[str, object]]:
+        raise NotImplementedError
 
-    out: List[str] = []
-    token = None
+    def _create(self, text: str) -> bool:
+        raise NotImplementedError
 
-    while True:
-        kwargs = {"Bucket": bucket, "Prefix": prefix, "MaxKeys": 1000}
-        if token:
-            kwargs["ContinuationToken"] = token
+    def _replace(self, text: str, version: object) -> bool:
+        raise NotImplementedError
 
-        resp = s3.list_objects_v2(**kwargs)
-        for item in resp.get("Contents", []):
-            out.append(item["Key"])
+    @staticmethod
+    def _record(owner: Optional[str], expires: float) -> str:
+        return json.dumps({"owner": owner, "expires": expires})
 
-        if resp.get("IsTruncated"):
-            token = resp.get("NextContinuationToken")
+    def acquire(self, ttl: timedelta) -> bool:
+        """
+        Takes the lease for up to `ttl` (the longest a run may take).
+        Returns False if another run holds it or its cooldown is running.
+        """
+        token = os.urandom(8).hex()
+        now = time.time()
+        text = self._record(token, now + ttl.total_seconds())
+        current = self._read()
+        if current is None:
+            won = self._create(text)
         else:
-            break
+            record, version = current
+            try:
+                expires = float(json.loads(record)["expires"])
+            except (ValueError, KeyError, TypeError):
+                expires = 0.0  # unreadable: treat as expired
+            if expires > now:
+                return False
+            won = self._replace(text, version)
+        if won:
+            self.token = token
+        return won
 
-    logger.info("Listed %d object keys", len(out))
-    return out
+    def release(self, cooldown: timedelta = timedelta(0)) -> None:
+        """Ends the held lease; new runs can acquire it once `cooldown` passes."""
+        if self.token is None:
+            return
+        current = self._read()
+        if current is not None:
+            record, version = current
+            try:
+                owner = json.loads(record).get("owner")
+            except (ValueError, AttributeError):
+                owner = None
+            if owner == self.token:
+                self._replace(self._record(None, time.time() + cooldown.total_seconds()), version)
+        self.token = None
 
 
-def core_logic(
-    keys: Iterable[str],
-    policy: RetentionPolicy,
-    *,
-    filename_ts_re: re.Pattern[str],
-    timestamp_format: str,
-) -> List[DecisionTuple]:
+class LocalLease(Lease):
+    """
+    Lease kept in a local file, for tests and single-host runs. The file is
+    created with `O_EXCL`; an expired one is renamed aside before it is
+    replaced, so only one racing process can take it over.
     """
-    Receives object keys, parses timestamps from names, and returns decisions:
-      (key, "keep"/"remove", tag)
 
-    Tags:
-      daily/weekly/monthly/unparsed/none
+    def __init__(self, path: str) -> None:
+        super().__init__()
+        self.path = path
 
-    Conservative behavior:
-      - unparsed timestamps => ignore (tag=unparsed)
-    """
-    parsed_items: List[Tuple[int, str, datetime]] = []
-    unparsed_items: List[Tuple[int, str]] = []
-    for idx, k in enumerate(keys):
-        dt = parse_timestamp_from_key(k, filename_ts_re, timestamp_format)
-        if dt is None:
-            unparsed_items.append((idx, k))
-        else:
-            parsed_items.append((idx, k, dt))
+    def _read(self) -> Optional[Tuple[str, object]]:
+        try:
+            with open(self.path, "r", encoding="utf-8") as fh:
+                text = fh.read()
+        except FileNotFoundError:
+            return None
+        return text, text
 
-    if not parsed_items:
-        logger.info("All %d keys ignored (no timestamp match)", len(unparsed_items))
-        return [
-            (k, "ignore", "unparsed")
-            for _idx, k in sorted(unparsed_items, key=lambda x: x[0])
-        ]
+    def _create(self, text: str) -> bool:
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        return True
 
-    groups: Dict[datetime, List[Tuple[int, str]]] = {}
-    for idx, k, dt in parsed_items:
-        groups.setdefault(dt, []).append((idx, k))
+    def _replace(self, text: str, version: object) -> bool:
+        aside = f"{self.path}.{os.urandom(4).hex()}"
+        try:
+            os.rename(self.path, aside)
+        except FileNotFoundError:
+            return False
+        with open(aside, "r", encoding="utf-8") as fh:
+            current = fh.read()
+        if current != version:
+            # Someone else replaced it since we read it: put theirs back.
+            try:
+                os.link(aside, self.path)
+            except FileExistsError:
+                pass
+            os.unlink(aside)
+            return False
+        os.unlink(aside)
+        return self._create(text)
 
-    logger.info(
-        "Parsed %d keys into %d timestamp groups (%d unparsed)",
-        len(parsed_items),
-        len(groups),
-        len(unparsed_items),
-    )
 
-    # Newest -> oldest for selection
-    group_dts_newest = sorted(groups.keys(), reverse=True)
-    keepers: Dict[datetime, set] = {}  # timestamp -> tags
+_LEASE_LOST_CODES = frozenset(
+    {"PreconditionFailed", "412", "ConditionalRequestConflict", "409", "NoSuchKey", "404"}
+)
 
-    def select(bucket_fn, keep_n: int, tag: str) -> None:
-        if keep_n <= 0:
-            return
-        seen = set()
-        for dt in group_dts_newest:
-            bucket = bucket_fn(dt)
-            if bucket in seen:
-                continue
-            seen.add(bucket)
-            keepers.setdefault(dt, set()).add(tag)
-            if len(seen) >= keep_n:
-                break
 
-    def day_bucket(dt: datetime) -> Tuple[int, int, int]:
-        return (dt.year, dt.month, dt.day)
+class S3Lease(Lease):
+    """
+    Lease kept in an S3 object, written with conditional puts: `If-None-Match`
+    creates it only if absent and `If-Match` replaces only the version read.
+    """
 
-    def iso_week_bucket(dt: datetime) -> Tuple[int, int]:
-        iso = dt.isocalendar()
-        return (iso.year, iso.week)
+    def __init__(self, bucket: str, key: str, region: Optional[str] = None, *, client=None) -> None:
+        super().__init__()
+        self.bucket = bucket
+        self.key = key
+        self.region = region
+        self._client = client
 
-    def month_bucket(dt: datetime) -> Tuple[int, int]:
-        return (dt.year, dt.month)
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = _s3_client(self.region)
+        return self._client
 
-    # Priority: most specific first
-    select(day_bucket, policy.keep_daily, "daily")
-    select(iso_week_bucket, policy.keep_weekly, "weekly")
-    select(month_bucket, policy.keep_monthly, "monthly")
+    def _read(self) -> Optional[Tuple[str, object]]:
+        from botocore.exceptions import ClientError
 
-    # Output list: oldest->newest for parsed items, then unparsed (original order)
-    out: List[DecisionTuple] = []
-    group_dts_oldest = sorted(groups.keys())
-    tag_order = ("monthly", "weekly", "daily")
-    for dt in group_dts_oldest:
-        keys_with_idx = sorted(groups[dt], key=lambda x: x[0])
-        if dt in keepers:
-            tags = keepers[dt]
-            tag = ",".join(t for t in tag_order if t in tags)
-            decision = "keep"
-        else:
-            tag = ""
-            decision = "remove"
-        for _idx, k in keys_with_idx:
-            out.append((k, decision, tag))
+        try:
+            resp = self.client.get_object(Bucket=self.bucket, Key=self.key)
+        except ClientError as exc:
+            if exc.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+        return resp["Body"].read().decode("utf-8"), resp["ETag"]
 
-    for _idx, k in sorted(unparsed_items, key=lambda x: x[0]):
-        out.append((k, "ignore", "unparsed"))
+    def _put(self, text: str, **condition) -> bool:
+        from botocore.exceptions import ClientError
 
-    counts = {"keep": 0, "remove": 0, "ignore": 0}
-    for _k, decision, _tag in out:
-        counts[decision] += 1
-    logger.info(
-        "Decisions: keep=%d remove=%d ignore=%d",
-        counts["keep"],
-        counts["remove"],
-        counts["ignore"],
-    )
+        try:
+            self.client.put_object(
+                Bucket=self.bucket,
+                Key=self.key,
+                Body=text.encode("utf-8"),
+                ContentType="application/json",
+                **condition,
+            )
+        except ClientError as exc:
+            # 412: the condition failed; 409: a concurrent conditional write
+            # won; NoSuchKey: the object to replace was deleted meanwhile.
+            if exc.response.get("Error", {}).get("Code") in _LEASE_LOST_CODES:
+                return False
+            raise
+        return True
 
-    return out
+    def _create(self, text: str) -> bool:
+        return self._put(text, IfNoneMatch="*")
 
+    def _replace(self, text: str, version: object) -> bool:
+        return self._put(text, IfMatch=version)
 
-def apply_removal(
-    bucket: str,
-    decisions: List[DecisionTuple],
+
+def lease_from_uri(uri: str, region: Optional[str] = None, *, client=None) -> Lease:
+    """`s3://bucket/key` selects `S3Lease`; anything else is a local path."""
+    if uri.startswith("s3://"):
+        bucket, _sep, key = uri[len("s3://") :].partition("/")
+        if not bucket or not key:
+            raise RuntimeError(f"Invalid lease URI (expected s3://bucket/key): {uri}")
+        return S3Lease(bucket, key, region, client=client)
+    return LocalLease(uri)
+
+
+def load_group_index(store, fingerprint: str) -> Optional[GroupIndex]:
+    text = store.load()
+    if text is None:
+        logger.info("No group index found")
+        return None
+    try:
+        index = GroupIndex.from_json(text)
+    except (ValueError, KeyError, TypeError) as exc:
+        logger.warning("Ignoring unreadable group index: %s", exc)
+        return None
+    if index.fingerprint != fingerprint:
+        logger.info("Group index was built with a different regex/format; rebuilding")
+        return None
+    return index
+
+
+def run_incremental(
+    event: Optional[dict],
     *,
+    bucket: str,
+    prefix: str,
+    policy: RetentionPolicy,
+    store,
+    list_keys: Callable[..., Iterable[str]],
     filename_ts_re: re.Pattern[str],
     timestamp_format: str,
+    full_relist_after: timedelta,
     region: Optional[str] = None,
     min_remaining: int = 5,
     dry_run: bool = True,
+    delete_concurrency: int = 1,
+    client=None,
+    now: Optional[datetime] = None,
+    folders: bool = False,
+    backend: Optional[StorageBackend] = None,
 ) -> dict:
     """
-    Applies deletions for entries marked "remove", grouped by timestamp.
+    Run backed by a persisted `GroupIndex` snapshot.
 
-    Deletion order is oldest-first by timestamp.
+    `list_keys(start_after=None)` must return the bucket listing, resumed
+    after `start_after` when given. Depending on the index and `event`:
 
-    Safety:
-      - Maintains a running count of remaining backup groups (unique timestamps).
-      - Before deleting another group, if remaining <= min_remaining, aborts the loop.
+      - Full reconciliation: when the index is missing, was built for another
+        regex/format, or its last full listing is older than
+        `full_relist_after`, the whole bucket is listed and the index rebuilt.
+        This is what picks up deletes made elsewhere and keys uploaded out of
+        order (below the watermark).
+      - Event merge: S3 notifications in `event` are merged into the index
+        without listing at all. Events that touch no backup keys return
+        immediately, which also absorbs the notification caused by saving an
+        index that lives in the same bucket.
+      - Delta listing: any other invocation (e.g. a schedule, or `event=None`)
+        lists only the keys after the index watermark.
 
-    Returns a dict suitable for logging:
-      {
-        "total": int,
-        "total_groups": int,
-        "deleted": int,
-        "deleted_groups": int,
-        "skipped": bool,
-        "reason": str,
-        "deleted_keys": [...]
-      }
+    Keep/remove is then recomputed from the index and applied. With
+    `folders`, `list_keys` returns folder prefixes and `apply_removal`
+    expands them (S3 events carry object keys, so pass `event=None`).
     """
-    total_objects = len(decisions)
-    groups: Dict[datetime, List[str]] = {}
-    group_decisions: Dict[datetime, str] = {}
-
-    for key, decision, _tag in decisions:
-        if decision == "ignore":
-            continue
-        dt = parse_timestamp_from_key(key, filename_ts_re, timestamp_format)
-        if dt is None:
-            raise RuntimeError(f"Expected timestamp for key but none found: {key}")
-        if dt not in groups:
-            groups[dt] = []
-            group_decisions[dt] = decision
-        elif group_decisions[dt] != decision:
-            raise RuntimeError(f"Inconsistent decisions for timestamp group {dt.isoformat()}")
-        groups[dt].append(key)
-
-    total_groups = len(groups)
-    remaining_groups = total_groups
+    now = now or datetime.now(timezone.utc)
+    fingerprint = GroupIndex.make_fingerprint(filename_ts_re, timestamp_format)
+    changes = parse_s3_event(event, bucket, prefix)
+    index = load_group_index(store, fingerprint)
 
-    if total_groups <= min_remaining:
+    if (
+        index is None
+        or index.full_listing_at is None
+        or now - index.full_listing_at >= full_relist_after
+    ):
+        logger.info("Group index: full reconciliation listing")
+        full_plan = build_plan(
+            list_keys(start_after=None),
+            policy,
+            filename_ts_re=filename_ts_re,
+            timestamp_format=timestamp_format,
+        )
+        index = GroupIndex.from_plan(full_plan, fingerprint, now)
+    else:
+        added = 0
+        removed = 0
+        if changes is not None:
+            created: Iterable[str] = changes.created
+            removed = index.discard(changes.removed)
+            source = "event"
+        else:
+            created = list_keys(start_after=index.watermark)
+            source = "delta listing"
+        for key in created:
+            dt = parse_timestamp_from_key(key, filename_ts_re, timestamp_format)
+            if dt is None:
+                continue
+            if index.add(key, dt):
+                added += 1
+            # Only listings move the watermark: event keys can arrive out of
+            # order, and skipping past an unseen key would hide it.
+            if changes is None:
+                index.advance_watermark(key)
         logger.info(
-            "Safety floor hit before deletes: total_groups=%d min_remaining=%d",
-            total_groups,
-            min_remaining,
+            "Group index: merged %s (added=%d removed=%d)", source, added, removed
         )
-        return {
-            "total": total_objects,
-            "total_groups": total_groups,
-            "deleted": 0,
-            "deleted_groups": 0,
-            "skipped": True,
-            "reason": (
-                f"Only {total_groups} backup groups exist (<= {min_remaining}). "
-                "No deletions performed."
-            ),
-            "deleted_keys": [],
-        }
+        if not added and not removed:
+            if source != "event":
+                store.save(index.to_json())
+            return {
+                "total": sum(len(keys) for keys in index.groups.values()),
+                "total_groups": len(index.groups),
+                "deleted": 0,
+                "deleted_groups": 0,
+                "skipped": True,
+                "reason": f"No new backup objects found ({source}).",
+                "deleted_keys": [],
+            }
 
-    # Plan deletions in-order, aborting once we'd hit the safety floor
-    keys_to_delete: List[str] = []
-    deleted_groups = 0
-    for dt in sorted(groups.keys()):
-        if group_decisions[dt] != "remove":
-            continue
+    result = apply_removal(
+        bucket=bucket,
+        decisions=index,
+        policy=policy,
+        region=region,
+        min_remaining=min_remaining,
+        dry_run=dry_run,
+        client=client,
+        delete_concurrency=delete_concurrency,
+        folders=folders,
+        backend=backend,
+    )
+    store.save(index.to_json())
+    return result
 
-        # If we delete this group, remaining decreases by 1.
-        next_remaining = remaining_groups - 1
-        if next_remaining < min_remaining:
-            logger.info(
-                "Stopping deletes at min_remaining=%d (remaining_groups=%d)",
-                min_remaining,
-                remaining_groups,
-            )
-            break
 
-        keys_to_delete.extend(groups[dt])
-        remaining_groups = next_remaining
-        deleted_groups += 1
+TIMESTAMP_SOURCES = ("key", "last_modified")
 
-    if not keys_to_delete:
-        logger.info(
-            "No deletions selected after planning (min_remaining=%d)", min_remaining
-        )
-        return {
-            "total": total_objects,
-            "total_groups": total_groups,
-            "deleted": 0,
-            "deleted_groups": 0,
-            "skipped": False,
-            "reason": (
-                f"No deletions selected (would hit safety floor of {min_remaining} backup "
-                "groups)."
-            ),
-            "deleted_keys": [],
-        }
 
-    if dry_run:
-        for key in keys_to_delete:
-            logger.info("DRY RUN delete s3://%s/%s", bucket, key)
-        return {
-            "total": total_objects,
-            "total_groups": total_groups,
-            "deleted": len(keys_to_delete),
-            "deleted_groups": deleted_groups,
-            "skipped": False,
-            "reason": "Dry run; deletions not executed.",
-            "deleted_keys": keys_to_delete,
-        }
+def _env_bool(environ: Mapping[str, str], name: str, default: str) -> bool:
+    return environ.get(name, default).lower() in ("1", "true", "yes", "y")
 
-    session = boto3.session.Session(region_name=region) if region else boto3.session.Session()
-    s3 = session.client("s3")
-
-    # Batch delete (max 1000 keys per call)
-    for i in range(0, len(keys_to_delete), 1000):
-        chunk = keys_to_delete[i : i + 1000]
-        for key in chunk:
-            logger.info("Deleting s3://%s/%s", bucket, key)
-        response = s3.delete_objects(
-            Bucket=bucket,
-            Delete={"Objects": [{"Key": k} for k in chunk], "Quiet": True},
-        )
-        errors = response.get("Errors", [])
-        if errors:
-            raise RuntimeError(f"S3 delete_objects reported errors: {errors}")
 
-    return {
-        "total": total_objects,
-        "total_groups": total_groups,
-        "deleted": len(keys_to_delete),
-        "deleted_groups": deleted_groups,
-        "skipped": False,
-        "reason": "Deletions executed.",
-        "deleted_keys": keys_to_delete,
-    }
+@dataclass(frozen=True)
+class RetentionConfig:
+    """Run configuration parsed and validated from the environment."""
 
+    bucket: str
+    prefix: str
+    region: Optional[str]
+    filename_ts_re: Optional[re.Pattern[str]]
+    timestamp_format: str
+    timestamp_cache_size: int
+    policy: RetentionPolicy
+    dry_run: bool
+    streaming: bool
+    incremental: bool
+    index_uri: str
+    full_relist_after: timedelta
+    min_remaining: int
+    delete_concurrency: int
+    list_concurrency: int
+    list_delimiter: str
+    list_split_points: Tuple[str, ...]
+    folders: bool = False
+    folder_depth: int = 1
+    prefix_pushdown: bool = True
+    inventory_manifest: str = ""
+    inventory_delta: bool = False
+    metrics: bool = False
+    metrics_namespace: str = "S3GFSRetainer"
+    profile: Tuple[str, ...] = ()
+    profile_output: str = ""
+    profile_top: int = 20
+    timestamp_source: str = "key"
+    group_window: timedelta = timedelta(0)
+    lease_uri: str = ""
+    local_root: str = ""
+    parse_workers: int = 1
+    parse_parallel_threshold: int = PARALLEL_PARSE_THRESHOLD
+    compact_keys: bool = False
+    lease_ttl: timedelta = timedelta(minutes=15)
+    debounce: timedelta = timedelta(0)
 
-def main() -> dict:
-    logging.basicConfig(
-        level=os.environ.get("S3_GFS_LOG_LEVEL", "INFO").upper(),
-        format="%(asctime)s %(levelname)s %(message)s",
-    )
-    logger.info("S3 GFS retention run started")
-    try:
-        bucket = os.environ["S3_BUCKET"]
-        prefix = os.environ.get("S3_PREFIX", "")
-        region = os.environ.get("AWS_REGION")
-        regex_value = os.environ.get("S3_GFS_REGEX")
+    @property
+    def max_pool_connections(self) -> int:
+        # One connection per concurrent request, never below botocore's default.
+        return max(10, self.list_concurrency, self.delete_concurrency)
+
+
+def load_config(environ: Mapping[str, str]) -> RetentionConfig:
+    local_root = environ.get("S3_GFS_LOCAL_ROOT", "")
+    bucket = environ.get("S3_BUCKET") or local_root
+    if not bucket:
+        raise RuntimeError("S3_BUCKET is required.")
+    if local_root:
+        # S3 notifications, inventories, folder listings and LastModified
+        # only exist on S3.
+        for name in ("S3_GFS_INCREMENTAL", "S3_GFS_FOLDERS"):
+            if _env_bool(environ, name, "false"):
+                raise RuntimeError(f"S3_GFS_LOCAL_ROOT cannot be combined with {name}.")
+        if environ.get("S3_GFS_INVENTORY_MANIFEST"):
+            raise RuntimeError(
+                "S3_GFS_LOCAL_ROOT cannot be combined with S3_GFS_INVENTORY_MANIFEST."
+            )
+        if environ.get("S3_GFS_TIMESTAMP_SOURCE", "key").lower() != "key":
+            raise RuntimeError("S3_GFS_LOCAL_ROOT requires S3_GFS_TIMESTAMP_SOURCE=key.")
+    timestamp_source = environ.get("S3_GFS_TIMESTAMP_SOURCE", "key").lower()
+    if timestamp_source not in TIMESTAMP_SOURCES:
+        raise RuntimeError("S3_GFS_TIMESTAMP_SOURCE must be key or last_modified.")
+    regex_value = environ.get("S3_GFS_REGEX")
+    filename_ts_re: Optional[re.Pattern[str]] = None
+    if timestamp_source == "last_modified":
+        # The regex is only a key filter here, so it needs no capture group.
+        if regex_value:
+            filename_ts_re = re.compile(regex_value)
+        # Those modes list or store keys without their LastModified.
+        for name in ("S3_GFS_STREAMING", "S3_GFS_INCREMENTAL", "S3_GFS_FOLDERS"):
+            if _env_bool(environ, name, "false"):
+                raise RuntimeError(f"S3_GFS_TIMESTAMP_SOURCE=last_modified cannot use {name}.")
+        for name in ("S3_GFS_INDEX_URI", "S3_GFS_INVENTORY_MANIFEST"):
+            if environ.get(name):
+                raise RuntimeError(f"S3_GFS_TIMESTAMP_SOURCE=last_modified cannot use {name}.")
+    else:
         if not regex_value:
             raise RuntimeError(
                 "S3_GFS_REGEX is required and must contain exactly one capture group."
@@ -339,55 +3468,376 @@ def main() -> dict:
         filename_ts_re = re.compile(regex_value)
         if filename_ts_re.groups != 1:
             raise RuntimeError("S3_GFS_REGEX must contain exactly one capture group.")
-        timestamp_format = os.environ.get(
-            "S3_GFS_TIMESTAMP_FORMAT", "%Y-%m-%dT%H:%M:%SZ"
-        )
 
+    incremental = _env_bool(environ, "S3_GFS_INCREMENTAL", "false")
+    index_uri = environ.get("S3_GFS_INDEX_URI", "")
+    if incremental and not index_uri:
+        raise RuntimeError("S3_GFS_INDEX_URI is required when S3_GFS_INCREMENTAL is enabled.")
+
+    folders = _env_bool(environ, "S3_GFS_FOLDERS", "false")
+    if folders:
+        for name in ("S3_GFS_STREAMING", "S3_GFS_INCREMENTAL"):
+            if _env_bool(environ, name, "false"):
+                raise RuntimeError(f"S3_GFS_FOLDERS cannot be combined with {name}.")
+        if environ.get("S3_GFS_INVENTORY_MANIFEST"):
+            raise RuntimeError("S3_GFS_FOLDERS cannot be combined with S3_GFS_INVENTORY_MANIFEST.")
+
+    profile = tuple(
+        mode.strip().lower()
+        for mode in environ.get("S3_GFS_PROFILE", "").split(",")
+        if mode.strip()
+    )
+    unknown = [mode for mode in profile if mode not in PROFILE_MODES]
+    if unknown:
+        raise RuntimeError(f"S3_GFS_PROFILE must be cpu, memory or both, not {','.join(unknown)}.")
+
+    return RetentionConfig(
+        bucket=bucket,
+        prefix=environ.get("S3_PREFIX", ""),
+        region=environ.get("AWS_REGION"),
+        filename_ts_re=filename_ts_re,
+        timestamp_format=environ.get("S3_GFS_TIMESTAMP_FORMAT", "%Y-%m-%dT%H:%M:%SZ"),
+        timestamp_cache_size=int(
+            environ.get("S3_GFS_TIMESTAMP_CACHE_SIZE", str(TIMESTAMP_CACHE_SIZE))
+        ),
         # Defaults are the policy you described; tweak via env if desired.
-        policy = RetentionPolicy(
-            keep_daily=int(os.environ.get("S3_GFS_KEEP_DAILY", "7")),
-            keep_weekly=int(os.environ.get("S3_GFS_KEEP_WEEKLY", "4")),
-            keep_monthly=int(os.environ.get("S3_GFS_KEEP_MONTHLY", "12")),
-        )
+        policy=RetentionPolicy(
+            keep_daily=int(environ.get("S3_GFS_KEEP_DAILY", "7")),
+            keep_weekly=int(environ.get("S3_GFS_KEEP_WEEKLY", "4")),
+            keep_monthly=int(environ.get("S3_GFS_KEEP_MONTHLY", "12")),
+            keep_hourly=int(environ.get("S3_GFS_KEEP_HOURLY", "0")),
+            keep_yearly=int(environ.get("S3_GFS_KEEP_YEARLY", "0")),
+        ),
+        dry_run=_env_bool(environ, "S3_GFS_DRY_RUN", "true"),
+        streaming=_env_bool(environ, "S3_GFS_STREAMING", "false"),
+        incremental=incremental,
+        index_uri=index_uri,
+        full_relist_after=timedelta(hours=float(environ.get("S3_GFS_FULL_RELIST_HOURS", "24"))),
+        min_remaining=int(environ.get("S3_GFS_MIN_REMAINING", "5")),
+        delete_concurrency=int(environ.get("S3_GFS_DELETE_CONCURRENCY", "1")),
+        list_concurrency=int(environ.get("S3_GFS_LIST_CONCURRENCY", "1")),
+        list_delimiter=environ.get("S3_GFS_LIST_DELIMITER", "/"),
+        list_split_points=tuple(
+            p for p in environ.get("S3_GFS_LIST_SPLIT_POINTS", "").split(",") if p
+        ),
+        folders=folders,
+        folder_depth=int(environ.get("S3_GFS_FOLDER_DEPTH", "1")),
+        prefix_pushdown=_env_bool(environ, "S3_GFS_PREFIX_PUSHDOWN", "true"),
+        inventory_manifest=environ.get("S3_GFS_INVENTORY_MANIFEST", ""),
+        inventory_delta=_env_bool(environ, "S3_GFS_INVENTORY_DELTA", "false"),
+        metrics=_env_bool(environ, "S3_GFS_METRICS", "false"),
+        metrics_namespace=environ.get("S3_GFS_METRICS_NAMESPACE", "S3GFSRetainer"),
+        profile=profile,
+        profile_output=environ.get("S3_GFS_PROFILE_OUTPUT", ""),
+        profile_top=int(environ.get("S3_GFS_PROFILE_TOP", "20")),
+        timestamp_source=timestamp_source,
+        group_window=timedelta(seconds=float(environ.get("S3_GFS_GROUP_WINDOW_SECONDS", "0"))),
+        lease_uri=environ.get("S3_GFS_LEASE_URI", ""),
+        local_root=local_root,
+        # 0 means one worker per CPU.
+        parse_workers=int(environ.get("S3_GFS_PARSE_WORKERS", "1")) or os.cpu_count() or 1,
+        parse_parallel_threshold=int(
+            environ.get("S3_GFS_PARSE_PARALLEL_THRESHOLD", str(PARALLEL_PARSE_THRESHOLD))
+        ),
+        compact_keys=_env_bool(environ, "S3_GFS_COMPACT_KEYS", "false"),
+        lease_ttl=timedelta(seconds=float(environ.get("S3_GFS_LEASE_TTL_SECONDS", "900"))),
+        debounce=timedelta(seconds=float(environ.get("S3_GFS_DEBOUNCE_SECONDS", "0"))),
+    )
+
+
+# Environment variables, besides S3_*, that change how the S3 client is built.
+_CLIENT_ENV_VARS = (
+    "AWS_REGION",
+    "AWS_DEFAULT_REGION",
+    "AWS_PROFILE",
+    "AWS_ACCESS_KEY_ID",
+    "AWS_SECRET_ACCESS_KEY",
+    "AWS_SESSION_TOKEN",
+    "AWS_ENDPOINT_URL",
+    "AWS_ENDPOINT_URL_S3",
+)
+
+
+class RuntimeContext:
+    """
+    State kept across warm Lambda invocations: the parsed `RetentionConfig`
+    and one S3 client (with its session and connection pool). Both are
+    rebuilt only when the relevant environment variables change.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._config_key: Optional[Tuple[Tuple[str, str], ...]] = None
+        self._config: Optional[RetentionConfig] = None
+        self._client_key: Optional[Tuple] = None
+        self._client = None
 
-        dry_run = os.environ.get("S3_GFS_DRY_RUN", "true").lower() in (
-            "1",
-            "true",
-            "yes",
-            "y",
+    def clear(self) -> None:
+        with self._lock:
+            self._config_key = None
+            self._config = None
+            self._client_key = None
+            self._client = None
+
+    def config(self, environ: Mapping[str, str]) -> RetentionConfig:
+        key = tuple(sorted((k, v) for k, v in environ.items() if k.startswith("S3_")))
+        key += tuple((k, environ.get(k, "")) for k in ("AWS_REGION",))
+        with self._lock:
+            if key != self._config_key or self._config is None:
+                self._config = load_config(environ)
+                self._config_key = key
+                logger.debug("Loaded configuration from environment")
+            return self._config
+
+    def s3_client(self, region: Optional[str] = None, max_pool_connections: int = 10):
+        key = (
+            region,
+            max_pool_connections,
+            tuple(os.environ.get(k, "") for k in _CLIENT_ENV_VARS),
         )
-        min_remaining = int(os.environ.get("S3_GFS_MIN_REMAINING", "5"))
+        with self._lock:
+            if key != self._client_key or self._client is None:
+                # Deferred: boto3 is a large share of cold-start time, and runs
+                # that fail validation or never touch S3 should not pay for it.
+                import boto3
+                from botocore.config import Config as BotoConfig
+
+                session = (
+                    boto3.session.Session(region_name=region)
+                    if region
+                    else boto3.session.Session()
+                )
+                self._client = session.client(
+                    "s3",
+                    config=BotoConfig(
+                        max_pool_connections=max_pool_connections,
+                        retries={"mode": "standard"},
+                        tcp_keepalive=True,
+                    ),
+                )
+                self._client_key = key
+                logger.debug("Created S3 client (max_pool_connections=%d)", max_pool_connections)
+            return self._client
+
+
+_RUNTIME = RuntimeContext()
+
+
+def main(event: Optional[dict] = None) -> dict:
+    global _METRICS, _PROFILER
+    logging.basicConfig(
+        level=os.environ.get("S3_GFS_LOG_LEVEL", "INFO").upper(),
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    logger.info("S3 GFS retention run started")
+    profile_output = ""
+    lease: Optional[Lease] = None
+    completed = False
+    try:
+        config = _RUNTIME.config(os.environ)
+        bucket = config.bucket
+        prefix = config.prefix
+        region = config.region
+        policy = config.policy
+        dry_run = config.dry_run
+        min_remaining = config.min_remaining
+
+        timestamp_parser = get_timestamp_parser(config.timestamp_format)
+        timestamp_parser.cache_size = config.timestamp_cache_size
+        timestamp_parser.reset_stats()
+        if config.metrics:
+            _METRICS = RunMetrics(config.metrics_namespace, {"Bucket": bucket})
+        if config.profile:
+            profile_output = config.profile_output
+            _PROFILER = RunProfiler(config.profile, config.profile_top)
+            _PROFILER.start()
 
         logger.info(
-            "Config bucket=%s prefix=%s dry_run=%s min_remaining=%d keep_daily=%d keep_weekly=%d keep_monthly=%d",
+            "Config bucket=%s prefix=%s dry_run=%s streaming=%s min_remaining=%d keep_hourly=%d keep_daily=%d keep_weekly=%d keep_monthly=%d keep_yearly=%d",
             bucket,
             prefix,
             dry_run,
+            config.streaming,
             min_remaining,
+            policy.keep_hourly,
             policy.keep_daily,
             policy.keep_weekly,
             policy.keep_monthly,
+            policy.keep_yearly,
         )
 
-        keys = fetch_from_s3(bucket=bucket, prefix=prefix, region=region)
-        decisions = core_logic(
-            keys,
-            policy,
-            filename_ts_re=filename_ts_re,
-            timestamp_format=timestamp_format,
-        )
+        backend: StorageBackend
+        if config.local_root:
+            # An S3 client is only built if the lease or index lives in S3.
+            client = None
+            backend = LocalBackend(config.local_root)
+        else:
+            client = _RUNTIME.s3_client(region, config.max_pool_connections)
+            backend = S3Backend(
+                bucket,
+                region,
+                client=client,
+                concurrency=config.list_concurrency,
+                delimiter=config.list_delimiter,
+                split_points=list(config.list_split_points) or None,
+            )
+        if config.lease_uri:
+            lease = lease_from_uri(config.lease_uri, region, client=client)
+            if not lease.acquire(config.lease_ttl):
+                logger.info("Another run holds the lease or has just finished; exiting")
+                return {"coalesced": True}
+            if config.debounce:
+                # Let the rest of the triggering burst land (and find the lease held).
+                delay = config.debounce.total_seconds()
+                logger.info("Lease acquired; waiting %.1fs before listing", delay)
+                time.sleep(delay)
 
-        # Apply deletions
-        result = apply_removal(
-            bucket=bucket,
-            decisions=decisions,
-            filename_ts_re=filename_ts_re,
-            timestamp_format=timestamp_format,
-            region=region,
-            min_remaining=min_remaining,
-            dry_run=dry_run,
+        prefixes = [prefix]
+        if config.prefix_pushdown and config.filename_ts_re is not None:
+            prefixes = listing_prefixes(prefix, config.filename_ts_re)
+            if prefixes != [prefix]:
+                logger.info("Listing only the prefixes S3_GFS_REGEX can match: %s", prefixes)
+
+        # S3_GFS_FOLDER_DEPTH counts from S3_PREFIX, so a pushed-down prefix
+        # walks only the levels left below it. One that reaches past the
+        # folder level cannot be walked; the whole S3_PREFIX is then listed.
+        folder_depths = [
+            (p, config.folder_depth - p[len(prefix) :].count(config.list_delimiter))
+            for p in prefixes
+        ]
+        if any(depth < 1 for _p, depth in folder_depths):
+            folder_depths = [(prefix, config.folder_depth)]
+
+        def list_keys(start_after: Optional[str] = None) -> Iterator[str]:
+            if config.folders:
+                return (
+                    folder
+                    for p, depth in folder_depths
+                    for folder in iter_folder_prefixes(
+                        bucket,
+                        p,
+                        region,
+                        client=client,
+                        delimiter=config.list_delimiter,
+                        depth=depth,
+                        start_after=start_after,
+                    )
+                )
+            # The inventory replaces full listings; resumed listings stay on S3.
+            if config.inventory_manifest and start_after is None:
+                return iter_keys_from_inventory(
+                    config.inventory_manifest,
+                    bucket,
+                    prefix,
+                    region,
+                    client=client,
+                    delta=config.inventory_delta,
+                )
+            return (key for p in prefixes for key in backend.iter_keys(p, start_after))
+
+        if config.index_uri:
+            result = run_incremental(
+                event if config.incremental else None,
+                bucket=bucket,
+                prefix=prefix,
+                policy=policy,
+                store=index_store_from_uri(config.index_uri, region, client=client),
+                list_keys=list_keys,
+                filename_ts_re=config.filename_ts_re,
+                timestamp_format=config.timestamp_format,
+                full_relist_after=config.full_relist_after,
+                region=region,
+                min_remaining=min_remaining,
+                dry_run=dry_run,
+                delete_concurrency=config.delete_concurrency,
+                client=client,
+                folders=config.folders,
+                backend=backend,
+            )
+        elif config.streaming:
+            # Two listing passes, neither of which holds the full key set:
+            # the first counts groups, the second deletes as keys stream by.
+            summary = summarize_groups(
+                list_keys(),
+                filename_ts_re=config.filename_ts_re,
+                timestamp_format=config.timestamp_format,
+            )
+            keepers = select_keepers(summary.counts.keys(), policy)
+            result = apply_removal_streaming(
+                bucket=bucket,
+                keys=list_keys(),
+                summary=summary,
+                keepers=keepers,
+                filename_ts_re=config.filename_ts_re,
+                timestamp_format=config.timestamp_format,
+                region=region,
+                min_remaining=min_remaining,
+                dry_run=dry_run,
+                client=client,
+                delete_concurrency=config.delete_concurrency,
+                backend=backend,
+            )
+        elif config.timestamp_source == "last_modified":
+            # Grouped on the LastModified already in the listing; nothing is parsed.
+            plan = build_plan_from_objects(
+                iter_objects_from_s3(bucket, prefixes, region, client=client),
+                policy,
+                group_window=config.group_window,
+                key_filter=config.filename_ts_re,
+            )
+            result = apply_removal(
+                bucket=bucket,
+                decisions=plan,
+                region=region,
+                min_remaining=min_remaining,
+                dry_run=dry_run,
+                client=client,
+                delete_concurrency=config.delete_concurrency,
+            )
+        else:
+            plan = build_plan(
+                list_keys(),
+                policy,
+                filename_ts_re=config.filename_ts_re,
+                timestamp_format=config.timestamp_format,
+                parse_workers=config.parse_workers,
+                parallel_threshold=config.parse_parallel_threshold,
+                compact=config.compact_keys,
+            )
+
+            # Apply deletions
+            result = apply_removal(
+                bucket=bucket,
+                decisions=plan,
+                region=region,
+                min_remaining=min_remaining,
+                dry_run=dry_run,
+                client=client,
+                delete_concurrency=config.delete_concurrency,
+                folders=config.folders,
+                backend=backend,
+            )
+
+        cache_info = timestamp_parser.cache_info()
+        logger.info(
+            "Timestamp cache hits=%d misses=%d size=%d max_size=%d",
+            cache_info["hits"],
+            cache_info["misses"],
+            cache_info["size"],
+            cache_info["max_size"],
         )
 
+        metrics = _METRICS
+        if metrics is not None:
+            if not dry_run:
+                metrics.add("GroupsDeleted", result["deleted_groups"])
+            lookups = cache_info["hits"] + cache_info["misses"]
+            if lookups:
+                metrics.add("TimestampCacheHitRate", 100 * cache_info["hits"] / lookups)
+            mode = "index" if config.index_uri else "streaming" if config.streaming else "full"
+            # One EMF document per run; CloudWatch extracts the metrics from the log line.
+            print(json.dumps(metrics.to_emf({"Prefix": prefix, "DryRun": dry_run, "Mode": mode})))
+
         # If you run in Lambda, printing is captured by CloudWatch
         print(
             {
@@ -400,15 +3850,37 @@ def main() -> dict:
         )
 
         logger.info("S3 GFS retention run completed")
+        completed = True
         return result
     except Exception:
         logger.exception("S3 GFS retention run failed")
         raise
+    finally:
+        if lease is not None and lease.token is not None:
+            # A failed run frees the lease at once so a retry can run.
+            try:
+                lease.release(config.debounce if completed else timedelta(0))
+            except Exception:
+                logger.warning("Could not release the lease", exc_info=True)
+        _METRICS = None
+        profiler, _PROFILER = _PROFILER, None
+        if profiler is not None:
+            profiler.stop()
+            _write_profile(profiler.report(), profile_output)
+
+
+def _write_profile(report: str, path: str) -> None:
+    if path:
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(report)
+        logger.info("Profile written to %s", path)
+    else:
+        logger.info("Profile:\n%s", report)
 
 
 # Lambda handler compatibility
 def handler(event, context):
-    return main()
+    return main(event)
 
 
 if __name__ == "__main__":
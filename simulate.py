@@ -0,0 +1,176 @@
+"""
+What-if simulator for retention policies.
+
+Replays backup arrivals over a date range and runs the retention policy on a
+schedule, printing how many groups and bytes are retained and how many are
+deleted by each run. Selection and the `min_remaining` floor are the ones
+`main` uses; the groups live in a `GroupIndex`, so each simulated run only
+touches the groups that arrived or were deleted since the previous one.
+
+    python simulate.py --start 2023-01-01 --end 2026-01-01
+    python simulate.py --start 2024-01-01 --end 2026-01-01 \\
+        --backup-every-hours 6 --keep-hourly 24 --keep-yearly 3 --csv out.csv
+
+`--keep-*` and `--min-remaining` default to the `S3_GFS_*` environment
+variables, so the current production values can be compared against a change.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import time
+from dataclasses import astuple, dataclass, fields
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Optional
+
+import main as s3_gfs_main
+
+
+@dataclass(frozen=True)
+class SimulationStep:
+    """State of the simulated bucket right after one retention run."""
+
+    at: datetime
+    arrived_groups: int
+    deleted_groups: int
+    deleted_bytes: int
+    retained_groups: int
+    retained_bytes: int
+
+
+def _every(start: datetime, end: datetime, interval: timedelta) -> Iterator[datetime]:
+    at = start
+    while at < end:
+        yield at
+        at += interval
+
+
+def simulate(
+    policy: s3_gfs_main.RetentionPolicy,
+    *,
+    start: datetime,
+    end: datetime,
+    backup_interval: timedelta = timedelta(days=1),
+    run_interval: timedelta = timedelta(days=1),
+    run_delay: timedelta = timedelta(hours=1),
+    min_remaining: int = 5,
+    group_bytes: int = 1,
+) -> List[SimulationStep]:
+    """
+    Backups arrive every `backup_interval` from `start`; the retention run
+    fires every `run_interval` from `start + run_delay`, both until `end`.
+    Each backup is one group of `group_bytes` bytes. Returns one step per run.
+    """
+    if backup_interval <= timedelta(0) or run_interval <= timedelta(0):
+        raise ValueError("backup and run intervals must be positive")
+
+    index = s3_gfs_main.GroupIndex("simulation")
+    backups = _every(start, end, backup_interval)
+    pending: Optional[datetime] = next(backups, None)
+    steps: List[SimulationStep] = []
+
+    for run_at in _every(start + run_delay, end, run_interval):
+        arrived = 0
+        while pending is not None and pending <= run_at:
+            index.add(pending.isoformat(), pending)
+            arrived += 1
+            pending = next(backups, None)
+
+        deleted: List[s3_gfs_main.GroupRecord] = []
+        if len(index.groups) > min_remaining:
+            deleted = s3_gfs_main._plan_group_deletions(
+                index.plan(policy).groups, min_remaining
+            )
+            index.discard(k for group in deleted for k in group.keys)
+
+        steps.append(
+            SimulationStep(
+                at=run_at,
+                arrived_groups=arrived,
+                deleted_groups=len(deleted),
+                deleted_bytes=len(deleted) * group_bytes,
+                retained_groups=len(index.groups),
+                retained_bytes=len(index.groups) * group_bytes,
+            )
+        )
+    return steps
+
+
+def _parse_date(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, str(default)))
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--start", type=_parse_date, required=True)
+    parser.add_argument("--end", type=_parse_date, required=True)
+    parser.add_argument("--backup-every-hours", type=float, default=24)
+    parser.add_argument("--run-every-hours", type=float, default=24)
+    parser.add_argument("--run-delay-minutes", type=float, default=60)
+    parser.add_argument("--group-bytes", type=int, default=1 << 30)
+    defaults = s3_gfs_main.RetentionPolicy()
+    for tier in s3_gfs_main.RETENTION_TIERS:
+        parser.add_argument(
+            f"--keep-{tier}",
+            type=int,
+            default=_env_int(f"S3_GFS_KEEP_{tier.upper()}", getattr(defaults, f"keep_{tier}")),
+        )
+    parser.add_argument(
+        "--min-remaining", type=int, default=_env_int("S3_GFS_MIN_REMAINING", 5)
+    )
+    parser.add_argument("--csv", help="also write every step to this CSV file")
+    parser.add_argument(
+        "--print-every", type=int, default=1, help="print every Nth step (default: all)"
+    )
+    args = parser.parse_args(argv)
+
+    policy = s3_gfs_main.RetentionPolicy(
+        **{f"keep_{tier}": getattr(args, f"keep_{tier}") for tier in s3_gfs_main.RETENTION_TIERS}
+    )
+    began = time.perf_counter()
+    steps = simulate(
+        policy,
+        start=args.start,
+        end=args.end,
+        backup_interval=timedelta(hours=args.backup_every_hours),
+        run_interval=timedelta(hours=args.run_every_hours),
+        run_delay=timedelta(minutes=args.run_delay_minutes),
+        min_remaining=args.min_remaining,
+        group_bytes=args.group_bytes,
+    )
+    elapsed = time.perf_counter() - began
+
+    print(f"{'run':<20} {'arrived':>8} {'deleted':>8} {'groups':>8} {'retained GiB':>13}")
+    for n, step in enumerate(steps):
+        if n % max(1, args.print_every) and n != len(steps) - 1:
+            continue
+        print(
+            f"{step.at:%Y-%m-%d %H:%M}     {step.arrived_groups:>8} {step.deleted_groups:>8} "
+            f"{step.retained_groups:>8} {step.retained_bytes / (1 << 30):>13.1f}"
+        )
+
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as fh:
+            writer = csv.writer(fh)
+            writer.writerow([f.name for f in fields(SimulationStep)])
+            for step in steps:
+                row = astuple(step)
+                writer.writerow([row[0].isoformat(), *row[1:]])
+
+    if steps:
+        peak = max(steps, key=lambda step: step.retained_groups)
+        print(
+            f"\n{len(steps)} runs in {elapsed:.2f}s; "
+            f"deleted {sum(s.deleted_groups for s in steps)} groups; "
+            f"peak {peak.retained_groups} groups on {peak.at:%Y-%m-%d}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+
+import main as s3_gfs_main
+from fake_s3 import FakeS3Client
+
+# "a-c" sorts before "a/b.tar", but a directory walk reaches "a" first.
+KEYS = sorted(
+    [
+        "a-c",
+        "a/b.tar",
+        "a/b/c/d.tar",
+        "a/b/c/e.tar",
+        "a/bz/x",
+        "a0",
+        "b/2025-11-01.tar",
+        "b/2025-11-02.tar",
+    ]
+)
+
+
+def write_tree(root, keys):
+    for key in keys:
+        path = root.joinpath(*key.split("/"))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x")
+
+
+@pytest.fixture(params=["s3", "memory", "local"])
+def make_backend(request, tmp_path):
+    def make(keys):
+        if request.param == "s3":
+            return s3_gfs_main.S3Backend("bucket", client=FakeS3Client(keys), prefetch=0)
+        if request.param == "memory":
+            return s3_gfs_main.MemoryBackend(keys)
+        write_tree(tmp_path, keys)
+        return s3_gfs_main.LocalBackend(str(tmp_path), unlink_concurrency=4)
+
+    return make
+
+
+@pytest.mark.parametrize(
+    "prefix, start_after",
+    [("", None), ("a/", None), ("a/b", None), ("a/b/c/", None), ("", "a/b.tar"), ("a", "a/bz/")],
+)
+def test_backends_list_keys_in_s3_order(make_backend, prefix, start_after):
+    keys = list(KEYS)
+    backend = make_backend(keys)
+
+    listed = list(backend.iter_keys(prefix, start_after))
+
+    assert listed == [
+        k for k in keys if k.startswith(prefix) and (start_after is None or k > start_after)
+    ]
+
+
+def test_backends_delete_batches(make_backend):
+    keys = list(KEYS)
+    backend = make_backend(keys)
+
+    backend.delete_batch(["a/b/c/d.tar", "a/b/c/e.tar", "b/2025-11-01.tar", "missing"])
+
+    assert list(backend.iter_keys()) == ["a-c", "a/b.tar", "a/bz/x", "a0", "b/2025-11-02.tar"]
+
+
+@pytest.mark.parametrize("prefix", ["a/", "a/b/", "a-c/x"])
+def test_local_backend_lists_nothing_through_a_file(tmp_path, prefix):
+    write_tree(tmp_path, ["a", "a-c", "b/x"])
+    backend = s3_gfs_main.LocalBackend(str(tmp_path))
+
+    assert list(backend.iter_keys(prefix)) == []
+
+
+def test_local_backend_removes_emptied_directories(tmp_path):
+    write_tree(tmp_path, list(KEYS))
+    backend = s3_gfs_main.LocalBackend(str(tmp_path))
+
+    backend.delete_batch(["a/b/c/d.tar", "a/b/c/e.tar", "a/bz/x"])
+
+    assert not (tmp_path / "a" / "b").exists()
+    assert not (tmp_path / "a" / "bz").exists()
+    assert (tmp_path / "a" / "b.tar").exists()
+
+
+def test_local_backend_rejects_keys_outside_its_root(tmp_path):
+    backend = s3_gfs_main.LocalBackend(str(tmp_path / "root"))
+
+    with pytest.raises(ValueError, match="escapes"):
+        backend.delete_batch(["../outside"])
+    with pytest.raises(ValueError, match="escapes"):
+        backend.delete_batch(["../root-sibling/x"])
+
+
+def test_local_backend_accepts_keys_under_the_filesystem_root():
+    backend = s3_gfs_main.LocalBackend(os.sep)
+
+    assert backend._path("tmp/x") == os.path.join(os.sep, "tmp", "x")
+    with pytest.raises(ValueError, match="escapes"):
+        backend._path("")
+
+
+def test_local_backend_reports_failed_unlinks(tmp_path):
+    write_tree(tmp_path, ["dir/file"])
+    backend = s3_gfs_main.LocalBackend(str(tmp_path))
+
+    with pytest.raises(RuntimeError, match="Local delete reported errors"):
+        backend.delete_batch(["dir"])  # a directory, not a file
+
+
+def test_apply_removal_is_backend_agnostic(make_backend):
+    keys = [f"backup_2025-11-{day:02d}/part-{n}" for day in range(1, 13) for n in range(3)]
+    regex = s3_gfs_main.re.compile(r"^backup_(\d{4}-\d{2}-\d{2})/")
+    backend = make_backend(keys)
+    plan = s3_gfs_main.build_plan(
+        backend.iter_keys(),
+        s3_gfs_main.RetentionPolicy(keep_daily=4, keep_weekly=0, keep_monthly=0),
+        filename_ts_re=regex,
+        timestamp_format="%Y-%m-%d",
+    )
+
+    result = s3_gfs_main.apply_removal(
+        "bucket", plan, min_remaining=5, dry_run=False, delete_concurrency=2, backend=backend
+    )
+
+    assert result["deleted_groups"] == 7
+    assert list(backend.iter_keys()) == keys[7 * 3 :]
+
+
+def test_main_prunes_a_local_directory_without_s3(monkeypatch, main_runtime, tmp_path):
+    keys = [f"Automatic_backup_2025-11-{day:02d}.tar" for day in range(1, 11)] + ["notes.txt"]
+    write_tree(tmp_path, keys)
+    env = {
+        "S3_GFS_LOCAL_ROOT": str(tmp_path),
+        "S3_GFS_REGEX": r"^Automatic_backup_(\d{4}-\d{2}-\d{2})\.tar$",
+        "S3_GFS_TIMESTAMP_FORMAT": "%Y-%m-%d",
+        "S3_GFS_KEEP_DAILY": "3",
+        "S3_GFS_KEEP_WEEKLY": "0",
+        "S3_GFS_KEEP_MONTHLY": "0",
+        "S3_GFS_MIN_REMAINING": "0",
+        "S3_GFS_DRY_RUN": "false",
+    }
+    monkeypatch.delenv("S3_BUCKET", raising=False)
+    main_runtime(None, env)
+
+    def no_s3(*_args):
+        raise AssertionError("a local run must not build an S3 client")
+
+    monkeypatch.setattr(s3_gfs_main._RUNTIME, "s3_client", no_s3)
+
+    result = s3_gfs_main.main()
+
+    assert result["deleted_groups"] == 7
+    assert sorted(os.listdir(tmp_path)) == [*keys[7:10], "notes.txt"]
+
+
+@pytest.mark.parametrize(
+    "env",
+    [
+        {"S3_GFS_FOLDERS": "true"},
+        {"S3_GFS_INCREMENTAL": "true", "S3_GFS_INDEX_URI": "index.json"},
+        {"S3_GFS_INVENTORY_MANIFEST": "manifest.json"},
+        {"S3_GFS_TIMESTAMP_SOURCE": "last_modified"},
+    ],
+)
+def test_local_root_rejects_s3_only_modes(env):
+    with pytest.raises(RuntimeError, match="S3_GFS_LOCAL_ROOT"):
+        s3_gfs_main.load_config({"S3_GFS_LOCAL_ROOT": "/backups", "S3_GFS_REGEX": "(x)", **env})
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+import main as s3_gfs_main
+from benchmarks.suite import run_scenario
+from benchmarks.synthetic import FORMATS, generate_keys
+
+
+def test_synthetic_formats_parse_back():
+    for name, fmt in FORMATS.items():
+        keys = list(generate_keys(200, key_format=name, objects_per_group=4, unparsed_ratio=0.1))
+        summary = s3_gfs_main.summarize_groups(
+            keys, filename_ts_re=fmt.compile(), timestamp_format=fmt.timestamp_format
+        )
+
+        assert len(keys) == 200
+        assert len(summary.counts) == 45
+        assert summary.unparsed == 20
+
+
+def test_suite_scenario_smoke():
+    rows = run_scenario(
+        2_000,
+        "ha",
+        objects_per_group=2,
+        unparsed_ratio=0.05,
+        policy=s3_gfs_main.RetentionPolicy(),
+        min_remaining=5,
+        delete_concurrency=2,
+    )
+
+    assert [r["phase"] for r in rows] == [
+        "listing",
+        "parsing",
+        "selection",
+        "build_plan",
+        "planning",
+        "delete_dispatch",
+    ]
+    assert all(r["seconds"] >= 0 for r in rows)
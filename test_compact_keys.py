@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from array import array
+
+import pytest
+
+import main as s3_gfs_main
+from fake_s3 import FakeS3Client
+
+FILENAME_TS_RE = s3_gfs_main.re.compile(
+    r"Automatic_backup_\d+\.\d+\.\d+_(\d{4}-\d{2}-\d{2}_\d{2}\.\d{2})_"
+)
+TIMESTAMP_FORMAT = "%Y-%m-%d_%H.%M"
+POLICY = s3_gfs_main.RetentionPolicy(keep_daily=5, keep_weekly=2, keep_monthly=2)
+
+
+def ha_keys(days: int = 60) -> list:
+    keys = []
+    for day in range(days):
+        date = f"2025-{day // 28 + 1:02d}-{day % 28 + 1:02d}"
+        stem = f"Automatic_backup_2025.11.1_{date}_05.20_{day:08d}"
+        keys += [f"{stem}.metadata.json", f"{stem}.tar"]
+    return sorted(keys + ["README.md", "notes/ünïcödé.txt"])
+
+
+def test_compact_keys_round_trip():
+    keys = ["", "a", "ab", "abc", "b", "ba", "ünï", "ünïcödé", "x" * 300] + ha_keys(5)
+    store = s3_gfs_main.CompactKeys(keys)
+
+    assert len(store) == len(keys)
+    assert list(store) == keys
+    assert [store[i] for i in range(len(keys))] == keys
+    assert store[-1] == keys[-1]
+    with pytest.raises(IndexError):
+        store[len(keys)]
+
+
+def test_compact_keys_front_code_shared_prefixes():
+    keys = ha_keys(500)
+    store = s3_gfs_main.CompactKeys(keys)
+
+    assert store.nbytes * 2 < sum(len(k) for k in keys)
+
+
+def test_compact_key_view_iterates_runs_and_scattered_indices():
+    keys = [f"key-{i:04d}" for i in range(100)]
+    store = s3_gfs_main.CompactKeys(keys)
+    indices = array("I", [0, 1, 2, 15, 16, 17, 40, 99])
+
+    view = store.view(indices)
+
+    assert list(view) == [keys[i] for i in indices]
+    assert view == [keys[i] for i in indices]
+    assert view[3] == "key-0015"
+    assert view[2:4] == ["key-0002", "key-0015"]
+    assert "key-0040" in view
+
+
+def test_compact_plan_matches_the_list_plan():
+    keys = ha_keys()
+
+    plain = s3_gfs_main.build_plan(
+        keys, POLICY, filename_ts_re=FILENAME_TS_RE, timestamp_format=TIMESTAMP_FORMAT
+    )
+    compact = s3_gfs_main.build_plan(
+        iter(keys),
+        POLICY,
+        filename_ts_re=FILENAME_TS_RE,
+        timestamp_format=TIMESTAMP_FORMAT,
+        compact=True,
+    )
+
+    assert compact.decisions() == plain.decisions()
+    assert [(g.timestamp, g.decision, g.tags) for g in compact.groups] == [
+        (g.timestamp, g.decision, g.tags) for g in plain.groups
+    ]
+    assert isinstance(compact.groups[0].keys, s3_gfs_main.CompactKeyView)
+
+
+def test_compact_plan_groups_unordered_listings():
+    keys = ha_keys()
+    shuffled = keys[1::2] + keys[::2] + ["Automatic_backup_2025.11.1_1969-12-31_05.20_0.tar"]
+
+    plain = s3_gfs_main.build_plan(
+        shuffled, POLICY, filename_ts_re=FILENAME_TS_RE, timestamp_format=TIMESTAMP_FORMAT
+    )
+    compact = s3_gfs_main.build_plan(
+        iter(shuffled),
+        POLICY,
+        filename_ts_re=FILENAME_TS_RE,
+        timestamp_format=TIMESTAMP_FORMAT,
+        compact=True,
+    )
+
+    assert [(g.timestamp, sorted(g.keys), g.decision) for g in compact.groups] == [
+        (g.timestamp, sorted(g.keys), g.decision) for g in plain.groups
+    ]
+    assert sorted(compact.unparsed) == sorted(plain.unparsed)
+
+
+def test_main_with_compact_keys_deletes_the_same_keys(run_main):
+    keys = ha_keys()
+    env = {
+        "S3_BUCKET": "bucket",
+        "S3_GFS_REGEX": FILENAME_TS_RE.pattern,
+        "S3_GFS_TIMESTAMP_FORMAT": TIMESTAMP_FORMAT,
+        "S3_GFS_DRY_RUN": "false",
+    }
+    results = {}
+    for compact in ("false", "true"):
+        client = FakeS3Client(keys)
+        results[compact] = (run_main(client, env, S3_GFS_COMPACT_KEYS=compact), client.keys)
+
+    assert results["true"] == results["false"]
+    assert results["true"][0]["deleted_groups"] > 0
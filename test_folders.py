@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+import pytest
+
+import main as s3_gfs_main
+from fake_s3 import FakeS3Client
+
+ENV = {
+    "S3_BUCKET": "bucket",
+    "S3_GFS_REGEX": r"^db/(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z)/$",
+    "S3_GFS_FOLDERS": "true",
+    "S3_GFS_FOLDER_DEPTH": "2",
+    "S3_GFS_KEEP_DAILY": "3",
+    "S3_GFS_KEEP_WEEKLY": "0",
+    "S3_GFS_KEEP_MONTHLY": "0",
+    "S3_GFS_MIN_REMAINING": "0",
+    "S3_GFS_DRY_RUN": "false",
+}
+
+
+def folder(day: int) -> str:
+    return f"db/2025-11-{day:02d}T05:20:00Z/"
+
+
+def bucket_keys(days=range(1, 11), parts=50) -> list:
+    keys = [f"{folder(day)}part-{n:04d}" for day in days for n in range(parts)]
+    return keys + ["db/README.txt", "logs/x/app.log"]
+
+
+def test_iter_folder_prefixes_walks_common_prefixes():
+    client = FakeS3Client(bucket_keys(days=(1, 2, 3), parts=3))
+
+    assert list(s3_gfs_main.iter_folder_prefixes("bucket", "db/", client=client)) == [
+        folder(1),
+        folder(2),
+        folder(3),
+    ]
+    assert list(s3_gfs_main.iter_folder_prefixes("bucket", client=client, depth=2)) == [
+        folder(1),
+        folder(2),
+        folder(3),
+        "logs/x/",
+    ]
+    assert list(
+        s3_gfs_main.iter_folder_prefixes("bucket", "db/", client=client, start_after=folder(2))
+    ) == [folder(2), folder(3)]
+
+
+def test_folder_mode_lists_groups_and_only_enumerates_removed_folders(run_main):
+    client = FakeS3Client(bucket_keys())
+
+    result = run_main(client, ENV)
+
+    assert result["total_groups"] == 10
+    assert result["deleted_groups"] == 7
+    assert result["deleted"] == 7 * 50
+    # One delimited listing for the folders, then one page per removed folder.
+    assert client.calls["list_objects_v2"] == 1 + 7
+    assert client.keys == bucket_keys(days=(8, 9, 10))
+
+
+@pytest.mark.parametrize(
+    "regex, timestamp_format, depth, groups",
+    [
+        (ENV["S3_GFS_REGEX"], "%Y-%m-%dT%H:%M:%SZ", "2", 10),
+        (r"^db/2025-(\d{2}-\d{2})T", "%m-%d", "2", 10),
+        # Folders one level down are "db/" and "logs/", which never match.
+        (ENV["S3_GFS_REGEX"], "%Y-%m-%dT%H:%M:%SZ", "1", 0),
+    ],
+)
+def test_folder_depth_does_not_depend_on_prefix_pushdown(
+    run_main, regex, timestamp_format, depth, groups
+):
+    results = {}
+    for pushdown in ("true", "false"):
+        client = FakeS3Client(bucket_keys())
+        result = run_main(
+            client,
+            ENV,
+            S3_GFS_REGEX=regex,
+            S3_GFS_TIMESTAMP_FORMAT=timestamp_format,
+            S3_GFS_FOLDER_DEPTH=depth,
+            S3_GFS_PREFIX_PUSHDOWN=pushdown,
+        )
+        results[pushdown] = (result["total_groups"], client.keys)
+
+    assert results["true"] == results["false"]
+    assert results["true"][0] == groups
+
+
+def test_folder_mode_dry_run_lists_members_without_deleting(run_main):
+    client = FakeS3Client(bucket_keys(parts=3))
+
+    result = run_main(client, ENV, S3_GFS_DRY_RUN="true")
+
+    assert result["deleted_keys"][:3] == [f"{folder(1)}part-{n:04d}" for n in range(3)]
+    assert result["deleted"] == 21
+    assert client.calls["delete_objects"] == 0
+
+
+def test_folder_mode_with_a_group_index_discards_deleted_folders(tmp_path):
+    client = FakeS3Client(bucket_keys(days=range(1, 6), parts=2))
+    store = s3_gfs_main.LocalIndexStore(str(tmp_path / "index.json"))
+    regex = s3_gfs_main.re.compile(ENV["S3_GFS_REGEX"])
+
+    result = s3_gfs_main.run_incremental(
+        None,
+        bucket="bucket",
+        prefix="db/",
+        policy=s3_gfs_main.RetentionPolicy(keep_daily=2, keep_weekly=0, keep_monthly=0),
+        store=store,
+        list_keys=lambda start_after=None: s3_gfs_main.iter_folder_prefixes(
+            "bucket", "db/", client=client, start_after=start_after
+        ),
+        filename_ts_re=regex,
+        timestamp_format="%Y-%m-%dT%H:%M:%SZ",
+        full_relist_after=timedelta(hours=24),
+        min_remaining=0,
+        dry_run=False,
+        client=client,
+        folders=True,
+    )
+
+    index = s3_gfs_main.GroupIndex.from_json(store.load())
+    assert result["deleted"] == 6
+    assert sorted(k for keys in index.groups.values() for k in keys) == [folder(4), folder(5)]
+    assert index.watermark == folder(5)
+
+
+def test_folder_mode_rejects_per_object_sources():
+    with pytest.raises(RuntimeError, match="S3_GFS_STREAMING"):
+        s3_gfs_main.load_config({**ENV, "S3_GFS_STREAMING": "true"})
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+import main as s3_gfs_main
+from fake_s3 import FakeS3Client
+
+RetentionPolicy = s3_gfs_main.RetentionPolicy
+FILENAME_TS_RE = s3_gfs_main.re.compile(
+    r"Automatic_backup_\d+\.\d+\.\d+_(\d{4}-\d{2}-\d{2}_\d{2}\.\d{2})_"
+)
+TIMESTAMP_FORMAT = "%Y-%m-%d_%H.%M"
+INDEX_KEY = "state/s3-gfs-index.json"
+NOW = datetime(2026, 1, 20, 6, 0, tzinfo=timezone.utc)
+
+
+def backup_keys(day: int) -> list:
+    stem = f"Automatic_backup_2026.1.0_2026-01-{day:02d}_04.45_{day:08d}"
+    return [f"{stem}.metadata.json", f"{stem}.tar"]
+
+
+def sqs_event(*keys: str, event_name: str = "ObjectCreated:Put", bucket: str = "bucket") -> dict:
+    body = {
+        "Records": [
+            {
+                "eventSource": "aws:s3",
+                "eventName": event_name,
+                "s3": {"bucket": {"name": bucket}, "object": {"key": key.replace(" ", "+")}},
+            }
+            for key in keys
+        ]
+    }
+    return {"Records": [{"eventSource": "aws:sqs", "body": json.dumps(body)}]}
+
+
+def run(client, event, now=NOW, dry_run=False):
+    return s3_gfs_main.run_incremental(
+        event,
+        bucket="bucket",
+        prefix="",
+        policy=RetentionPolicy(keep_daily=3, keep_weekly=0, keep_monthly=0),
+        store=s3_gfs_main.index_store_from_uri(f"s3://bucket/{INDEX_KEY}", client=client),
+        list_keys=lambda start_after=None: s3_gfs_main.iter_keys_from_s3(
+            "bucket", client=client, start_after=start_after
+        ),
+        filename_ts_re=FILENAME_TS_RE,
+        timestamp_format=TIMESTAMP_FORMAT,
+        full_relist_after=timedelta(hours=24),
+        min_remaining=0,
+        dry_run=dry_run,
+        client=client,
+        now=now,
+    )
+
+
+def test_parse_s3_event_reads_sqs_batches():
+    event = sqs_event("a b.tar", "other.tar")
+    event["Records"].append(
+        {"eventSource": "aws:sqs", "body": json.dumps({"Event": "s3:TestEvent"})}
+    )
+    event["Records"].extend(sqs_event("gone.tar", event_name="ObjectRemoved:Delete")["Records"])
+    event["Records"].extend(sqs_event("elsewhere.tar", bucket="other-bucket")["Records"])
+
+    changes = s3_gfs_main.parse_s3_event(event, "bucket")
+
+    assert changes.created == ["a b.tar", "other.tar"]
+    assert changes.removed == ["gone.tar"]
+    assert s3_gfs_main.parse_s3_event({"source": "aws.events"}, "bucket") is None
+
+
+def test_events_update_the_index_without_relisting():
+    client = FakeS3Client([k for day in range(1, 5) for k in backup_keys(day)])
+
+    first = run(client, sqs_event(*backup_keys(4)))
+    assert first["deleted_groups"] == 1
+    assert client.calls["list_objects_v2"] == 1
+
+    client.put_object(Bucket="bucket", Key=backup_keys(5)[0])
+    client.put_object(Bucket="bucket", Key=backup_keys(5)[1])
+    second = run(client, sqs_event(*backup_keys(5)), now=NOW + timedelta(hours=1))
+
+    assert client.calls["list_objects_v2"] == 1
+    assert second["deleted_keys"] == backup_keys(2)
+    index = s3_gfs_main.GroupIndex.from_json(client.bodies[INDEX_KEY].decode())
+    assert sorted(k for keys in index.groups.values() for k in keys) == sorted(
+        k for day in (3, 4, 5) for k in backup_keys(day)
+    )
+
+
+def test_event_for_unrelated_keys_exits_without_saving():
+    client = FakeS3Client(backup_keys(1))
+    run(client, sqs_event(*backup_keys(1)))
+    saves = client.calls["put_object"]
+
+    result = run(client, sqs_event(INDEX_KEY), now=NOW + timedelta(minutes=1))
+
+    assert result["skipped"] is True
+    assert client.calls["put_object"] == saves
+    assert client.calls["list_objects_v2"] == 1
+
+
+def test_stale_index_triggers_full_reconciliation():
+    client = FakeS3Client([k for day in range(1, 3) for k in backup_keys(day)])
+    run(client, sqs_event(*backup_keys(2)))
+    # Deleted behind the index's back; only a full listing notices.
+    client.delete_objects(Bucket="bucket", Delete={"Objects": [{"Key": backup_keys(1)[0]}]})
+
+    run(client, sqs_event(*backup_keys(2)), now=NOW + timedelta(hours=25))
+
+    assert client.calls["list_objects_v2"] == 2
+    index = s3_gfs_main.GroupIndex.from_json(client.bodies[INDEX_KEY].decode())
+    assert backup_keys(1)[0] not in [k for keys in index.groups.values() for k in keys]
+
+
+def test_scheduled_runs_list_only_after_the_watermark():
+    client = FakeS3Client([k for day in range(1, 3) for k in backup_keys(day)])
+    listed = []
+    original = client.list_objects_v2
+
+    def recording_list(**kwargs):
+        resp = original(**kwargs)
+        listed.append((kwargs.get("StartAfter"), [c["Key"] for c in resp.get("Contents", [])]))
+        return resp
+
+    client.list_objects_v2 = recording_list
+    run(client, None)
+    index = s3_gfs_main.GroupIndex.from_json(client.bodies[INDEX_KEY].decode())
+    assert index.watermark == backup_keys(2)[1]
+
+    client.put_object(Bucket="bucket", Key=backup_keys(3)[0])
+    client.put_object(Bucket="bucket", Key=backup_keys(3)[1])
+    result = run(client, {"source": "aws.events"}, now=NOW + timedelta(hours=1))
+
+    assert listed[-1] == (backup_keys(2)[1], [*backup_keys(3), INDEX_KEY])
+    assert result["total_groups"] == 3
+    index = s3_gfs_main.GroupIndex.from_json(client.bodies[INDEX_KEY].decode())
+    assert index.watermark == backup_keys(3)[1]
+
+
+def test_delta_listing_with_nothing_new_skips_planning():
+    client = FakeS3Client(backup_keys(1))
+    run(client, None)
+
+    result = run(client, None, now=NOW + timedelta(hours=1))
+
+    assert result["skipped"] is True
+    assert client.calls["list_objects_v2"] == 2
+
+
+def test_group_index_keep_set_tracks_adds_and_discards():
+    rng = random.Random(3)
+    policy = RetentionPolicy(
+        keep_hourly=6, keep_daily=5, keep_weekly=3, keep_monthly=4, keep_yearly=2
+    )
+    index = s3_gfs_main.GroupIndex("fp")
+    index.keepers(policy)  # build every tier before the index is populated
+    live = {}
+    start = datetime(2023, 11, 1, tzinfo=timezone.utc)
+    for step in range(600):
+        if live and rng.random() < 0.3:
+            key = rng.choice(sorted(live))
+            index.discard([key])
+            del live[key]
+        else:
+            dt = start + timedelta(hours=rng.randrange(0, 24 * 500))
+            key = f"backup-{step:04d}"
+            index.add(key, dt)
+            live[key] = dt
+
+        assert index.keepers(policy) == s3_gfs_main.select_keepers(set(live.values()), policy)
+
+    rebuilt = s3_gfs_main.GroupIndex.from_json(index.to_json())
+    assert rebuilt.keepers(policy) == index.keepers(policy)
+
+
+def test_core_logic_and_apply_removal_run_off_a_group_index():
+    keys = [k for day in range(1, 11) for k in backup_keys(day)]
+    policy = RetentionPolicy(keep_daily=3, keep_weekly=0, keep_monthly=0)
+    plan = s3_gfs_main.build_plan(
+        keys, policy, filename_ts_re=FILENAME_TS_RE, timestamp_format=TIMESTAMP_FORMAT
+    )
+    index = s3_gfs_main.GroupIndex.from_plan(plan, "fp", NOW)
+
+    assert s3_gfs_main.core_logic(index, policy) == s3_gfs_main.core_logic(
+        keys, policy, filename_ts_re=FILENAME_TS_RE, timestamp_format=TIMESTAMP_FORMAT
+    )
+
+    client = FakeS3Client(keys)
+    result = s3_gfs_main.apply_removal(
+        "bucket", index, policy=policy, min_remaining=0, dry_run=False, client=client
+    )
+
+    assert result["deleted_groups"] == 7
+    assert sorted(k for members in index.groups.values() for k in members) == client.keys
+    assert s3_gfs_main.core_logic(index, policy) == [
+        (k, "keep", "daily") for k in client.keys
+    ]
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import csv
+import gzip
+import io
+import json
+from urllib.parse import quote_plus
+
+import pytest
+
+import main as s3_gfs_main
+from fake_s3 import FakeS3Client
+
+RetentionPolicy = s3_gfs_main.RetentionPolicy
+FILENAME_TS_RE = s3_gfs_main.re.compile(r"backups/(\d{8})/")
+TIMESTAMP_FORMAT = "%Y%m%d"
+CONFIG_DIR = "inventory/bucket/daily"
+
+
+def backup_keys(days) -> list:
+    return [f"backups/202601{day:02d}/{name}" for day in days for name in ("a b.tar", "meta+1.json")]
+
+
+def csv_gz(rows) -> bytes:
+    text = io.StringIO()
+    csv.writer(text).writerows(rows)
+    return gzip.compress(text.getvalue().encode("utf-8"))
+
+
+def manifest(files, file_format="CSV", schema="Bucket, Key, Size") -> bytes:
+    return json.dumps(
+        {
+            "sourceBucket": "bucket",
+            "destinationBucket": "arn:aws:s3:::bucket",
+            "fileFormat": file_format,
+            "fileSchema": schema,
+            "creationTimestamp": "1768885200000",
+            "files": [{"key": key, "size": 1, "MD5checksum": "x"} for key in files],
+        }
+    ).encode("utf-8")
+
+
+def put(client, key, body) -> None:
+    client.put_object(Bucket="bucket", Key=key, Body=body)
+
+
+def publish_csv_inventory(client, date, keys) -> None:
+    half = len(keys) // 2
+    files = []
+    for n, chunk in enumerate((keys[:half], keys[half:])):
+        data_key = f"{CONFIG_DIR}/data/{date}-{n}.csv.gz"
+        put(client, data_key, csv_gz(["bucket", quote_plus(k), "1"] for k in chunk))
+        files.append(data_key)
+    put(client, f"{CONFIG_DIR}/{date}/manifest.json", manifest(files))
+
+
+def test_csv_inventory_streams_the_newest_report_and_lists_the_delta():
+    client = FakeS3Client(backup_keys(range(1, 13)))
+    publish_csv_inventory(client, "2026-01-09T01-00Z", backup_keys(range(1, 9)))
+    publish_csv_inventory(client, "2026-01-10T01-00Z", backup_keys(range(1, 11)))
+    put(client, f"{CONFIG_DIR}/hive/dt=2026-01-10-01-00/symlink.txt", b"")
+
+    reported = list(
+        s3_gfs_main.iter_keys_from_inventory(
+            f"s3://bucket/{CONFIG_DIR}/", "bucket", "backups/", client=client
+        )
+    )
+    with_delta = list(
+        s3_gfs_main.iter_keys_from_inventory(
+            f"s3://bucket/{CONFIG_DIR}", "bucket", "backups/", client=client, delta=True
+        )
+    )
+
+    assert reported == backup_keys(range(1, 11))
+    assert with_delta == backup_keys(range(1, 13))
+    assert client.calls["list_objects_v2"] == 3
+
+
+def test_inventory_feeds_core_logic_like_a_listing():
+    keys = backup_keys(range(1, 11))
+    client = FakeS3Client(keys)
+    publish_csv_inventory(client, "2026-01-10T01-00Z", keys)
+    policy = RetentionPolicy(keep_daily=3, keep_weekly=1, keep_monthly=0)
+
+    from_inventory = s3_gfs_main.core_logic(
+        s3_gfs_main.iter_keys_from_inventory(
+            f"s3://bucket/{CONFIG_DIR}/2026-01-10T01-00Z/manifest.json", "bucket", client=client
+        ),
+        policy,
+        filename_ts_re=FILENAME_TS_RE,
+        timestamp_format=TIMESTAMP_FORMAT,
+    )
+    from_listing = s3_gfs_main.core_logic(
+        s3_gfs_main.iter_keys_from_s3("bucket", "backups/", client=client),
+        policy,
+        filename_ts_re=FILENAME_TS_RE,
+        timestamp_format=TIMESTAMP_FORMAT,
+    )
+
+    assert from_inventory == from_listing
+
+
+def test_versioned_csv_inventory_skips_noncurrent_versions_and_delete_markers():
+    client = FakeS3Client()
+    put(
+        client,
+        f"{CONFIG_DIR}/data/v.csv.gz",
+        csv_gz(
+            [
+                ["bucket", "backups/20260101/a.tar", "v2", "true", "false"],
+                ["bucket", "backups/20260101/a.tar", "v1", "false", "false"],
+                ["bucket", "backups/20260102/b.tar", "v3", "true", "true"],
+            ]
+        ),
+    )
+    put(
+        client,
+        f"{CONFIG_DIR}/2026-01-10T01-00Z/manifest.json",
+        manifest(
+            [f"{CONFIG_DIR}/data/v.csv.gz"],
+            schema="Bucket, Key, VersionId, IsLatest, IsDeleteMarker",
+        ),
+    )
+
+    keys = list(
+        s3_gfs_main.iter_keys_from_inventory(f"s3://bucket/{CONFIG_DIR}/", "bucket", client=client)
+    )
+
+    assert keys == ["backups/20260101/a.tar"]
+
+
+def test_inventory_for_another_bucket_is_rejected():
+    client = FakeS3Client()
+    publish_csv_inventory(client, "2026-01-10T01-00Z", backup_keys([1]))
+
+    with pytest.raises(RuntimeError, match="not other"):
+        list(
+            s3_gfs_main.iter_keys_from_inventory(
+                f"s3://bucket/{CONFIG_DIR}/", "other", client=client
+            )
+        )
+
+
+def test_local_parquet_inventory(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    config_dir = tmp_path / "bucket" / "daily"
+    (config_dir / "data").mkdir(parents=True)
+    (config_dir / "2026-01-10T01-00Z").mkdir()
+    keys = backup_keys(range(1, 4))
+    pq.write_table(
+        pa.table({"bucket": ["bucket"] * len(keys), "key": keys, "size": [1] * len(keys)}),
+        config_dir / "data" / "part.parquet",
+        row_group_size=2,
+    )
+    (config_dir / "2026-01-10T01-00Z" / "manifest.json").write_bytes(
+        manifest(
+            [f"{CONFIG_DIR}/data/part.parquet"],
+            file_format="Parquet",
+            schema="message s3.inventory { required binary key (STRING); }",
+        )
+    )
+
+    listed = list(s3_gfs_main.iter_keys_from_inventory(str(config_dir), "bucket", "backups/"))
+
+    assert listed == keys
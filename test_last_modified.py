@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import main as s3_gfs_main
+from fake_s3 import FakeS3Client
+
+ENV = {
+    "S3_BUCKET": "bucket",
+    "S3_GFS_TIMESTAMP_SOURCE": "last_modified",
+    "S3_GFS_GROUP_WINDOW_SECONDS": "600",
+    "S3_GFS_KEEP_DAILY": "3",
+    "S3_GFS_KEEP_WEEKLY": "0",
+    "S3_GFS_KEEP_MONTHLY": "0",
+    "S3_GFS_MIN_REMAINING": "0",
+    "S3_GFS_DRY_RUN": "false",
+}
+START = datetime(2025, 11, 1, 3, 0, tzinfo=timezone.utc)
+
+
+def multipart_backups(days=range(10), parts=3) -> dict:
+    """Opaque names; the parts of each backup finish uploading a minute apart."""
+    return {
+        f"backups/{day:03d}-{part}.bin": START + timedelta(days=day, minutes=part)
+        for day in days
+        for part in range(parts)
+    }
+
+
+def test_iter_objects_from_s3_yields_last_modified_in_listing_order():
+    objects = multipart_backups(days=range(2), parts=2)
+    client = FakeS3Client(objects, last_modified=objects)
+
+    listed = list(s3_gfs_main.iter_objects_from_s3("bucket", ["backups/"], client=client))
+
+    assert listed == sorted(objects.items())
+
+
+def test_group_window_merges_the_parts_of_one_backup():
+    objects = multipart_backups(days=range(3), parts=4)
+
+    exact = s3_gfs_main.build_plan_from_objects(objects.items(), s3_gfs_main.RetentionPolicy())
+    windowed = s3_gfs_main.build_plan_from_objects(
+        objects.items(), s3_gfs_main.RetentionPolicy(), group_window=timedelta(minutes=10)
+    )
+
+    assert len(exact.groups) == 12
+    assert [g.timestamp for g in windowed.groups] == [START + timedelta(days=d) for d in range(3)]
+    assert [len(g.keys) for g in windowed.groups] == [4, 4, 4]
+
+
+def test_group_window_is_anchored_at_the_first_object():
+    # One upload every 4 minutes: a 10-minute window must not chain them all.
+    objects = [(f"k{i:02d}", START + timedelta(minutes=4 * i)) for i in range(9)]
+
+    plan = s3_gfs_main.build_plan_from_objects(
+        reversed(objects), s3_gfs_main.RetentionPolicy(), group_window=timedelta(minutes=10)
+    )
+
+    assert [g.keys for g in plan.groups] == [
+        ["k00", "k01", "k02"],
+        ["k03", "k04", "k05"],
+        ["k06", "k07", "k08"],
+    ]
+
+
+def test_key_filter_ignores_other_objects():
+    objects = {"backups/a.tar": START, "backups/a.log": START + timedelta(hours=1)}
+
+    plan = s3_gfs_main.build_plan_from_objects(
+        objects.items(),
+        s3_gfs_main.RetentionPolicy(),
+        key_filter=s3_gfs_main.re.compile(r"\.tar$"),
+    )
+
+    assert [g.keys for g in plan.groups] == [["backups/a.tar"]]
+    assert plan.unparsed == ["backups/a.log"]
+
+
+def test_last_modified_mode_needs_no_regex(run_main):
+    objects = multipart_backups()
+    client = FakeS3Client(objects, last_modified=objects)
+
+    result = run_main(client, ENV)
+
+    assert result["total_groups"] == 10
+    assert result["deleted_groups"] == 7
+    assert client.keys == sorted(multipart_backups(days=range(7, 10)))
+
+
+def test_last_modified_mode_uses_the_regex_as_filter_and_pushdown(run_main):
+    objects = multipart_backups(days=range(5), parts=1)
+    unrelated = [f"logs/{i:05d}.log" for i in range(1500)]
+    client = FakeS3Client([*objects, *unrelated], last_modified=objects)
+
+    result = run_main(client, ENV, S3_GFS_REGEX=r"^backups/")
+
+    assert result["deleted_groups"] == 2
+    assert client.calls["list_objects_v2"] == 1
+    assert len(client.keys) == 3 + len(unrelated)
+
+
+@pytest.mark.parametrize(
+    "env",
+    [
+        {"S3_GFS_STREAMING": "true"},
+        {"S3_GFS_FOLDERS": "true"},
+        {"S3_GFS_INDEX_URI": "file:///tmp/index.json"},
+        {"S3_GFS_INVENTORY_MANIFEST": "s3://inventory/manifest.json"},
+        {"S3_GFS_TIMESTAMP_SOURCE": "mtime"},
+    ],
+)
+def test_last_modified_config_rejects_modes_without_last_modified(env):
+    with pytest.raises(RuntimeError, match="S3_GFS_TIMESTAMP_SOURCE"):
+        s3_gfs_main.load_config({**ENV, **env})
+
+
+def test_key_source_still_requires_the_regex():
+    with pytest.raises(RuntimeError, match="S3_GFS_REGEX is required"):
+        s3_gfs_main.load_config({**ENV, "S3_GFS_TIMESTAMP_SOURCE": "key"})
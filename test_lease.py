@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import threading
+from datetime import timedelta
+
+import pytest
+
+import main as s3_gfs_main
+from fake_s3 import FakeS3Client
+
+ENV = {
+    "S3_BUCKET": "bucket",
+    "S3_GFS_REGEX": r"^Automatic_backup_(\d{4}-\d{2}-\d{2})\.tar$",
+    "S3_GFS_TIMESTAMP_FORMAT": "%Y-%m-%d",
+    "S3_GFS_KEEP_DAILY": "3",
+    "S3_GFS_KEEP_WEEKLY": "0",
+    "S3_GFS_KEEP_MONTHLY": "0",
+    "S3_GFS_MIN_REMAINING": "0",
+    "S3_GFS_DRY_RUN": "false",
+    "S3_GFS_LEASE_URI": "s3://bucket/locks/retention.json",
+    "S3_GFS_DEBOUNCE_SECONDS": "60",
+}
+BACKUPS = [f"Automatic_backup_2025-11-{day:02d}.tar" for day in range(1, 11)]
+HOUR = timedelta(hours=1)
+
+
+@pytest.fixture(params=["local", "s3"])
+def make_lease(request, tmp_path):
+    client = FakeS3Client()
+    if request.param == "local":
+        return lambda: s3_gfs_main.lease_from_uri(str(tmp_path / "retention.lock"))
+    return lambda: s3_gfs_main.lease_from_uri("s3://bucket/retention.lock", client=client)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    calls = []
+    monkeypatch.setattr(s3_gfs_main.time, "sleep", calls.append)
+    return calls
+
+
+def test_lease_is_exclusive_until_released(make_lease):
+    first, second = make_lease(), make_lease()
+
+    assert first.acquire(HOUR)
+    assert not second.acquire(HOUR)
+    first.release()
+    assert second.acquire(HOUR)
+
+
+def test_release_cooldown_keeps_the_lease_taken(make_lease):
+    first = make_lease()
+    assert first.acquire(HOUR)
+    first.release(cooldown=HOUR)
+
+    assert not make_lease().acquire(HOUR)
+
+
+def test_expired_lease_is_taken_over_by_one_contender(make_lease):
+    crashed = make_lease()
+    assert crashed.acquire(timedelta(0))
+    contenders = [make_lease() for _ in range(2)]
+    current = contenders[0]._read()
+
+    # Both read the same expired record; only the first swap may succeed.
+    assert contenders[0]._replace(contenders[0]._record("a", 1e12), current[1])
+    assert not contenders[1]._replace(contenders[1]._record("b", 1e12), current[1])
+
+    assert not make_lease().acquire(HOUR)
+
+
+def test_release_after_takeover_leaves_the_new_holder_alone(make_lease):
+    stale = make_lease()
+    assert stale.acquire(timedelta(0))
+    holder = make_lease()
+    assert holder.acquire(HOUR)
+
+    stale.release()
+
+    assert not make_lease().acquire(HOUR)
+
+
+def test_burst_of_invocations_plans_once(main_runtime, sleeps):
+    client = FakeS3Client(BACKUPS)
+    main_runtime(client, ENV)
+    results = []
+    start = threading.Barrier(8)
+
+    def invoke():
+        start.wait()
+        results.append(s3_gfs_main.main())
+
+    threads = [threading.Thread(target=invoke) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sum(1 for r in results if r.get("coalesced")) == 7
+    assert client.calls["list_objects_v2"] == 1
+    assert client.calls["delete_objects"] == 1
+    assert client.keys == sorted([*BACKUPS[-3:], "locks/retention.json"])
+
+
+def test_debounce_waits_before_listing_and_cools_down_after(main_runtime, sleeps):
+    client = FakeS3Client(BACKUPS)
+    main_runtime(client, ENV)
+
+    first = s3_gfs_main.main()
+    second = s3_gfs_main.main()
+
+    assert first["deleted_groups"] == 7
+    assert second == {"coalesced": True}
+    assert sleeps == [60.0]
+    assert client.calls["list_objects_v2"] == 1
+
+
+def test_failed_run_frees_the_lease_for_a_retry(monkeypatch, main_runtime, sleeps):
+    client = FakeS3Client(BACKUPS)
+    main_runtime(client, ENV)
+    build_plan = s3_gfs_main.build_plan
+
+    def failing_build_plan(*_args, **_kwargs):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(s3_gfs_main, "build_plan", failing_build_plan)
+    with pytest.raises(RuntimeError, match="boom"):
+        s3_gfs_main.main()
+
+    monkeypatch.setattr(s3_gfs_main, "build_plan", build_plan)
+    assert s3_gfs_main.main()["deleted_groups"] == 7
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+
+import main as s3_gfs_main
+from fake_s3 import FakeS3Client
+
+
+def nested_keys() -> list:
+    keys = ["backups/loose-a.txt", "backups/beta-notes.txt", "backups/zz-loose.txt"]
+    for host in ("alpha", "beta", "gamma", "delta"):
+        for i in range(700):
+            keys.append(f"backups/{host}/2025-01-{i % 28 + 1:02d}/part-{i:05d}")
+    keys.append("other/ignored.txt")
+    return sorted(keys)
+
+
+def test_discover_partitions_returns_sorted_prefixes_only():
+    client = FakeS3Client(nested_keys())
+
+    prefixes = s3_gfs_main.discover_partitions(client, "bucket", "backups/", max_depth=1)
+
+    assert prefixes == ["backups/alpha/", "backups/beta/", "backups/delta/", "backups/gamma/"]
+    assert client.calls["list_objects_v2"] == 1
+
+
+def test_discover_partitions_reads_one_page_of_a_flat_keyspace():
+    keys = sorted([f"loose-{i:05d}" for i in range(5000)] + ["zz-a/x", "zz-b/x"])
+    client = FakeS3Client(keys)
+
+    prefixes = s3_gfs_main.discover_partitions(client, "bucket", "")
+
+    # The folders are past the first page; they fall into the trailing gap.
+    assert prefixes == [""]
+    assert client.calls["list_objects_v2"] == 1
+
+
+def test_partitioned_listing_buffers_a_bounded_number_of_pages():
+    keys = sorted(f"{host}/{i:06d}" for host in "abcdefgh" for i in range(5000))
+    client = FakeS3Client(keys)
+    pages = s3_gfs_main.iter_key_pages_partitioned(
+        "bucket", client=client, concurrency=2, queue_pages=1
+    )
+
+    listed = list(next(pages))
+    time.sleep(0.3)  # let the workers run ahead as far as they can
+    ahead = client.calls["list_objects_v2"]
+    for page in pages:
+        listed.extend(page)
+
+    assert listed == keys
+    # 40 pages in all; with the consumer stalled the workers park after a
+    # few pages each instead of listing whole partitions.
+    assert ahead <= 10 < client.calls["list_objects_v2"]
+
+
+@pytest.mark.parametrize("concurrency", [2, 8])
+def test_partitioned_listing_matches_single_chain(concurrency):
+    keys = nested_keys()
+    single = list(
+        s3_gfs_main.iter_keys_from_s3("bucket", "backups/", client=FakeS3Client(keys))
+    )
+
+    partitioned = list(
+        s3_gfs_main.iter_keys_from_s3(
+            "bucket", "backups/", client=FakeS3Client(keys), concurrency=concurrency
+        )
+    )
+
+    assert partitioned == single
+    assert len(single) == len(keys) - 1
+
+
+def test_split_points_partition_a_flat_keyspace():
+    keys = [f"Automatic_backup_{i:06d}.tar" for i in range(3000)]
+    client = FakeS3Client(keys)
+
+    listed = list(
+        s3_gfs_main.iter_keys_from_s3(
+            "bucket",
+            client=client,
+            concurrency=4,
+            split_points=["Automatic_backup_000999.tar", "Automatic_backup_001999.tar"],
+        )
+    )
+
+    assert listed == keys
+
+
+def test_flat_keyspace_without_split_points_falls_back_to_single_chain():
+    keys = [f"Automatic_backup_{i:06d}.tar" for i in range(1500)]
+    client = FakeS3Client(keys)
+
+    listed = list(s3_gfs_main.iter_keys_from_s3("bucket", client=client, concurrency=4))
+
+    assert listed == keys
+
+
+@pytest.mark.parametrize(
+    "pattern, expected",
+    [
+        (r"^Automatic_backup_\d+_(.+)\.tar", ["Automatic_backup_"]),
+        (r"\A(?:Automatic|Manual)_backup_(\d+)", ["Automatic_backup_", "Manual_backup_"]),
+        (r"^ha/(?:a|b)[_-]x(\d)", ["ha/a-x", "ha/a_x", "ha/b-x", "ha/b_x"]),
+        (r"^db/(?:x|xy)(\d)", ["db/x"]),
+        (r"^a(?i:b)c(\d)", ["a"]),
+        (r"Automatic_backup_(\d+)", None),  # unanchored: matches anywhere
+        (r"(?m)^backup_(\d+)", None),  # ^ also matches after a newline
+        (r"(?i)^backup_(\d+)", None),
+        (r"^(?:|x)(\d+)", None),
+        (r"^(\d+)", None),
+    ],
+)
+def test_regex_literal_prefixes(pattern, expected):
+    assert s3_gfs_main.regex_literal_prefixes(s3_gfs_main.re.compile(pattern)) == expected
+
+
+def test_listing_prefixes_combine_with_s3_prefix():
+    regex = s3_gfs_main.re.compile(r"^ha/(?:full|part)_(\d+)")
+
+    assert s3_gfs_main.listing_prefixes("", regex) == ["ha/full_", "ha/part_"]
+    assert s3_gfs_main.listing_prefixes("ha/", regex) == ["ha/full_", "ha/part_"]
+    assert s3_gfs_main.listing_prefixes("ha/full_2025", regex) == ["ha/full_2025"]
+    assert s3_gfs_main.listing_prefixes("db/", regex) == []
+    assert s3_gfs_main.listing_prefixes("db/", s3_gfs_main.re.compile(r"_(\d+)")) == ["db/"]
+
+
+def test_prefix_pushdown_lists_fewer_pages_with_the_same_deletions(run_main):
+    backups = [f"Automatic_backup_2026.1.0_2026-01-{day:02d}.tar" for day in range(1, 29)]
+    unrelated = [f"{top}/{i:05d}.log" for top in ("Archive", "logs", "media") for i in range(1500)]
+    env = {
+        "S3_BUCKET": "bucket",
+        "S3_GFS_REGEX": r"^Automatic_backup_[\d.]+_(\d{4}-\d{2}-\d{2})\.tar",
+        "S3_GFS_TIMESTAMP_FORMAT": "%Y-%m-%d",
+        "S3_GFS_KEEP_DAILY": "5",
+        "S3_GFS_DRY_RUN": "false",
+    }
+
+    results = {}
+    for pushdown in ("false", "true"):
+        client = FakeS3Client(backups + unrelated)
+        results[pushdown] = (run_main(client, env, S3_GFS_PREFIX_PUSHDOWN=pushdown), client)
+
+    plain, plain_client = results["false"]
+    pushed, pushed_client = results["true"]
+    assert pushed["deleted_keys"] == plain["deleted_keys"]
+    assert pushed_client.keys == plain_client.keys
+    assert plain_client.calls["list_objects_v2"] == 5
+    assert pushed_client.calls["list_objects_v2"] == 1
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import json
+
+import main as s3_gfs_main
+from fake_s3 import FakeS3Client
+
+ENV = {
+    "S3_BUCKET": "bucket",
+    "S3_GFS_REGEX": r"backup_(\d{8})\.tar",
+    "S3_GFS_TIMESTAMP_FORMAT": "%Y%m%d",
+    "S3_GFS_KEEP_DAILY": "2",
+    "S3_GFS_KEEP_WEEKLY": "0",
+    "S3_GFS_KEEP_MONTHLY": "0",
+    "S3_GFS_MIN_REMAINING": "1",
+    "S3_GFS_DRY_RUN": "false",
+}
+
+
+def run_with_metrics(run_main, capsys, **env):
+    keys = [f"backup_2026{month:02d}{day:02d}.tar" for month in (1, 2) for day in range(1, 29)]
+    client = FakeS3Client(keys + ["notes.txt"])
+
+    result = run_main(client, ENV, **env)
+
+    lines = capsys.readouterr().out.splitlines()
+    documents = [json.loads(line) for line in lines if line.startswith('{"_aws"')]
+    return client, result, documents
+
+
+def test_enabled_metrics_emit_one_emf_document_per_run(run_main, capsys):
+    client, result, documents = run_with_metrics(run_main, capsys, S3_GFS_METRICS="true")
+
+    assert len(documents) == 1
+    doc = documents[0]
+    directive = doc["_aws"]["CloudWatchMetrics"][0]
+    assert directive["Namespace"] == "S3GFSRetainer"
+    assert directive["Dimensions"] == [["Bucket"]]
+    declared = {m["Name"]: m["Unit"] for m in directive["Metrics"]}
+    phases = ("Run", "Listing", "Parsing", "Selection", "Planning", "Deletion")
+    for name in (f"{phase}Time" for phase in phases):
+        assert declared[name] == "Milliseconds"
+        assert doc[name] >= 0
+    assert doc["Bucket"] == "bucket"
+    assert doc["Mode"] == "full"
+    assert doc["ListObjectsV2Calls"] == client.calls["list_objects_v2"]
+    assert doc["DeleteObjectsCalls"] == client.calls["delete_objects"]
+    assert doc["KeysListed"] == 57
+    assert doc["KeysParsed"] == 56
+    assert doc["KeysUnparsed"] == 1
+    assert doc["KeysDeleted"] == result["deleted"] == 54
+    assert doc["GroupsDeleted"] == result["deleted_groups"]
+    assert doc["KeysPerSecond"] > 0
+    assert 0 <= doc["TimestampCacheHitRate"] <= 100
+    assert s3_gfs_main._METRICS is None
+
+
+def test_metrics_are_off_by_default(run_main, capsys):
+    _client, _result, documents = run_with_metrics(run_main, capsys)
+
+    assert documents == []
+    assert s3_gfs_main._METRICS is None
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import concurrent.futures
+import multiprocessing
+import random
+
+import pytest
+
+import main as s3_gfs_main
+
+FILENAME_TS_RE = s3_gfs_main.re.compile(r"backup_(\d{4}-\d{2}-\d{2}T\d{2})")
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H"
+POLICY = s3_gfs_main.RetentionPolicy(keep_hourly=6, keep_daily=5, keep_weekly=3)
+
+
+def shuffled_keys(n: int = 3000) -> list:
+    keys = [
+        f"backup_2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}T{i % 24:02d}/part-{i}" for i in range(n)
+    ]
+    keys += [f"unrelated/{i}" for i in range(0, n, 7)]
+    random.Random(7).shuffle(keys)
+    return keys
+
+
+def plan_shape(plan):
+    return (
+        [(g.timestamp, g.keys, g.decision, g.tags) for g in plan.groups],
+        plan.unparsed,
+    )
+
+
+def build(keys, **kwargs):
+    return s3_gfs_main.build_plan(
+        keys, POLICY, filename_ts_re=FILENAME_TS_RE, timestamp_format=TIMESTAMP_FORMAT, **kwargs
+    )
+
+
+def test_parallel_parse_matches_serial_order():
+    keys = shuffled_keys()
+
+    serial = build(keys)
+    parallel = build(iter(keys), parse_workers=3, parallel_threshold=0)
+
+    assert plan_shape(parallel) == plan_shape(serial)
+
+
+def test_parallel_parse_keeps_group_first_appearance_order():
+    keys = shuffled_keys(500)
+
+    groups, unparsed = s3_gfs_main._parse_groups_parallel(
+        keys, FILENAME_TS_RE, TIMESTAMP_FORMAT, workers=2
+    )
+    expected = {}
+    for k in keys:
+        dt = s3_gfs_main.parse_timestamp_from_key(k, FILENAME_TS_RE, TIMESTAMP_FORMAT)
+        if dt is not None:
+            expected.setdefault(dt, []).append(k)
+
+    assert list(groups.items()) == list(expected.items())
+    assert unparsed == [k for k in keys if k.startswith("unrelated/")]
+
+
+def test_small_listings_are_parsed_serially(monkeypatch):
+    def fail(*_args, **_kwargs):
+        raise AssertionError("below the threshold no process pool may start")
+
+    monkeypatch.setattr(s3_gfs_main, "_parse_groups_parallel", fail)
+
+    plan = build(shuffled_keys(100), parse_workers=4, parallel_threshold=1000)
+
+    assert plan.groups
+
+
+def test_streams_below_the_threshold_are_parsed_as_they_arrive(monkeypatch):
+    keys = shuffled_keys(100)
+    expected = plan_shape(build(keys))
+    pulled = []
+    parse = s3_gfs_main.parse_timestamp_from_key
+
+    def listing():
+        for k in keys:
+            pulled.append(k)
+            yield k
+
+    def parse_while_listing(key, *args):
+        assert pulled[-1] == key, "the listing was buffered ahead of parsing"
+        return parse(key, *args)
+
+    monkeypatch.setattr(s3_gfs_main, "parse_timestamp_from_key", parse_while_listing)
+
+    plan = build(listing(), parse_workers=4, parallel_threshold=1000)
+
+    assert plan_shape(plan) == expected
+
+
+def test_stream_reaching_the_threshold_fans_out_the_rest():
+    keys = shuffled_keys()
+
+    plan = build(iter(keys), parse_workers=3, parallel_threshold=1000)
+
+    assert plan_shape(plan) == plan_shape(build(keys))
+
+
+def test_falls_back_to_serial_without_process_pools(monkeypatch, caplog):
+    class NoSemaphores:
+        def __init__(self, *_args, **_kwargs):
+            raise OSError(38, "Function not implemented")
+
+    monkeypatch.setattr(concurrent.futures, "ProcessPoolExecutor", NoSemaphores)
+    keys = shuffled_keys(400)
+
+    with caplog.at_level("WARNING", logger=s3_gfs_main.__name__):
+        plan = build(keys, parse_workers=4, parallel_threshold=0)
+
+    assert plan_shape(plan) == plan_shape(build(keys))
+    assert "parsing serially" in caplog.text
+    assert s3_gfs_main._PARSE_INPUT is None
+
+
+@pytest.mark.skipif(
+    "spawn" not in multiprocessing.get_all_start_methods(), reason="needs spawn"
+)
+def test_spawn_platforms_send_the_keys_to_workers(monkeypatch):
+    monkeypatch.setattr(multiprocessing, "get_all_start_methods", lambda: ["spawn"])
+    keys = shuffled_keys(400)
+
+    plan = build(keys, parse_workers=2, parallel_threshold=0)
+
+    assert plan_shape(plan) == plan_shape(build(keys))
+
+
+def test_config_reads_parse_workers():
+    env = {"S3_BUCKET": "b", "S3_GFS_REGEX": "(x)"}
+
+    assert s3_gfs_main.load_config(env).parse_workers == 1
+    assert s3_gfs_main.load_config({**env, "S3_GFS_PARSE_WORKERS": "3"}).parse_workers == 3
+    assert s3_gfs_main.load_config({**env, "S3_GFS_PARSE_WORKERS": "0"}).parse_workers >= 1
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import logging
+import tracemalloc
+
+import pytest
+
+import main as s3_gfs_main
+from fake_s3 import FakeS3Client
+
+ENV = {
+    "S3_BUCKET": "bucket",
+    "S3_GFS_REGEX": r"backup_(\d{8})\.tar",
+    "S3_GFS_TIMESTAMP_FORMAT": "%Y%m%d",
+    "S3_GFS_KEEP_DAILY": "2",
+    "S3_GFS_KEEP_WEEKLY": "0",
+    "S3_GFS_KEEP_MONTHLY": "0",
+    "S3_GFS_MIN_REMAINING": "1",
+    "S3_GFS_DRY_RUN": "false",
+}
+
+
+def backups() -> FakeS3Client:
+    return FakeS3Client([f"backup_202601{day:02d}.tar" for day in range(1, 29)])
+
+
+def test_profile_report_is_written_per_phase(run_main, tmp_path):
+    output = tmp_path / "profile.txt"
+
+    result = run_main(
+        backups(), ENV, S3_GFS_PROFILE="cpu,memory", S3_GFS_PROFILE_OUTPUT=str(output)
+    )
+
+    report = output.read_text()
+    assert result["deleted_groups"] == 26
+    for phase in ("Run", "Parsing", "Selection", "Planning", "Deletion"):
+        assert f"== cpu: {phase} " in report
+    for phase in ("Parsing", "Selection", "Planning", "Deletion"):
+        assert f"== memory: {phase} " in report
+    assert "parse_timestamp_from_key" in report
+    assert not tracemalloc.is_tracing()
+    assert s3_gfs_main._PROFILER is None
+
+
+def test_cpu_profile_goes_to_the_log_by_default(run_main, caplog):
+    with caplog.at_level(logging.INFO, logger=s3_gfs_main.__name__):
+        run_main(backups(), ENV, S3_GFS_PROFILE="cpu")
+
+    profiles = [r.getMessage() for r in caplog.records if r.getMessage().startswith("Profile:")]
+    assert len(profiles) == 1
+    assert "== cpu: Parsing " in profiles[0]
+    assert "== memory:" not in profiles[0]
+
+
+def test_unknown_profile_mode_is_rejected():
+    with pytest.raises(RuntimeError, match="S3_GFS_PROFILE"):
+        s3_gfs_main.load_config({**ENV, "S3_GFS_PROFILE": "cpu,gpu"})
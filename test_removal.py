@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import pytest
+
+import main as s3_gfs_main
+from fake_s3 import FakeS3Client
+
+RetentionPolicy = s3_gfs_main.RetentionPolicy
+FILENAME_TS_RE = s3_gfs_main.re.compile(r"backup_(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z)/")
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def make_keys(groups: int, parts: int) -> list:
+    keys = []
+    for g in range(groups):
+        ts = f"2024-{g // 28 + 1:02d}-{g % 28 + 1:02d}T03:00:00Z"
+        keys.extend(f"backup_{ts}/part-{p:05d}" for p in range(parts))
+    return keys
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_concurrent_deletes_remove_the_same_keys(concurrency):
+    keys = make_keys(groups=30, parts=450)
+    policy = RetentionPolicy(keep_daily=3, keep_weekly=2, keep_monthly=2)
+    decisions = s3_gfs_main.core_logic(
+        keys, policy, filename_ts_re=FILENAME_TS_RE, timestamp_format=TIMESTAMP_FORMAT
+    )
+    client = FakeS3Client(keys)
+
+    result = s3_gfs_main.apply_removal(
+        "bucket",
+        decisions,
+        filename_ts_re=FILENAME_TS_RE,
+        timestamp_format=TIMESTAMP_FORMAT,
+        min_remaining=10,
+        dry_run=False,
+        client=client,
+        delete_concurrency=concurrency,
+    )
+
+    # Only the 20 oldest groups can go before hitting the floor of 10.
+    assert result["deleted_groups"] == 20
+    assert sorted(client.deleted) == sorted(result["deleted_keys"])
+    assert sorted(result["deleted_keys"]) == keys[: 20 * 450]
+    assert client.calls["delete_objects"] == 9
+
+
+def test_delete_failure_stops_dispatch_after_in_flight_window():
+    keys = [f"k{i:06d}" for i in range(10_000)]
+    client = FakeS3Client(keys, fail_keys={"k001500"})
+    chunks = list(s3_gfs_main._batched(keys))
+
+    with pytest.raises(RuntimeError, match="delete_objects reported errors"):
+        s3_gfs_main._dispatch_deletes(
+            s3_gfs_main.S3Backend("bucket", client=client), iter(chunks), concurrency=2
+        )
+
+    # Batch 0 succeeded, batch 1 failed; at most one more batch was in flight.
+    assert client.calls["delete_objects"] <= 3
+    assert set(keys[:1000]) <= set(client.deleted)
+    assert not set(keys[3000:]) & set(client.deleted)
+
+
+def test_sequential_deletes_stop_at_the_failed_batch():
+    keys = [f"k{i:06d}" for i in range(10_000)]
+    client = FakeS3Client(keys, fail_keys={"k001500"})
+    config = s3_gfs_main.load_config({"S3_BUCKET": "b", "S3_GFS_REGEX": "(x)"})
+    concurrency = config.delete_concurrency
+
+    with pytest.raises(RuntimeError, match="delete_objects reported errors"):
+        s3_gfs_main._dispatch_deletes(
+            s3_gfs_main.S3Backend("bucket", client=client),
+            s3_gfs_main._batched(keys),
+            concurrency=concurrency,
+        )
+
+    # By default no newer batch is sent once one fails.
+    assert concurrency == 1
+    assert client.calls["delete_objects"] == 2
+
+
+def test_apply_removal_uses_the_plan_without_reparsing(monkeypatch):
+    keys = make_keys(groups=12, parts=2)
+    policy = RetentionPolicy(keep_daily=3, keep_weekly=0, keep_monthly=0)
+    decisions = s3_gfs_main.core_logic(
+        keys, policy, filename_ts_re=FILENAME_TS_RE, timestamp_format=TIMESTAMP_FORMAT
+    )
+
+    def fail(*_args, **_kwargs):
+        raise AssertionError("apply_removal should not re-parse keys")
+
+    monkeypatch.setattr(s3_gfs_main, "parse_timestamp_from_key", fail)
+    result = s3_gfs_main.apply_removal("bucket", decisions, min_remaining=0)
+
+    assert result["deleted_groups"] == 9
+    assert result["deleted_keys"] == keys[:18]
+
+
+def test_edited_decision_list_is_regrouped_from_keys():
+    keys = make_keys(groups=12, parts=2)
+    policy = RetentionPolicy(keep_daily=3, keep_weekly=0, keep_monthly=0)
+    decisions = s3_gfs_main.core_logic(
+        keys, policy, filename_ts_re=FILENAME_TS_RE, timestamp_format=TIMESTAMP_FORMAT
+    )
+    assert decisions.plan is not None
+
+    # Keep the oldest group by hand; the stale plan must not be used.
+    decisions[0] = (decisions[0][0], "keep", "manual")
+    decisions[1] = (decisions[1][0], "keep", "manual")
+    assert decisions.plan is None
+
+    result = s3_gfs_main.apply_removal(
+        "bucket",
+        decisions,
+        filename_ts_re=FILENAME_TS_RE,
+        timestamp_format=TIMESTAMP_FORMAT,
+        min_remaining=0,
+    )
+
+    assert result["deleted_groups"] == 8
+    assert result["deleted_keys"] == keys[2:18]
+
+
+@pytest.mark.parametrize(
+    "edit",
+    [
+        lambda d: d.__setitem__(0, d[0]),
+        lambda d: d.__delitem__(0),
+        lambda d: d.__iadd__([]),
+        lambda d: d.__imul__(1),
+        lambda d: d.append(d[0]),
+        lambda d: d.extend([]),
+        lambda d: d.insert(0, d[0]),
+        lambda d: d.pop(),
+        lambda d: d.remove(d[0]),
+        lambda d: d.reverse(),
+        lambda d: d.sort(),
+        lambda d: d.clear(),
+    ],
+)
+def test_every_in_place_edit_drops_the_plan(edit):
+    decisions = s3_gfs_main.core_logic(
+        make_keys(groups=3, parts=1),
+        RetentionPolicy(),
+        filename_ts_re=FILENAME_TS_RE,
+        timestamp_format=TIMESTAMP_FORMAT,
+    )
+    assert decisions.plan is not None
+
+    edit(decisions)
+
+    assert decisions.plan is None
+
+
+def test_plan_from_decisions_round_trips_core_logic_plan():
+    keys = make_keys(groups=40, parts=2) + ["README.md"]
+    policy = RetentionPolicy(keep_daily=5, keep_weekly=3, keep_monthly=2)
+    plan = s3_gfs_main.build_plan(
+        keys, policy, filename_ts_re=FILENAME_TS_RE, timestamp_format=TIMESTAMP_FORMAT
+    )
+
+    rebuilt = s3_gfs_main.plan_from_decisions(
+        list(plan.decisions()), filename_ts_re=FILENAME_TS_RE, timestamp_format=TIMESTAMP_FORMAT
+    )
+
+    assert [(g.timestamp, g.keys, g.decision, g.tags) for g in rebuilt.groups] == [
+        (g.timestamp, g.keys, g.decision, g.tags) for g in plan.groups
+    ]
+    assert rebuilt.unparsed == plan.unparsed == ["README.md"]
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import pytest
+
+import main as s3_gfs_main
+from fake_s3 import FakeS3Client
+
+ENV = {
+    "S3_BUCKET": "bucket",
+    "S3_GFS_REGEX": r"backup_(\d{8})\.tar",
+    "S3_GFS_TIMESTAMP_FORMAT": "%Y%m%d",
+    "S3_GFS_KEEP_DAILY": "2",
+    "S3_GFS_KEEP_WEEKLY": "0",
+    "S3_GFS_KEEP_MONTHLY": "0",
+    "S3_GFS_MIN_REMAINING": "1",
+}
+
+
+def test_config_is_reused_until_the_environment_changes():
+    runtime = s3_gfs_main.RuntimeContext()
+
+    first = runtime.config(dict(ENV))
+    assert runtime.config(dict(ENV)) is first
+
+    changed = runtime.config({**ENV, "S3_GFS_KEEP_DAILY": "3"})
+    assert changed is not first
+    assert changed.policy.keep_daily == 3
+
+
+def test_invalid_config_is_rejected():
+    runtime = s3_gfs_main.RuntimeContext()
+
+    with pytest.raises(RuntimeError, match="exactly one capture group"):
+        runtime.config({**ENV, "S3_GFS_REGEX": r"backup_\d{8}\.tar"})
+
+
+def test_s3_client_is_reused_per_region_and_pool_size(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "test")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "test")
+    runtime = s3_gfs_main.RuntimeContext()
+
+    client = runtime.s3_client("eu-west-1", 16)
+
+    assert runtime.s3_client("eu-west-1", 16) is client
+    assert client.meta.config.max_pool_connections == 16
+    resized = runtime.s3_client("eu-west-1", 32)
+    assert resized is not client
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "rotated")
+    assert runtime.s3_client("eu-west-1", 32) is not resized
+
+
+def test_main_runs_against_the_cached_client(run_main):
+    client = FakeS3Client([f"backup_202601{day:02d}.tar" for day in range(1, 6)] + ["notes.txt"])
+
+    result = run_main(client, ENV, S3_GFS_DRY_RUN="false")
+
+    assert result["deleted_keys"] == ["backup_20260101.tar", "backup_20260102.tar", "backup_20260103.tar"]
+    assert client.keys == ["backup_20260104.tar", "backup_20260105.tar", "notes.txt"]
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import main as s3_gfs_main
+
+RetentionPolicy = s3_gfs_main.RetentionPolicy
+
+
+def random_timestamps(count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    start = datetime(2019, 12, 20, tzinfo=timezone.utc)  # spans several ISO year boundaries
+    return sorted(
+        {start + timedelta(seconds=rng.randrange(0, 6 * 365 * 86400)) for _ in range(count)}
+    )
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize(
+    "policy",
+    [
+        RetentionPolicy(),
+        RetentionPolicy(keep_daily=30, keep_weekly=60, keep_monthly=80),
+        RetentionPolicy(keep_daily=0, keep_weekly=400, keep_monthly=0),
+        RetentionPolicy(keep_daily=1, keep_weekly=0, keep_monthly=1000),
+        RetentionPolicy(keep_hourly=48, keep_yearly=10),
+        RetentionPolicy(keep_daily=0, keep_weekly=0, keep_monthly=0, keep_hourly=500),
+    ],
+)
+def test_numpy_engine_matches_python_engine(seed, policy):
+    pytest.importorskip("numpy")
+    dts = random_timestamps(3000, seed)
+
+    expected = s3_gfs_main.select_keepers(dts, policy, engine="python")
+    actual = s3_gfs_main.select_keepers(dts, policy, engine="numpy")
+
+    assert actual == expected
+
+
+def test_unknown_engine_is_rejected():
+    with pytest.raises(RuntimeError, match="Unknown selection engine"):
+        s3_gfs_main.select_keepers([], RetentionPolicy(), engine="fortran")
+
+
+def reference_keepers(dts, policy) -> dict:
+    """One full pass per tier with a seen-set, as the engine originally worked."""
+    buckets = {
+        "hourly": lambda dt: (dt.year, dt.month, dt.day, dt.hour),
+        "daily": lambda dt: (dt.year, dt.month, dt.day),
+        "weekly": lambda dt: tuple(dt.isocalendar())[:2],
+        "monthly": lambda dt: (dt.year, dt.month),
+        "yearly": lambda dt: dt.year,
+    }
+    tags = {}
+    for tier, keep_n in policy.tiers():
+        seen = set()
+        for dt in sorted(dts, reverse=True):
+            bucket = buckets[tier](dt)
+            if bucket in seen:
+                continue
+            seen.add(bucket)
+            tags.setdefault(dt, set()).add(tier)
+            if len(seen) >= keep_n:
+                break
+    order = ("yearly", "monthly", "weekly", "daily", "hourly")
+    return {dt: tuple(t for t in order if t in found) for dt, found in tags.items()}
+
+
+@pytest.mark.parametrize("order", ["ascending", "descending", "shuffled"])
+@pytest.mark.parametrize(
+    "policy",
+    [
+        RetentionPolicy(),
+        RetentionPolicy(keep_hourly=24, keep_daily=14, keep_weekly=8, keep_monthly=24, keep_yearly=5),
+        RetentionPolicy(keep_daily=0, keep_weekly=0, keep_monthly=0, keep_yearly=3),
+    ],
+)
+def test_single_pass_selection_matches_per_tier_passes(order, policy):
+    dts = random_timestamps(2000, seed=7)
+    if order == "descending":
+        dts.reverse()
+    elif order == "shuffled":
+        random.Random(1).shuffle(dts)
+
+    assert s3_gfs_main.select_keepers(dts, policy) == reference_keepers(dts, policy)
+
+
+def test_hourly_and_yearly_tiers_tag_the_newest_group_of_each_bucket():
+    dts = [
+        datetime(2023, 6, 1, 10, 15, tzinfo=timezone.utc),
+        datetime(2024, 3, 1, 9, 0, tzinfo=timezone.utc),
+        datetime(2024, 3, 1, 9, 30, tzinfo=timezone.utc),
+        datetime(2024, 3, 1, 10, 5, tzinfo=timezone.utc),
+    ]
+    policy = RetentionPolicy(
+        keep_daily=0, keep_weekly=0, keep_monthly=0, keep_hourly=2, keep_yearly=2
+    )
+
+    keepers = s3_gfs_main.select_keepers(dts, policy)
+
+    assert keepers == {
+        dts[3]: ("yearly", "hourly"),
+        dts[2]: ("hourly",),
+        dts[0]: ("yearly",),
+    }
+
+
+def test_policy_tiers_lists_enabled_tiers_most_specific_first():
+    policy = RetentionPolicy(keep_daily=3, keep_weekly=0, keep_monthly=2, keep_yearly=1)
+
+    assert policy.tiers() == [("daily", 3), ("monthly", 2), ("yearly", 1)]
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import main as s3_gfs_main
+from fake_s3 import FakeS3Client
+from simulate import simulate
+
+RetentionPolicy = s3_gfs_main.RetentionPolicy
+START = datetime(2024, 12, 1, 4, 45, tzinfo=timezone.utc)
+
+
+def test_simulation_matches_real_runs():
+    policy = RetentionPolicy(keep_daily=5, keep_weekly=3, keep_monthly=2, keep_yearly=1)
+    steps = simulate(
+        policy,
+        start=START,
+        end=START + timedelta(days=120),
+        backup_interval=timedelta(hours=12),
+        run_delay=timedelta(hours=13),
+        min_remaining=8,
+        group_bytes=10,
+    )
+
+    client = FakeS3Client()
+    regex = s3_gfs_main.re.compile(r"backup_(.+)\.tar")
+    fmt = "%Y-%m-%dT%H:%M"
+    for day, step in enumerate(steps):
+        for half in range(2):
+            ts = START + timedelta(days=day, hours=12 * half)
+            client.put_object(Bucket="bucket", Key=f"backup_{ts:%Y-%m-%dT%H:%M}.tar")
+        decisions = s3_gfs_main.core_logic(
+            client.keys, policy, filename_ts_re=regex, timestamp_format=fmt
+        )
+        result = s3_gfs_main.apply_removal(
+            "bucket", decisions, min_remaining=8, dry_run=False, client=client
+        )
+
+        assert step.arrived_groups == 2
+        assert step.deleted_groups == result["deleted_groups"]
+        assert step.retained_groups == len(client.keys)
+        assert step.retained_bytes == 10 * len(client.keys)
+
+
+def test_multi_year_daily_simulation_settles_at_the_policy_size():
+    steps = simulate(
+        RetentionPolicy(),
+        start=START,
+        end=START + timedelta(days=3 * 365),
+        min_remaining=5,
+    )
+
+    assert len(steps) == 3 * 365
+    # 7 daily + 4 weekly + 12 monthly, minus the groups shared between tiers
+    assert all(18 <= step.retained_groups <= 23 for step in steps[400:])
+    assert sum(step.deleted_groups for step in steps) == 3 * 365 - steps[-1].retained_groups
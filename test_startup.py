@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_python(code: str, **env: str) -> str:
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=HERE,
+        env={**os.environ, **env},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout.strip()
+
+
+def test_import_does_not_load_boto3():
+    out = run_python(
+        "import sys, main; "
+        "print(sorted(m for m in ('boto3', 'botocore', 'concurrent.futures') if m in sys.modules))"
+    )
+
+    assert out == "[]"
+
+
+def test_config_errors_fail_before_loading_boto3():
+    out = run_python(
+        "import sys, main\n"
+        "try:\n"
+        "    main.main()\n"
+        "except RuntimeError:\n"
+        "    pass\n"
+        "print('boto3' in sys.modules)",
+        S3_BUCKET="bucket",
+        S3_GFS_REGEX="no-capture-group",
+    )
+
+    assert out == "False"
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import main as s3_gfs_main
+from fake_s3 import FakeS3Client
+
+RetentionPolicy = s3_gfs_main.RetentionPolicy
+FILENAME_TS_RE = s3_gfs_main.re.compile(
+    r"Automatic_backup_\d+\.\d+\.\d+_(\d{4}-\d{2}-\d{2}_\d{2}\.\d{2})_"
+)
+TIMESTAMP_FORMAT = "%Y-%m-%d_%H.%M"
+
+
+def make_keys(days: int) -> list:
+    start = datetime(2025, 1, 1, 5, 0)
+    keys = []
+    for i in range(days):
+        ts = (start + timedelta(days=i)).strftime("%Y-%m-%d_%H.%M")
+        keys.append(f"Automatic_backup_2025.1.0_{ts}_{i:08d}.metadata.json")
+        keys.append(f"Automatic_backup_2025.1.0_{ts}_{i:08d}.tar")
+    keys.append("notes.txt")
+    return keys
+
+
+@pytest.mark.parametrize("prefetch", [0, 2])
+def test_iter_keys_streams_every_page_in_order(prefetch):
+    keys = [f"k/{i:06d}" for i in range(2500)]
+    client = FakeS3Client(keys)
+
+    listed = list(
+        s3_gfs_main.iter_keys_from_s3("bucket", "k/", client=client, prefetch=prefetch)
+    )
+
+    assert listed == keys
+    assert client.calls["list_objects_v2"] == 3
+
+
+def test_prefetch_reraises_producer_errors():
+    def pages():
+        yield ["a"]
+        raise RuntimeError("listing failed")
+
+    stream = s3_gfs_main._prefetch(pages(), 1)
+    assert next(stream) == ["a"]
+    with pytest.raises(RuntimeError, match="listing failed"):
+        next(stream)
+
+
+def test_core_logic_accepts_a_lazy_stream():
+    keys = make_keys(10)
+    policy = RetentionPolicy(keep_daily=3, keep_weekly=0, keep_monthly=0)
+
+    from_list = s3_gfs_main.core_logic(
+        keys, policy, filename_ts_re=FILENAME_TS_RE, timestamp_format=TIMESTAMP_FORMAT
+    )
+    from_stream = s3_gfs_main.core_logic(
+        iter(keys), policy, filename_ts_re=FILENAME_TS_RE, timestamp_format=TIMESTAMP_FORMAT
+    )
+
+    assert from_stream == from_list
+
+
+@pytest.mark.parametrize("min_remaining", [0, 5, 30])
+def test_streaming_removal_matches_in_memory_removal(min_remaining):
+    keys = make_keys(40)
+    policy = RetentionPolicy(keep_daily=7, keep_weekly=4, keep_monthly=12)
+
+    decisions = s3_gfs_main.core_logic(
+        keys, policy, filename_ts_re=FILENAME_TS_RE, timestamp_format=TIMESTAMP_FORMAT
+    )
+    expected_client = FakeS3Client(keys)
+    expected = s3_gfs_main.apply_removal(
+        "bucket",
+        decisions,
+        filename_ts_re=FILENAME_TS_RE,
+        timestamp_format=TIMESTAMP_FORMAT,
+        min_remaining=min_remaining,
+        dry_run=False,
+        client=expected_client,
+    )
+
+    client = FakeS3Client(keys)
+    summary = s3_gfs_main.summarize_groups(
+        s3_gfs_main.iter_keys_from_s3("bucket", client=client),
+        filename_ts_re=FILENAME_TS_RE,
+        timestamp_format=TIMESTAMP_FORMAT,
+    )
+    keepers = s3_gfs_main.select_keepers(summary.counts.keys(), policy)
+    result = s3_gfs_main.apply_removal_streaming(
+        "bucket",
+        s3_gfs_main.iter_keys_from_s3("bucket", client=client),
+        summary,
+        keepers,
+        filename_ts_re=FILENAME_TS_RE,
+        timestamp_format=TIMESTAMP_FORMAT,
+        min_remaining=min_remaining,
+        dry_run=False,
+        client=client,
+    )
+
+    assert summary.total == len(keys)
+    assert summary.unparsed == 1
+    assert result["deleted"] == expected["deleted"]
+    assert result["deleted_groups"] == expected["deleted_groups"]
+    assert result["skipped"] == expected["skipped"]
+    assert sorted(client.deleted) == sorted(expected_client.deleted)
+    assert client.keys == expected_client.keys
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+import pytest
+
+import main as s3_gfs_main
+
+TimestampParser = s3_gfs_main.TimestampParser
+
+
+def strptime_utc(text: str, fmt: str):
+    try:
+        return datetime.strptime(text, fmt).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+@pytest.mark.parametrize(
+    "fmt, compiled",
+    [
+        ("%Y-%m-%d_%H.%M", True),
+        ("%Y-%m-%dT%H:%M:%SZ", True),
+        ("%Y%m%d", True),
+        ("100%% %Y", True),
+        ("%Y-%m-%d %H:%M:%S.%f", False),
+        ("%d %b %Y", False),
+        ("%Y-%Y", False),
+    ],
+)
+def test_compiles_only_fixed_width_formats(fmt, compiled):
+    assert TimestampParser(fmt).compiled is compiled
+
+
+@pytest.mark.parametrize(
+    "fmt, text",
+    [
+        ("%Y-%m-%d_%H.%M", "2026-01-09_04.45"),
+        ("%Y-%m-%d_%H.%M", "2026-1-9_4.45"),  # non-padded: strptime accepts it
+        ("%Y-%m-%d_%H.%M", "2026-13-09_04.45"),
+        ("%Y-%m-%d_%H.%M", "2026-02-30_04.45"),
+        ("%Y-%m-%d_%H.%M", "2026-01-09_04.45x"),
+        ("%Y-%m-%dT%H:%M:%SZ", "2025-11-01T05:20:00Z"),
+        ("%Y-%m-%dT%H:%M:%SZ", "2025-11-01t05:20:00z"),  # literals are case-insensitive
+        ("%Y-%m-%dT%H:%M:%SZ", "2025-11-01T05:20:60Z"),
+        ("%Y%m%d", "20251109"),
+        ("%Y%m%d", "2025119"),
+        ("%Y%m%d", "20251310"),
+        ("100%% %Y", "100% 2024"),
+        ("%Y-%m-%d %H:%M:%S.%f", "2025-11-01 05:20:00.123"),
+        ("%H:%M", "23:59"),
+    ],
+)
+def test_matches_strptime(fmt, text):
+    assert TimestampParser(fmt)(text) == strptime_utc(text, fmt)
+
+
+def test_parse_timestamp_from_key_returns_utc():
+    regex = s3_gfs_main.re.compile(r"backup_(\d{8})\.tar")
+
+    dt = s3_gfs_main.parse_timestamp_from_key("db/backup_20260109.tar", regex, "%Y%m%d")
+
+    assert dt == datetime(2026, 1, 9, tzinfo=timezone.utc)
+    assert s3_gfs_main.parse_timestamp_from_key("db/other.tar", regex, "%Y%m%d") is None
+
+
+def test_cache_counts_hits_for_shared_captures():
+    parser = TimestampParser("%Y-%m-%d_%H.%M")
+    regex = s3_gfs_main.re.compile(r"_(\d{4}-\d{2}-\d{2}_\d{2}\.\d{2})_")
+    keys = [
+        "Automatic_backup_2026.1.0_2026-01-09_04.45_52003641.tar",
+        "Automatic_backup_2026.1.0_2026-01-09_04.45_52003641.metadata.json",
+        "Automatic_backup_2026.1.0_2026-01-10_04.45_52003642.tar",
+        "Automatic_backup_2026.1.0_2026-01-10_04.45_52003642.metadata.json",
+    ]
+
+    results = [parser(regex.search(k).group(1)) for k in keys]
+
+    assert results[0] == results[1] != results[2] == results[3]
+    assert parser.cache_info() == {"hits": 2, "misses": 2, "size": 2, "max_size": 4096}
+    parser.reset_stats()
+    assert (parser.hits, parser.misses) == (0, 0)
+
+
+def test_cache_evicts_least_recently_used():
+    parser = TimestampParser("%Y%m%d", cache_size=2)
+
+    parser("20260101")
+    parser("20260102")
+    parser("20260101")  # refresh, so 20260102 is now the oldest entry
+    parser("20260103")
+    parser("20260101")
+    parser("20260102")
+
+    assert (parser.hits, parser.misses) == (2, 4)
+    assert parser.cache_info()["size"] == 2
+
+
+def test_cache_can_be_disabled():
+    parser = TimestampParser("%Y%m%d", cache_size=0)
+
+    assert parser("20260101") == parser("20260101")
+    assert parser.cache_info() == {"hits": 0, "misses": 0, "size": 0, "max_size": 0}